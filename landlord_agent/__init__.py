@@ -1,6 +1,14 @@
-from .landlord_agent import LandlordAgent
+import os
+import sys
+
+# 包内模块之间按顶层模块名互相导入（与直接运行脚本时一致）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from .landlord_agent import (LandlordAgent, SOURCE_ENGINE, SOURCE_LLM, last_play_state,
+                             hand_state)
 from .database import CardDB
 from .qwen_client import QwenClient
 
 __version__ = "2.0.0"
-__all__ = ["LandlordAgent", "CardDB", "QwenClient"]
+__all__ = ["LandlordAgent", "CardDB", "QwenClient", "SOURCE_ENGINE", "SOURCE_LLM",
+           "last_play_state", "hand_state"]
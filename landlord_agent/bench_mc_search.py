@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+蒙特卡洛搜索吞吐量基准测试
+使用方法：python bench_mc_search.py [模拟局数] [进程数]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mc_search import MonteCarloSearch
+
+HAND = ["3", "4", "5", "6", "7", "8", "8", "9", "10", "J", "J", "Q", "K", "A", "2", "2", "小王"]
+HISTORY = [
+    {"玩家": "A", "牌": ["3", "3"]},
+    {"玩家": "B", "牌": ["9", "9"]},
+    {"玩家": "C", "牌": ["Q", "Q"]},
+]
+
+
+def main():
+    simulations = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+
+    print(f"手牌: {' '.join(HAND)}，跟牌: K")
+    for workers in sorted({1, processes}):
+        with MonteCarloSearch(processes=workers, simulations=simulations) as search:
+            # 预热进程池
+            search.search(HAND, ["K"], my_seat="B", last_player="A", history_plays=HISTORY, simulations=workers)
+            result = search.search(HAND, ["K"], my_seat="B", last_player="A", history_plays=HISTORY, seed=1)
+        per_core = result["simulations_per_sec"] / result["processes"]
+        print(f"\n进程数 {result['processes']}: 模拟 {result['simulations']} 局，耗时 {result['elapsed_s']:.3f} 秒")
+        print(f"吞吐量: {result['simulations_per_sec']:,.0f} 局/秒，每核 {per_core:,.0f} 局/秒")
+        for move in result["moves"][:3]:
+            print(f"  {move['move']['cards'] or 'Pass'}: 胜率 {move['win_rate']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+54张牌的规范表：每张牌一个整数ID（0-53），按牌面大小排序
+
+ID = 点数序号 * 4 + 花色序号（点数序号 3=0 ... 2=12），小王=52，大王=53，
+因此ID的大小顺序就是牌的大小顺序；权重等属性预先计算成按ID索引的列表
+"""
+from typing import List, Optional
+
+from play_notation import RANK_ORDER, RANK_INDEX, JOKER_RANKS
+
+SUITS = ['spade', 'heart', 'club', 'diamond']
+SUIT_INDEX = {suit: i for i, suit in enumerate(SUITS)}
+
+LITTLE_JOKER = 'little_joker'
+BIG_JOKER = 'big_joker'
+
+# 点数列表中王的名称 -> 数据库中的card名称
+JOKER_NAMES = {rank: name for name, rank in JOKER_RANKS.items()}
+
+# 各点数的权重（出牌重要程度）
+RANK_WEIGHTS = {
+    '3': 0.15, '4': 0.20, '5': 0.25, '6': 0.30, '7': 0.35, '8': 0.40, '9': 0.45,
+    '10': 0.50, 'J': 0.60, 'Q': 0.70, 'K': 0.80, 'A': 0.90, '2': 0.95,
+    '小王': 0.98, '大王': 1.0,
+}
+
+DECK_SIZE = 54
+
+# 按ID索引的预计算属性
+CARD_NAMES: List[str] = []
+CARD_RANKS: List[str] = []
+CARD_RANK_INDEX: List[int] = []
+CARD_WEIGHTS: List[float] = []
+
+for _rank in RANK_ORDER[:13]:
+    for _suit in SUITS:
+        CARD_NAMES.append(f"{_suit} {_rank}")
+        CARD_RANKS.append(_rank)
+for _name in (LITTLE_JOKER, BIG_JOKER):
+    CARD_NAMES.append(_name)
+    CARD_RANKS.append(JOKER_RANKS[_name])
+for _rank in CARD_RANKS:
+    CARD_RANK_INDEX.append(RANK_INDEX[_rank])
+    CARD_WEIGHTS.append(RANK_WEIGHTS[_rank])
+
+CARD_ID = {name: card_id for card_id, name in enumerate(CARD_NAMES)}
+
+# 每个点数对应的牌ID（王各只有一张）
+RANK_CARD_IDS = {rank: [i for i, r in enumerate(CARD_RANKS) if r == rank] for rank in RANK_ORDER}
+
+
+def card_id(card: str) -> Optional[int]:
+    """card名称（"heart K"、"little_joker"）-> 牌ID，无法识别时返回None"""
+    return CARD_ID.get(card)
+
+
+def card_weight(card: str, default: float = 0.5) -> float:
+    """单张牌的权重：一次查表加一次列表索引"""
+    cid = CARD_ID.get(card)
+    return CARD_WEIGHTS[cid] if cid is not None else default
+
+
+def ranks_to_card_ids(ranks: List[str]) -> List[int]:
+    """
+    点数列表 -> 牌ID列表。组合牌型不记录花色，同一点数按 spade/heart/club/diamond
+    的顺序依次取不同的牌作为规范表示
+    """
+    used = {}
+    ids = []
+    for rank in ranks:
+        n = used.get(rank, 0)
+        if n >= len(RANK_CARD_IDS[rank]):
+            raise ValueError(f"点数{rank}超过一副牌中的张数")
+        ids.append(RANK_CARD_IDS[rank][n])
+        used[rank] = n + 1
+    return ids
+
+
+def sort_cards(cards: List[str]) -> List[str]:
+    """按牌面大小从小到大排序card名称"""
+    return sorted(cards, key=lambda c: CARD_ID.get(c, DECK_SIZE))
@@ -0,0 +1,81 @@
+"""
+熔断器：连续失败达到阈值后在一段时间内直接拒绝请求（快速失败），
+冷却后放行一个试探请求，成功则恢复，失败则重新熔断
+
+状态：closed（正常）→ open（熔断）→ half_open（试探）→ closed / open
+"""
+import threading
+import time
+from typing import Any, Dict
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """熔断期间的请求被直接拒绝"""
+
+
+class CircuitBreaker:
+    """failure_threshold为触发熔断的连续失败次数，reset_timeout为熔断持续的秒数"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, name: str = ''):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._counts = {"opened": 0, "rejected": 0, "successes": 0, "failures": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def before_call(self):
+        """请求前调用：熔断中（或试探请求已在进行）时抛出 CircuitOpenError"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            self._counts["rejected"] += 1
+            remaining = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+        raise CircuitOpenError(f"{self.name or '服务'}熔断中，{remaining:.1f}秒后重试")
+
+    def record_success(self):
+        with self._lock:
+            self._counts["successes"] += 1
+            self._failures = 0
+            self._state = CLOSED
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._counts["failures"] += 1
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self._counts["opened"] += 1
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counts)
+            stats["state"] = self._current_state()
+            stats["consecutive_failures"] = self._failures
+        return stats
@@ -0,0 +1,156 @@
+"""
+进程内共享的模型客户端：同一API密钥的 LandlordAgent 复用同一个已配置好的客户端
+（QwenClient 或 LLMRouter）和同一个保持长连接的HTTP连接池，
+每次触发新建 LandlordAgent 时不再重新建立TLS连接
+
+  - get_llm_client(api_key)：按 (API密钥, 服务列表) 缓存的客户端
+  - get_async_http_client()：异步调用共用的连接池，连接绑定在事件循环上，因此每个事件循环各一个
+  - prewarm_registered()：启动时向每个服务发一个轻量请求，提前建好TLS连接放入连接池
+    （LLM_PREWARM=0 时关闭）
+"""
+import asyncio
+import os
+import threading
+import time
+import weakref
+from typing import Any, Dict, Optional
+
+from llm_router import create_llm_client
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# 空闲连接的保留时间（秒），需长于两次触发的间隔才能复用连接
+KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY") or "120")
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS") or "100")
+PREWARM_TIMEOUT = 5.0
+
+_lock = threading.Lock()
+_http_client = None
+# 事件循环 -> 该循环共用的 httpx.AsyncClient，循环被回收后自动移除
+_async_http_clients = weakref.WeakKeyDictionary()
+_llm_clients: Dict[tuple, Any] = {}
+_prewarm: Dict[str, Optional[float]] = {}
+
+
+def prewarm_enabled() -> bool:
+    return os.getenv("LLM_PREWARM", "1") != "0"
+
+
+def _limits():
+    return httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS,
+                        keepalive_expiry=KEEPALIVE_EXPIRY)
+
+
+def get_http_client():
+    """进程内共享的 httpx.Client；没有httpx时返回None（各客户端使用SDK默认的连接池）"""
+    global _http_client
+    if httpx is None:
+        return None
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(limits=_limits())
+        return _http_client
+
+
+def get_async_http_client():
+    """当前事件循环共享的 httpx.AsyncClient（需在事件循环中调用）；没有httpx时返回None"""
+    if httpx is None:
+        return None
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_http_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(limits=_limits())
+            _async_http_clients[loop] = client
+        return client
+
+
+def get_llm_client(api_key: str = None):
+    """同一API密钥和服务配置（LLM_PROVIDERS）只创建一次客户端"""
+    key = (api_key or "", os.getenv("LLM_PROVIDERS") or "")
+    http_client = get_http_client()
+    with _lock:
+        client = _llm_clients.get(key)
+        if client is None:
+            client = create_llm_client(api_key, http_client=http_client,
+                                       async_http_client=get_async_http_client)
+            _llm_clients[key] = client
+        return client
+
+
+def _endpoints(client) -> Dict[str, str]:
+    """客户端（或路由中每个服务）的 {服务名: base_url}"""
+    providers = getattr(client, "providers", None)
+    if providers is None:
+        return {getattr(client, "provider", "llm"): client.base_url}
+    endpoints = {}
+    for name, provider in providers:
+        endpoints.update({name: base_url for base_url in _endpoints(provider).values()})
+    return endpoints
+
+
+def prewarm(client, timeout: float = PREWARM_TIMEOUT) -> Dict[str, Optional[float]]:
+    """
+    向client用到的每个服务发一个HEAD请求，TLS连接建立后留在共享连接池中。
+    返回每个服务的耗时（秒），失败为None；不关心响应状态码
+    """
+    http_client = get_http_client()
+    if http_client is None:
+        return {}
+    results = {}
+    for name, base_url in _endpoints(client).items():
+        started = time.monotonic()
+        try:
+            http_client.head(base_url, timeout=timeout)
+            results[name] = round(time.monotonic() - started, 3)
+        except Exception as e:
+            print(f"预热 {name} 连接失败: {e}")
+            results[name] = None
+    with _lock:
+        _prewarm.update(results)
+    return results
+
+
+def prewarm_registered(background: bool = True) -> Optional[threading.Thread]:
+    """预热所有已创建的客户端；background为True时在后台线程中进行，不阻塞启动"""
+    if not prewarm_enabled():
+        return None
+    with _lock:
+        clients = list(_llm_clients.values())
+
+    def run():
+        for client in clients:
+            prewarm(client)
+
+    if not background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name="llm-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "clients": len(_llm_clients),
+            "pooled": _http_client is not None,
+            "async_pools": len(_async_http_clients),
+            "keepalive_expiry": KEEPALIVE_EXPIRY,
+            "prewarm": dict(_prewarm)
+        }
+
+
+def reset():
+    """关闭共享连接池并清空已创建的客户端（测试用）；异步连接池随事件循环一起释放，这里只移除引用"""
+    global _http_client
+    with _lock:
+        if _http_client is not None:
+            _http_client.close()
+        _http_client = None
+        _async_http_clients.clear()
+        _llm_clients.clear()
+        _prewarm.clear()
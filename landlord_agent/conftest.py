@@ -0,0 +1,25 @@
+"""
+测试共用的fixture：使用临时数据库的 LandlordAgent
+"""
+import pytest
+
+from landlord_agent import LandlordAgent
+
+
+@pytest.fixture
+def make_agent(tmp_path):
+    """
+    创建使用临时数据库的 LandlordAgent；client替换模型客户端（agent.qwen），
+    db_path相同的两个agent可用于模拟重启，其余参数传给 LandlordAgent
+    """
+    created = []
+
+    def factory(client=None, db_path=None, **kwargs):
+        path = db_path or str(tmp_path / f"cards{len(created)}.db")
+        agent = LandlordAgent(api_key="test", db_path=path, **kwargs)
+        if client is not None:
+            agent.qwen = client
+        created.append(agent)
+        return agent
+
+    return factory
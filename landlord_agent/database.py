@@ -6,6 +6,8 @@ from pathlib import Path
 class CardDB:
     def __init__(self, db_path: str = None):
         self.db_path = db_path or Path(__file__).parent / "cards.db"
+        # 每次clear()加一，用于让基于记录的缓存状态失效
+        self.generation = 0
         self._init_db()
     
     def _init_db(self):
@@ -36,6 +38,13 @@ class CardDB:
         conn.commit()
         conn.close()
     
+    def get_records(self) -> List[Dict[str, Any]]:
+        """所有记录（按写入顺序），直接返回字典列表"""
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute('SELECT player, round, card, weighting FROM card_records ORDER BY rowid').fetchall()
+        conn.close()
+        return [{"player": r[0], "round": r[1], "card": r[2], "weighting": r[3]} for r in rows]
+    
     def get_all(self) -> str:
         conn = sqlite3.connect(self.db_path)
         rows = conn.execute('SELECT player, round, card, weighting FROM card_records').fetchall()
@@ -71,6 +80,7 @@ class CardDB:
         conn.execute('DELETE FROM card_records')
         conn.commit()
         conn.close()
+        self.generation += 1
 
 if __name__ == "__main__":
     db = CardDB()
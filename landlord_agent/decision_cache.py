@@ -0,0 +1,179 @@
+"""
+模型决策缓存：相同局面（手牌、待跟牌、身份、历史汇总等价）直接复用模型的输出
+
+  - 键：规范化局面的哈希。手牌按点数排序，不包含回合数和最近出牌窗口等不影响等价性的内容
+  - 内存层：TTLCache（LRU + TTL）
+  - 持久层（可选）：SQLite，重启后仍然有效，命中时提升到内存层
+  - bypass：评估时关闭缓存，每次都调用模型
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+from play_notation import RANK_INDEX
+from ttl_cache import TTLCache, make_cache_key
+
+DEFAULT_MAX_SIZE = 1024
+DEFAULT_TTL = 24 * 3600.0
+
+
+def sort_ranks(ranks) -> list:
+    """点数列表按牌面从小到大排序"""
+    return sorted(ranks, key=lambda r: RANK_INDEX.get(r, len(RANK_INDEX)))
+
+
+def normalize_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """局面中决定决策的部分，手牌和待跟牌按点数排序"""
+    situation = state.get("局面", {})
+    last_play = situation.get("桌面待跟牌(last_play)", {})
+    has_prev = bool(last_play.get("是否存在"))
+    return {
+        "座位": situation.get("我的座位"),
+        "阵营": situation.get("我的阵营"),
+        "手牌": sort_ranks(situation.get("我的手牌", {}).get("牌", [])),
+        "待跟牌": {
+            "出牌者": last_play.get("出牌者") if has_prev else None,
+            "牌": sort_ranks(last_play.get("牌", [])) if has_prev else []
+        },
+        "对手剩余张数": situation.get("对手剩余张数"),
+        "未出现的牌": situation.get("未出现的牌"),
+        "历史汇总": situation.get("历史汇总")
+    }
+
+
+def state_key(state: Dict[str, Any]) -> str:
+    return make_cache_key('decision', normalize_state(state))
+
+
+def _cacheable(response: str) -> bool:
+    """只缓存能解析出recommended_move的输出"""
+    try:
+        parsed = json.loads(response)
+    except (TypeError, ValueError):
+        return False
+    return isinstance(parsed, dict) and isinstance(parsed.get("recommended_move"), dict)
+
+
+class DecisionCache:
+    """
+    max_size/ttl为内存层的容量和有效期（秒），db_path为持久层的SQLite文件（None时只用内存），
+    bypass为True时get总是未命中、put不写入
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, ttl: float = DEFAULT_TTL,
+                 db_path: str = None, bypass: bool = False):
+        self.memory = TTLCache(max_size=max_size, ttl=ttl)
+        self.ttl = ttl
+        self.db_path = db_path
+        self.bypass = bypass
+        self._lock = threading.Lock()
+        self._counts = {"lookups": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "bypassed": 0}
+        if db_path:
+            self._init_db()
+
+    def _init_db(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS decision_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT,
+                expires_at REAL
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self._counts["lookups"] += 1
+            self._counts[outcome] += 1
+
+    def get(self, key: str) -> Optional[str]:
+        if self.bypass:
+            self._count("bypassed")
+            return None
+        response = self.memory.get(key)
+        if response is not None:
+            self._count("memory_hits")
+            return response
+        if self.db_path:
+            conn = sqlite3.connect(self.db_path)
+            row = conn.execute('SELECT response, expires_at FROM decision_cache WHERE key = ?', (key,)).fetchone()
+            conn.close()
+            if row is not None and row[1] > time.time():
+                self.memory.put(key, row[0], ttl=row[1] - time.time())
+                self._count("disk_hits")
+                return row[0]
+        self._count("misses")
+        return None
+
+    def put(self, key: str, response: str):
+        if self.bypass or not _cacheable(response):
+            return
+        self.memory.put(key, response)
+        if self.db_path:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute('INSERT OR REPLACE INTO decision_cache VALUES (?, ?, ?)',
+                         (key, response, time.time() + self.ttl))
+            conn.execute('DELETE FROM decision_cache WHERE expires_at <= ?', (time.time(),))
+            conn.commit()
+            conn.close()
+
+    def clear(self):
+        self.memory.clear()
+        if self.db_path:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute('DELETE FROM decision_cache')
+            conn.commit()
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counts)
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        checked = stats["lookups"] - stats["bypassed"]
+        stats["hit_rate"] = round(hits / checked, 4) if checked else 0.0
+        stats["memory"] = self.memory.stats()
+        stats["persistent"] = bool(self.db_path)
+        stats["bypass"] = self.bypass
+        return stats
+
+
+class CachingClient:
+    """
+    QwenClient 外层的决策缓存：get_card_recommendation 先查缓存，未命中时调用模型并写入；
+    其他方法（流式接口、token统计等）直接转发给内层客户端
+    """
+
+    def __init__(self, client, cache: DecisionCache):
+        self.client = client
+        self.cache = cache
+
+    def get_card_recommendation(self, state: Dict[str, Any]) -> str:
+        key = state_key(state)
+        response = self.cache.get(key)
+        if response is None:
+            response = self.client.get_card_recommendation(state)
+            self.cache.put(key, response)
+        return response
+
+    async def get_card_recommendation_async(self, state: Dict[str, Any]) -> str:
+        """异步版本：持久层的SQLite读写在线程中进行，不阻塞事件循环"""
+        key = state_key(state)
+        response = await asyncio.to_thread(self.cache.get, key) if self.cache.db_path else self.cache.get(key)
+        if response is None:
+            response = await self.client.get_card_recommendation_async(state)
+            if self.cache.db_path:
+                await asyncio.to_thread(self.cache.put, key, response)
+            else:
+                self.cache.put(key, response)
+        return response
+
+    def stream_card_recommendation(self, state: Dict[str, Any]) -> Iterator[str]:
+        return self.client.stream_card_recommendation(state)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
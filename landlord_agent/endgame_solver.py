@@ -0,0 +1,291 @@
+"""
+残局精确求解：剩余牌很少时，用带置换表和走法排序的alpha-beta搜索求出必胜走法
+
+  - 手牌编码：计数向量压缩成一个整数，每个点数占3位（15个点数共45位），
+    置换表的键为 (三家手牌编码, 上一手牌, 轮到谁, 上一手出牌者)
+  - 搜索：完全信息下的三人两阵营博弈，地主取最大、农民取最小，胜负值为 +1/-1
+  - 不完全信息：对手手牌未知时，枚举未出现的牌在两个对手之间所有可能的分配，在分配的集合上搜索：
+    轮到自己时选一个在所有仍然可能的分配下都必胜的走法（之后的选择只依赖看得到的出牌），
+    轮到其他两家时按他们可能出的每一手牌（包括队友）把分配分组，每一组都必须必胜。
+    这样得到的"已证明"走法不会依赖看不到的对手手牌
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from play_notation import PASS, BOMB, ROCKET
+from rules_engine import (Move, NUM_RANKS, SEATS, LANDLORD_SEAT, INITIAL_CARDS, FULL_DECK, classify,
+                          hand_counts, legal_moves, move_to_dict, remove_move)
+
+# 三家剩余牌总数不超过该值时才求解
+DEFAULT_THRESHOLD = 12
+# 置换表条目上限，超过时清空
+MAX_TABLE_SIZE = 500000
+
+LANDLORD_WINS = 1
+FARMERS_WIN = -1
+
+_BITS = 3
+
+
+def encode_hand(counts: Sequence[int]) -> int:
+    """计数向量 -> 整数编码（每个点数3位）"""
+    code = 0
+    for i, n in enumerate(counts):
+        code |= n << (_BITS * i)
+    return code
+
+
+def decode_hand(code: int) -> Tuple[int, ...]:
+    """整数编码 -> 计数向量"""
+    return tuple((code >> (_BITS * i)) & 0b111 for i in range(NUM_RANKS))
+
+
+def _order_key(move: Move, counts_total: int):
+    """走法排序：能出完的牌最先，其次一次出得多的、非炸弹的，Pass最后"""
+    if move.type == PASS:
+        return (2, 0, 0)
+    if len(move.cards) == counts_total:
+        return (0, 0, 0)
+    return (1, move.type in (BOMB, ROCKET), -len(move.cards))
+
+
+class EndgameSolver:
+    """
+    残局求解器。置换表在多次求解之间共享（键包含完整局面，不同的牌分配可以复用），
+    nodes为累计搜索的节点数
+    """
+
+    def __init__(self, threshold: int = DEFAULT_THRESHOLD, max_table_size: int = MAX_TABLE_SIZE):
+        self.threshold = threshold
+        self.max_table_size = max_table_size
+        self.table: Dict[tuple, int] = {}
+        self.nodes = 0
+
+    def clear(self):
+        self.table.clear()
+        self.nodes = 0
+
+    # ====== 完全信息搜索 ======
+
+    def solve(self, hands: Sequence[Sequence[int]], to_move: int, last: Optional[Move] = None,
+              last_player: int = None) -> int:
+        """
+        完全信息局面的胜负：hands为三家的计数向量（座位序号 A=0, B=1, C=2），
+        返回 LANDLORD_WINS 或 FARMERS_WIN
+        """
+        if last is None or last.type == PASS:
+            last, last_player = None, to_move
+        codes = tuple(encode_hand(h) for h in hands)
+        if len(self.table) > self.max_table_size:
+            self.table.clear()
+        return self._search(codes, to_move, last, last_player, FARMERS_WIN, LANDLORD_WINS)
+
+    def _search(self, codes: tuple, turn: int, last: Optional[Move], last_player: int,
+                alpha: int, beta: int) -> int:
+        self.nodes += 1
+        if last_player == turn:
+            # 其余两家都Pass，重新首发
+            last = None
+        key = (codes, last, turn, (last_player - turn) % 3)
+        cached = self.table.get(key)
+        if cached is not None:
+            return cached
+
+        counts = decode_hand(codes[turn])
+        total = sum(counts)
+        maximizing = SEATS[turn] == LANDLORD_SEAT
+        best = FARMERS_WIN if maximizing else LANDLORD_WINS
+        next_turn = (turn + 1) % 3
+        for move in sorted(legal_moves(counts, last), key=lambda m: _order_key(m, total)):
+            if move.type == PASS:
+                value = self._search(codes, next_turn, last, last_player, alpha, beta)
+            elif len(move.cards) == total:
+                value = LANDLORD_WINS if maximizing else FARMERS_WIN
+            else:
+                child = list(codes)
+                child[turn] = encode_hand(remove_move(counts, move))
+                value = self._search(tuple(child), next_turn, move, turn, alpha, beta)
+            if maximizing:
+                best = max(best, value)
+                alpha = max(alpha, best)
+            else:
+                best = min(best, value)
+                beta = min(beta, best)
+            if alpha >= beta:
+                break
+        # 胜负只有两种取值，只有找到本方必胜时才会剪枝，因此best总是精确值
+        self.table[key] = best
+        return best
+
+    def winning_moves(self, hands: Sequence[Sequence[int]], to_move: int, last: Optional[Move] = None,
+                      last_player: int = None) -> List[Move]:
+        """完全信息局面下to_move一方所有必胜的走法"""
+        if last is None or last.type == PASS or last_player == to_move:
+            last, last_player = None, to_move
+        counts = tuple(hands[to_move])
+        return [move for move in legal_moves(counts, last)
+                if self._wins_after(hands, to_move, move, last, last_player)]
+
+    def _wins_after(self, hands, me: int, move: Move, last, last_player) -> bool:
+        """me走move之后本方阵营是否必胜"""
+        my_team = LANDLORD_WINS if SEATS[me] == LANDLORD_SEAT else FARMERS_WIN
+        next_turn = (me + 1) % 3
+        if move.type == PASS:
+            child_hands, child_last, child_player = hands, last, last_player
+        else:
+            remaining = remove_move(hands[me], move)
+            if not any(remaining):
+                return True
+            child_hands = list(hands)
+            child_hands[me] = remaining
+            child_last, child_player = move, me
+        if len(self.table) > self.max_table_size:
+            self.table.clear()
+        codes = tuple(encode_hand(h) for h in child_hands)
+        return self._search(codes, next_turn, child_last, child_player,
+                            FARMERS_WIN, LANDLORD_WINS) == my_team
+
+    # ====== 对手手牌未知 ======
+
+    def proven_move(self, hand: Sequence[int], unseen: Sequence[int], opponent_counts: Dict[str, int],
+                    my_seat: str, last: Optional[Move] = None, last_player: str = None) -> Optional[Move]:
+        """
+        对手手牌未知时保证必胜的走法：存在一套只依赖已看到的出牌的后续打法，无论未出现的牌
+        如何分配、其他两家如何出牌都能获胜；没有这样的走法（或张数超过阈值、对手张数与
+        未出现的牌数不一致）时返回None
+        """
+        me = SEATS.index(my_seat)
+        opponents = [seat for seat in SEATS if seat != my_seat]
+        sizes = [opponent_counts.get(seat, 0) for seat in opponents]
+        if sum(sizes) != sum(unseen) or sum(hand) + sum(unseen) > self.threshold:
+            return None
+        if last is None or last.type == PASS:
+            last, last_index = None, me
+        else:
+            last_index = SEATS.index(last_player) if last_player else (me - 1) % 3
+
+        worlds = set()
+        for first, second in _splits(unseen, sizes[0]):
+            world = [0, 0, 0]
+            world[me] = encode_hand(hand)
+            world[SEATS.index(opponents[0])] = encode_hand(first)
+            world[SEATS.index(opponents[1])] = encode_hand(second)
+            worlds.add(tuple(world))
+        worlds = frozenset(worlds)
+        if len(self.table) > self.max_table_size:
+            self.table.clear()
+        candidates = sorted(legal_moves(tuple(hand), last),
+                            key=lambda m: _order_key(m, sum(hand)))
+        for move in candidates:
+            if self._guaranteed_after(worlds, me, me, move, last, last_index):
+                return move
+        return None
+
+    def _guaranteed(self, worlds: frozenset, me: int, turn: int, last: Optional[Move],
+                    last_player: int) -> bool:
+        """
+        worlds为仍然可能的三家手牌编码的集合，返回me一方是否有只依赖看得到的出牌的必胜打法。
+        置换表的键以分配集合开头，不会与完全信息搜索的键冲突
+        """
+        self.nodes += 1
+        if last_player == turn:
+            last = None
+        key = (worlds, last, turn, (last_player - turn) % 3, me)
+        cached = self.table.get(key)
+        if cached is not None:
+            return cached
+
+        if turn == me:
+            # 自己的手牌在每种分配下都相同，选一个对所有分配都必胜的走法
+            counts = decode_hand(next(iter(worlds))[me])
+            total = sum(counts)
+            result = any(self._guaranteed_after(worlds, me, turn, move, last, last_player)
+                         for move in sorted(legal_moves(counts, last), key=lambda m: _order_key(m, total)))
+        else:
+            # 其他两家（包括队友）可能出的每一手牌都要应对；看到这手牌后只剩能出它的分配
+            groups: Dict[Move, list] = {}
+            for world in worlds:
+                for move in legal_moves(decode_hand(world[turn]), last):
+                    groups.setdefault(move, []).append(world)
+            result = all(self._guaranteed_after(frozenset(group), me, turn, move, last, last_player)
+                         for move, group in groups.items())
+        self.table[key] = result
+        return result
+
+    def _guaranteed_after(self, worlds: frozenset, me: int, turn: int, move: Move,
+                          last: Optional[Move], last_player: int) -> bool:
+        """turn走move之后me一方是否仍有必胜打法（各座位张数公开，出完牌的分配要么全有要么全无）"""
+        next_turn = (turn + 1) % 3
+        if move.type == PASS:
+            return self._guaranteed(worlds, me, next_turn, last, last_player)
+        children = set()
+        for world in worlds:
+            remaining = remove_move(decode_hand(world[turn]), move)
+            if not any(remaining):
+                # 出完牌的一方所在的阵营获胜
+                return (SEATS[turn] == LANDLORD_SEAT) == (SEATS[me] == LANDLORD_SEAT)
+            child = list(world)
+            child[turn] = encode_hand(remaining)
+            children.add(tuple(child))
+        return self._guaranteed(frozenset(children), me, next_turn, move, turn)
+
+    def decision(self, hand: list, prev_ranks: list, history_plays: list, my_seat: str,
+                 last_player: str = None, opponent_counts: Dict[str, int] = None) -> Optional[dict]:
+        """
+        以决策输出格式给出残局的必胜走法，局面不在残局范围内或没有必胜走法时返回None。
+        history_plays 与 game_state 中的历史出牌格式相同，opponent_counts 缺省时按开局张数减去已出牌数推算
+        """
+        try:
+            counts = hand_counts(hand)
+            last = classify(prev_ranks)
+            played = [0] * NUM_RANKS
+            played_by_seat = {seat: 0 for seat in SEATS}
+            for play in history_plays or []:
+                ranks = play.get("牌") or []
+                for idx, n in enumerate(hand_counts(ranks)):
+                    played[idx] += n
+                if play.get("玩家") in played_by_seat:
+                    played_by_seat[play["玩家"]] += len(ranks)
+        except ValueError:
+            return None
+        if not hand or last is None:
+            return None
+        unseen = [FULL_DECK[i] - counts[i] - played[i] for i in range(NUM_RANKS)]
+        if any(n < 0 for n in unseen):
+            # 历史记录与手牌矛盾
+            return None
+        if opponent_counts is None:
+            opponent_counts = {seat: INITIAL_CARDS[seat] - played_by_seat[seat]
+                               for seat in SEATS if seat != my_seat}
+
+        move = self.proven_move(counts, unseen, opponent_counts, my_seat, last, last_player)
+        if move is None:
+            return None
+        recommended = move_to_dict(move)
+        action = f"先出{'、'.join(recommended['cards'])}" if recommended["cards"] else "先Pass"
+        return {
+            "recommended_move": recommended,
+            "backup_move": dict(recommended),
+            "reasoning": [f"残局求解：三家共剩{sum(counts) + sum(unseen)}张牌，"
+                          f"{action}，无论对手手牌如何分配、其他两家如何出牌，都有必胜的后续打法"]
+        }
+
+
+def _splits(unseen: Sequence[int], first_size: int):
+    """未出现的牌分给两个对手的所有分配：(第一个对手的计数向量, 第二个对手的计数向量)"""
+    ranks = [i for i in range(NUM_RANKS) if unseen[i]]
+
+    def expand(pos: int, remaining: int, chosen: list):
+        if pos == len(ranks):
+            if remaining == 0:
+                first = [0] * NUM_RANKS
+                for idx, n in zip(ranks, chosen):
+                    first[idx] = n
+                yield tuple(first), tuple(unseen[i] - first[i] for i in range(NUM_RANKS))
+            return
+        idx = ranks[pos]
+        for n in range(min(unseen[idx], remaining) + 1):
+            chosen.append(n)
+            yield from expand(pos + 1, remaining - n, chosen)
+            chosen.pop()
+
+    yield from expand(0, first_size, [])
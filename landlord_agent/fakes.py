@@ -0,0 +1,63 @@
+"""
+测试用的模拟对象：固定返回决策的模型客户端、chat.completions 的返回值与OpenAI客户端替身
+"""
+import json
+import time
+from types import SimpleNamespace
+
+
+def model_response(*cards, combo_type="单张", **extra) -> str:
+    """模型返回的决策JSON；不给cards时为Pass"""
+    if cards:
+        move = {"action": "play", "cards": list(cards), "type": combo_type}
+    else:
+        move = {"action": "pass", "cards": [], "type": "Pass"}
+    return json.dumps(dict({"recommended_move": move}, **extra), ensure_ascii=False)
+
+
+class FakeClient:
+    """替换 agent.qwen 的模型客户端：延迟delay秒后返回response（或抛出error），记录收到的局面"""
+
+    def __init__(self, response: str = None, delay: float = 0.0, error: Exception = None):
+        self.response = model_response("2") if response is None else response
+        self.delay = delay
+        self.error = error
+        self.states = []
+
+    @property
+    def calls(self) -> int:
+        return len(self.states)
+
+    def get_card_recommendation(self, state):
+        self.states.append(state)
+        if self.delay:
+            time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+
+class NoCallClient:
+    """本地决策的局面不应调用模型"""
+
+    def get_card_recommendation(self, state):
+        raise AssertionError("不应调用模型")
+
+
+class StatusError(Exception):
+    """带HTTP状态码的API错误"""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def completion(content: str, usage=None):
+    """chat.completions.create 的返回值"""
+    message = SimpleNamespace(content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+def openai_stub(completions):
+    """以completions作为 chat.completions 的OpenAI客户端替身"""
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions))
@@ -0,0 +1,97 @@
+"""
+牌局跟踪：各座位剩余张数、未出现的牌和历史出牌汇总
+
+每条出牌记录只更新出牌座位的张数和已出牌的位图（54位，位序号为 card_table 中的牌ID），
+不需要重新读取整个历史；重启后可以从 CardDB 的记录重建
+"""
+from typing import Dict, Iterable, List
+
+from card_table import CARD_ID, DECK_SIZE, RANK_CARD_IDS
+from play_notation import RANK_ORDER, SINGLE, BOMB, ROCKET, parse_play
+from rules_engine import SEATS, INITIAL_CARDS
+
+FULL_MASK = (1 << DECK_SIZE) - 1
+
+# 汇总中列出已出张数的大牌
+HIGH_RANKS = ['大王', '小王', '2', 'A']
+
+# 每个点数的牌在位图中的掩码
+RANK_MASKS = {rank: sum(1 << cid for cid in ids) for rank, ids in RANK_CARD_IDS.items()}
+
+
+class GameTracker:
+    """played_mask为已出牌的位图，remaining为各座位剩余张数，bombs为已出的炸弹和王炸"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.played_mask = 0
+        self.remaining: Dict[str, int] = dict(INITIAL_CARDS)
+        self.played_by_seat: Dict[str, int] = {seat: 0 for seat in SEATS}
+        self.bombs: List[str] = []
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict]) -> "GameTracker":
+        """从出牌记录（CardDB.get_all() 的格式）重建"""
+        tracker = cls()
+        for record in records:
+            tracker.record(record.get('player', ''), record.get('card', ''))
+        return tracker
+
+    @classmethod
+    def from_db(cls, db) -> "GameTracker":
+        return cls.from_records(db.get_records())
+
+    def record(self, player: str, card: str):
+        """记录一手牌：组合牌型不含花色，同一点数按规范顺序取第一张还没出过的牌"""
+        try:
+            play_type, ranks = parse_play(card)
+        except (IndexError, AttributeError):
+            return
+        if play_type in (BOMB, ROCKET):
+            self.bombs.append(f"{player}:{' '.join(ranks)}")
+        exact = CARD_ID.get(card) if play_type == SINGLE else None
+        for rank in ranks:
+            if rank not in RANK_CARD_IDS:
+                continue
+            if exact is not None and not self.played_mask >> exact & 1:
+                cid = exact
+            else:
+                cid = next((i for i in RANK_CARD_IDS[rank] if not self.played_mask >> i & 1), None)
+            if cid is None:
+                # 这个点数已经全部出过，记录有误
+                continue
+            self.played_mask |= 1 << cid
+            if player in self.remaining:
+                self.remaining[player] = max(0, self.remaining[player] - 1)
+                self.played_by_seat[player] += 1
+
+    @property
+    def unseen_mask(self) -> int:
+        """还没有出过的牌（包括自己的手牌）"""
+        return FULL_MASK & ~self.played_mask
+
+    def unseen_counts(self, hand: List[str] = ()) -> Dict[str, int]:
+        """未出现的牌的各点数张数（不含自己的手牌），只列出张数大于0的点数"""
+        held = {}
+        for rank in hand:
+            held[rank] = held.get(rank, 0) + 1
+        unseen = self.unseen_mask
+        counts = {}
+        for rank in RANK_ORDER:
+            n = bin(unseen & RANK_MASKS[rank]).count('1') - held.get(rank, 0)
+            if n > 0:
+                counts[rank] = n
+        return counts
+
+    def opponent_counts(self, my_seat: str) -> Dict[str, int]:
+        return {seat: self.remaining[seat] for seat in SEATS if seat != my_seat}
+
+    def summary(self) -> Dict[str, object]:
+        """历史出牌汇总：各座位已出张数、已出的炸弹、大牌已出张数"""
+        return {
+            "各座位已出张数": dict(self.played_by_seat),
+            "已出炸弹": list(self.bombs),
+            "大牌已出张数": {rank: bin(self.played_mask & RANK_MASKS[rank]).count('1') for rank in HIGH_RANKS}
+        }
@@ -0,0 +1,68 @@
+"""
+手牌拆分：把手牌拆成最少手数的合法牌型组合，并给出出牌相关的手牌特征
+
+最少手数用按计数向量记忆化的动态规划求解：点数最小的那张牌一定属于某一手牌，
+因此只需枚举包含该点数的走法，子问题为去掉这手牌后剩余的计数向量
+"""
+import copy
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+from rules_engine import (Move, NUM_RANKS, RANK_2, LITTLE_JOKER, BIG_JOKER, generate_moves, hand_counts,
+                          move_ranks, remove_move)
+
+# 记忆化的计数向量个数上限
+CACHE_SIZE = 1 << 16
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _decompose(counts: Tuple[int, ...]) -> Tuple[Move, ...]:
+    """最少手数的拆分方案（计数向量需为tuple）"""
+    lowest = next((i for i in range(NUM_RANKS) if counts[i]), None)
+    if lowest is None:
+        return ()
+    best = None
+    for move in generate_moves(counts):
+        if lowest not in move.cards:
+            continue
+        rest = _decompose(remove_move(counts, move))
+        if best is None or len(rest) + 1 < len(best):
+            best = (move,) + rest
+            if len(best) == 1:
+                break
+    return best
+
+
+def decompose(hand: Sequence) -> List[Move]:
+    """手牌点数列表 -> 最少手数的拆分方案"""
+    return list(_decompose(hand_counts(hand)))
+
+
+def min_plays(hand: Sequence) -> int:
+    """手牌至少要出几手才能出完"""
+    return len(decompose(hand))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _features(counts: Tuple[int, ...]) -> dict:
+    plan = _decompose(counts)
+    bomb_ranks = [i for i in range(LITTLE_JOKER) if counts[i] == 4]
+    return {
+        "最少出牌手数": len(plan),
+        "拆牌方案": [{"牌型": m.type, "牌": move_ranks(m)} for m in plan],
+        "控制牌张数": sum(counts[RANK_2:]),
+        "炸弹数": len(bomb_ranks) + (1 if counts[LITTLE_JOKER] and counts[BIG_JOKER] else 0)
+    }
+
+
+def hand_features(hand: list) -> dict:
+    """
+    手牌特征：最少出牌手数、拆牌方案、控制牌（2和王）张数、可用炸弹数（含王炸）。
+    手牌中有无法识别的点数时返回空字典
+    """
+    try:
+        counts = hand_counts(hand)
+    except ValueError:
+        return {}
+    # 缓存的结果是共享的，返回副本以免调用方修改
+    return copy.deepcopy(_features(counts))
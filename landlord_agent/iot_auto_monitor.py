@@ -14,6 +14,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from bemfa_client import BemfaClient
 from landlord_agent import LandlordAgent
+from client_registry import get_llm_client, prewarm_registered
 
 BEMFA_UID = os.getenv("BEMFA_UID") or ""
 BEMFA_TOPIC = os.getenv("BEMFA_TOPIC") or "2"
@@ -43,7 +44,8 @@ def call_ai_decision(hand_data):
         log(f"🤖 开始调用Qwen AI...")
         log(f"🃏 手牌数据: {hand_data}")
         
-        agent = LandlordAgent(api_key=QWEN_API_KEY)
+        # 模型客户端和连接池在进程内共享，不随每次触发重建
+        agent = LandlordAgent(api_key=QWEN_API_KEY, llm_client=get_llm_client(QWEN_API_KEY))
         
         # 清空数据库，避免历史数据影响当前决策
         agent.db.clear()
@@ -81,6 +83,10 @@ def main():
     print("="*60 + "\n")
     
     bemfa_client = BemfaClient(uid=BEMFA_UID)
+    if QWEN_API_KEY:
+        # 提前创建共享的模型客户端并在后台建立TLS连接，第一次触发无需等待建连
+        get_llm_client(QWEN_API_KEY)
+        prewarm_registered()
     last_data = None
     trigger_count = 0
     
@@ -9,6 +9,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from bemfa_client import BemfaClient
 from landlord_agent import LandlordAgent
+from client_registry import get_llm_client, prewarm_registered
 import time
 
 BEMFA_UID = os.getenv("BEMFA_UID") or ""
@@ -22,6 +23,9 @@ class IoTTriggerAgent:
         self.last_message = None
         self.running = True
         self.call_count = 0
+        # 每次触发新建的LandlordAgent共用同一个模型客户端和连接池，启动时预热连接
+        self.llm_client = get_llm_client(DEEPSEEK_API_KEY) if DEEPSEEK_API_KEY else None
+        prewarm_registered()
     
     def process_message(self, message: str):
         """处理新消息并调用大模型"""
@@ -34,7 +38,7 @@ class IoTTriggerAgent:
         print(f"📥 获取到新手牌数据: {message}")
         
         try:
-            agent = LandlordAgent(api_key=DEEPSEEK_API_KEY)
+            agent = LandlordAgent(api_key=DEEPSEEK_API_KEY, llm_client=self.llm_client)
             
             hand = message.split(',')
             hand = [card.strip() for card in hand if card.strip()]
@@ -1,8 +1,29 @@
+import asyncio
 import json
 import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from pathlib import Path
-from qwen_client import QwenClient
+from typing import Any, Iterator, List, Optional, Tuple
+from llm_router import create_llm_client
 from database import CardDB
+from partial_json import IncrementalJSONScanner
+from play_notation import PASS, parse_play, key_rank
+from rules_engine import PASS_MOVE, LANDLORD_SEAT, classify, hand_counts, legal_moves, move_to_dict
+from move_validator import MoveValidator, VALID, REPAIRED_BACKUP
+from local_policy import engine_decision
+from endgame_solver import EndgameSolver
+from hand_analysis import hand_features
+from game_tracker import GameTracker
+from prompt_compaction import PromptCompactor
+from decision_cache import CachingClient, DecisionCache
+from ttl_cache import make_cache_key
+from circuit_breaker import CircuitOpenError
+
+# 决策来源：规则引擎直接给出 / 模型给出
+SOURCE_ENGINE = "engine"
+SOURCE_LLM = "llm"
 
 LANDLORD_RULES = """
 斗地主游戏规则：
@@ -12,102 +33,167 @@ LANDLORD_RULES = """
 4. 每轮必须出比上一手牌更大的相同牌型
 """
 
+def last_play_state(prev_type: str, prev_ranks: list, role: str, last_player: str = None) -> dict:
+    """局面中的桌面待跟牌部分；last_player为上一手的出牌座位，未知时为None"""
+    has_prev = prev_type != PASS
+    return {
+        "是否存在": has_prev,
+        "出牌者": last_player if has_prev else None,
+        "牌型": prev_type if has_prev else "无",
+        "牌": prev_ranks,
+        "关键强度点": key_rank(prev_ranks),
+        "张数": len(prev_ranks),
+        "当前状态": "必须首发出牌，绝对不能选择Pass" if not has_prev else "必须跟牌，手牌中有比上一手更大的牌时绝对不能Pass",
+        "提示信息": "根据规则，当你有能压制上一手牌的牌时，必须出牌压制，不能选择Pass。请严格遵循牌面大小规则：大王>小王>2>A>K>Q>J>10>9>8>7>6>5>4>3"
+    }
+
+
+def hand_state(hand: list, analysis: bool = True) -> dict:
+    """局面中的我的手牌部分；analysis为False时不计算手牌分析（由调用方在锁外补上）"""
+    state = {
+        "表示格式": "仅点数不含花色",
+        "牌": hand,
+        "张数": len(hand)
+    }
+    if analysis:
+        state["手牌分析"] = hand_features(hand)
+    return state
+
+
+class EarlyDecision:
+    """提前返回的决策：move在recommended_move闭合时即可用，完整结果通过result()获取"""
+    
+    def __init__(self, move: Optional[dict], future: Future, cancel_event: threading.Event):
+        self.move = move
+        self.future = future
+        self._cancel_event = cancel_event
+    
+    def result(self, timeout: float = None):
+        """等待并返回完整决策（含reasoning），与decide()的返回值相同"""
+        return self.future.result(timeout)
+    
+    def cancel(self):
+        """不再需要推理过程时停止接收剩余输出"""
+        self._cancel_event.set()
+    
+    def add_done_callback(self, fn):
+        self.future.add_done_callback(fn)
+
+
 class LandlordAgent:
-    def __init__(self, api_key: str = None, db_path: str = None):
-        self.qwen = QwenClient(api_key)
+    def __init__(self, api_key: str = None, db_path: str = None, llm_client=None):
+        """llm_client为共享的模型客户端（见 client_registry.get_llm_client），缺省时为本实例单独创建"""
+        # 相同局面复用模型决策；DECISION_CACHE_PATH 启用持久层，DECISION_CACHE_BYPASS 用于评估时关闭缓存
+        self.decision_cache = DecisionCache(db_path=os.getenv("DECISION_CACHE_PATH") or None,
+                                            bypass=bool(os.getenv("DECISION_CACHE_BYPASS")))
+        self.qwen = CachingClient(llm_client or create_llm_client(api_key), self.decision_cache)
         self.db = CardDB(db_path)
         self.current_hand = []
         self.current_round = 0
         self.prev_card = None
+        self.prev_player = None
         self.current_role = "农民"
+        # 多线程共享同一个agent时，record/set_hand/局面快照需要在锁内完成
+        self.lock = threading.RLock()
+        # 模型输出的合法性校验与修复
+        self.validator = MoveValidator()
+        # 残局精确求解（剩余牌数不超过 endgame.threshold 时使用）
+        self.endgame = EndgameSolver()
+        # 内存中的结构化历史出牌与牌局跟踪（各座位剩余张数、未出现的牌），
+        # 随record增量更新；数据库只负责持久化，启动时读取一次
+        self.history_plays = []
+        self.tracker = GameTracker()
+        self._db_generation = self.db.generation
+        self._append_history(self.db.get_records())
+        # 发送给模型前压缩历史出牌（最近出牌窗口 + 汇总，受token预算约束）
+        self.compactor = PromptCompactor()
     
     def record(self, player: str, round: int, card: str, weighting: float = 1.0):
-        self.db.add(player, round, card, weighting)
+        with self.lock:
+            self.db.add(player, round, card, weighting)
+            self._append_history([{"player": player, "round": round, "card": card}])
     
     def record_batch(self, records: list):
-        self.db.add_batch(records)
-    
-    def set_hand(self, hand: list, round: int, prev_card: str = None, role: str = "农民"):
-        self.current_hand = hand
-        self.current_round = round
-        self.prev_card = prev_card
-        self.current_role = role
-    
-    def decide(self) -> str:
-        # 获取历史数据
-        history_records_json = self.db.get_all()
-        
-        # 将JSON字符串转换为Python列表
-        history_records = json.loads(history_records_json) if history_records_json else []
-        
-        # 将历史数据转换为结构化格式
-        history_plays = []
-        if history_records:
-            for record in history_records:
-                # 从字典中提取信息
-                player = record.get('player', '')
-                round_num = record.get('round', 1)
-                card = record.get('card', '')
-                
-                # 提取牌的点数（去掉花色）
-                rank = card.split()[-1] if card and card != '无' else ''
-                
-                history_plays.append({
-                    "回合": int(round_num),
-                    "玩家": player,
-                    "动作": "出牌" if card and card != '无' else "Pass",
-                    "牌型": "单张" if card and card != '无' else "Pass",
-                    "牌": [rank] if card and card != '无' else []
-                })
-        
-        # 构建结构化游戏状态
+        with self.lock:
+            self.db.add_batch(records)
+            self._append_history(records)
+    
+    def _append_history(self, records: list):
+        self._sync_with_db()
+        for record in records:
+            player = record.get('player', '')
+            card = record.get('card', '')
+            # 解析牌型和点数（去掉花色）
+            play_type, ranks = parse_play(card)
+            self.history_plays.append({
+                "回合": int(record.get('round', 1)),
+                "玩家": player,
+                "动作": "Pass" if play_type == PASS else "出牌",
+                "牌型": play_type,
+                "牌": ranks
+            })
+            self.tracker.record(player, card)
+    
+    def _sync_with_db(self):
+        """数据库被清空后内存中的历史和跟踪状态随之重置"""
+        if self._db_generation != self.db.generation:
+            self.history_plays = []
+            self.tracker.reset()
+            self._db_generation = self.db.generation
+    
+    def set_hand(self, hand: list, round: int, prev_card: str = None, role: str = "农民",
+                 last_player: str = None):
+        """last_player为打出prev_card的座位（A/B/C），未知时残局求解不会使用该局面"""
+        with self.lock:
+            self.current_hand = list(hand)
+            self.current_round = round
+            self.prev_card = prev_card
+            self.prev_player = last_player
+            self.current_role = role
+    
+    def build_game_state(self) -> dict:
+        """根据当前手牌和历史记录构建发送给模型的结构化局面（快照）"""
+        with self.lock:
+            game_state = self._build_game_state()
+        # 手牌分析（冷启动的20张手牌可达数十毫秒）在锁外计算，不阻塞其他线程的record/set_hand
+        hand = game_state["局面"]["我的手牌"]
+        hand["手牌分析"] = hand_features(hand["牌"])
+        return game_state
+    
+    def position_key(self) -> str:
+        """
+        牌局进度的标识（已出的牌、各座位剩余张数、已出的炸弹），每记录一手牌就会改变；
+        用于在记录新的出牌之前判断语音命令是否重复
+        """
+        with self.lock:
+            self._sync_with_db()
+            return make_cache_key('position', self.tracker.played_mask, self.tracker.remaining,
+                                  self.tracker.bombs)
+    
+    def _build_game_state(self) -> dict:
+        # 历史出牌在record时已转换为结构化格式，这里只取快照
+        self._sync_with_db()
+        history_plays = list(self.history_plays)
+        
+        # 桌面待跟牌（单张或组合牌型）
+        prev_type, prev_ranks = parse_play(self.prev_card)
+        
+        my_seat = LANDLORD_SEAT if self.current_role == "地主" else "B"
+        
+        # 构建结构化游戏状态；元信息、规则、玩家与阵营是固定内容，
+        # 由 QwenClient 作为不变的提示词前缀发送
         game_state = {
-            "元信息": {
-                "游戏": "斗地主",
-                "版本": "prompt_v1.0",
-                "语言": "zh-CN",
-                "输出要求": "只输出JSON（不要Markdown、不要多余文字）"
-            },
-            "规则": {
-                "牌面大小(从大到小)": ["大王", "小王", "2", "A", "K", "Q", "J", "10", "9", "8", "7", "6", "5", "4", "3"],
-                "跟牌规则": "当桌面有待跟牌时，如果手中有同牌型且更大的牌，必须跟牌压制上一手；只有当没有能压制的牌时，才能选择Pass",
-                "火箭": "王炸（大小王）压制一切",
-                "炸弹": "四张同点数可压制任何非火箭牌型",
-                "顺子相关": "2和王不能参与顺子"
-            },
-            "玩家与阵营": [
-                {"座位": "A", "阵营": "地主"},
-                {"座位": "B", "阵营": "农民"},
-                {"座位": "C", "阵营": "农民"}
-            ],
             "局面": {
-                "我的座位": "A" if self.current_role == "地主" else "B",
+                "我的座位": my_seat,
                 "我的阵营": self.current_role,
-                "轮到谁": "A" if self.current_role == "地主" else "B",  # 确保轮到谁与我的座位一致
+                "轮到谁": my_seat,  # 确保轮到谁与我的座位一致
                 "阶段": "出牌",
-                "桌面待跟牌(last_play)": {
-                    "是否存在": True if self.prev_card and self.prev_card != '无' else False,
-                    "出牌者": "B" if self.current_role == "地主" else "A",
-                    "牌型": "单张" if self.prev_card and self.prev_card != '无' else "无",
-                    "牌": [self.prev_card.split()[-1]] if self.prev_card and self.prev_card != '无' else [],
-                    "关键强度点": self.prev_card.split()[-1] if self.prev_card and self.prev_card != '无' else "",
-                    "张数": 1 if self.prev_card and self.prev_card != '无' else 0,
-                    "当前状态": "必须首发出牌，绝对不能选择Pass" if not (self.prev_card and self.prev_card != '无') else "必须跟牌，手牌中有比上一手更大的牌时绝对不能Pass",
-                    "提示信息": "根据规则，当你有能压制上一手牌的牌时，必须出牌压制，不能选择Pass。请严格遵循牌面大小规则：大王>小王>2>A>K>Q>J>10>9>8>7>6>5>4>3"
-                },
+                "桌面待跟牌(last_play)": last_play_state(prev_type, prev_ranks, self.current_role, self.prev_player),
                 "历史出牌": history_plays,
-                "我的手牌": {
-                    "表示格式": "仅点数不含花色",
-                    "牌": self.current_hand,
-                    "张数": len(self.current_hand)
-                },
-                "对手剩余张数": {
-                    "B": 15,  # 假设值，实际应用中需要跟踪
-                    "C": 15   # 假设值，实际应用中需要跟踪
-                } if self.current_role == "地主" else {
-                    "A": 12,  # 假设值，实际应用中需要跟踪
-                    "C": 15   # 假设值，实际应用中需要跟踪
-                },
+                "我的手牌": hand_state(list(self.current_hand), analysis=False),
+                "历史汇总": self.tracker.summary(),
+                "对手剩余张数": self.tracker.opponent_counts(my_seat),
+                "未出现的牌": self.tracker.unseen_counts(self.current_hand),
                 "不完全信息推断设置": {
                     "策略": "保守（偏最坏情况/近似minimax）",
                     "默认高风险牌假设可能存在": ["大王", "小王", "2", "炸弹"]
@@ -118,16 +204,346 @@ class LandlordAgent:
             }
         }
         
+        return game_state
+    
+    def decide(self, game_state: dict = None, deadline_ms: float = None) -> str:
+        """
+        获取出牌决策；传入game_state时直接使用该快照，模型调用在锁外进行。
+        强制局面和可以精确求解的残局不调用模型。指定deadline_ms时模型与本地策略同时进行，超时或模型结果不合法时返回本地策略的决策
+        """
+        started = time.monotonic()
+        local = self._local_decision(game_state)
+        if isinstance(local, dict):
+            return local
+        game_state = local[1]
+        if deadline_ms is not None:
+            return self._decide_with_deadline(game_state, deadline_ms, started)
+        
         # 获取推荐
-        response_str = self.qwen.get_card_recommendation(game_state)
+        prompt_state, prompt_tokens = self.compactor.compact(game_state)
+        try:
+            response_str = self.qwen.get_card_recommendation(prompt_state)
+        except CircuitOpenError as e:
+            return self._circuit_open_decision(game_state, e)
+        return self._validate(self._parse_response(response_str), game_state, prompt_tokens)
+    
+    async def decide_async(self, game_state: dict = None):
+        """
+        decide的异步版本：局面快照、规则引擎与残局求解在线程中进行，模型调用使用异步客户端，
+        等待模型时不占用线程
+        """
+        local = await asyncio.to_thread(self._local_decision, game_state)
+        if isinstance(local, dict):
+            return local
+        game_state = local[1]
+        prompt_state, prompt_tokens = self.compactor.compact(game_state)
+        request = getattr(self.qwen, "get_card_recommendation_async", None)
+        try:
+            if request is not None:
+                response_str = await request(prompt_state)
+            else:
+                # 只有同步接口的客户端在线程中调用
+                response_str = await asyncio.to_thread(self.qwen.get_card_recommendation, prompt_state)
+        except CircuitOpenError as e:
+            return self._circuit_open_decision(game_state, e)
+        return self._validate(self._parse_response(response_str), game_state, prompt_tokens)
+    
+    def _circuit_open_decision(self, game_state: dict, error: CircuitOpenError) -> dict:
+        """模型熔断期间不等待重试，直接用本地策略决策；本地策略无法识别局面时仍抛出异常"""
+        fallback = engine_decision(*self._position(game_state))
+        if fallback is None:
+            raise error
+        decision = self._validate(dict(fallback, decision_source=SOURCE_ENGINE), game_state)
+        decision["llm_status"] = "circuit_open"
+        return decision
+    
+    def _local_decision(self, game_state: dict = None):
+        """强制局面或残局的本地决策；需要模型时返回 (None, 局面快照)"""
+        forced = self._forced_decision(game_state)
+        if forced is not None:
+            return forced
+        if game_state is None:
+            game_state = self.build_game_state()
+        endgame = self._endgame_decision(game_state)
+        if endgame is not None:
+            return endgame
+        return None, game_state
+    
+    async def decide_many(self, states: List[dict], concurrency: int = 64) -> list:
+        """
+        批量异步决策（评估用），最多concurrency个同时进行，结果按states的顺序返回；
+        单个决策失败时对应位置为异常对象
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def run(state):
+            async with semaphore:
+                return await self.decide_async(state)
+        
+        return await asyncio.gather(*(run(state) for state in states), return_exceptions=True)
+    
+    def _decide_with_deadline(self, game_state: dict, deadline_ms: float, started: float) -> dict:
+        """
+        在截止时间内等待模型：按时返回且合法（或backup_move合法）时用模型的决策，
+        否则用本地策略的决策。结果中记录胜出来源、模型状态和剩余时间
+        """
+        deadline = started + deadline_ms / 1000.0
+        future = Future()
+        prompt_state, prompt_tokens = self.compactor.compact(game_state)
+        
+        def call_llm():
+            try:
+                future.set_result(self.qwen.get_card_recommendation(prompt_state))
+            except Exception as e:
+                future.set_exception(e)
         
+        # 超时后模型调用在后台自行结束，结果丢弃
+        threading.Thread(target=call_llm, name="decide-llm", daemon=True).start()
+        fallback = engine_decision(*self._position(game_state))
+        if fallback is None:
+            # 本地策略无法识别局面，只能在截止时间内等待模型
+            try:
+                response_str = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                raise TimeoutError(f"模型未在{deadline_ms:g}ms内返回，本地策略无法识别局面") from None
+            decision = self._validate(self._parse_response(response_str), game_state, prompt_tokens)
+            llm_status = "ok"
+        else:
+            try:
+                response_str = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                decision = self._validate(self._parse_response(response_str), game_state, prompt_tokens)
+                status = decision.get("validation", {}).get("status") if isinstance(decision, dict) else None
+                llm_status = "ok" if status in (VALID, REPAIRED_BACKUP) else "illegal"
+            except FutureTimeoutError:
+                llm_status = "timeout"
+            except CircuitOpenError:
+                llm_status = "circuit_open"
+            except Exception as e:
+                print(f"模型决策失败，使用本地策略: {e}")
+                llm_status = "error"
+            if llm_status != "ok":
+                decision = self._validate(dict(fallback, decision_source=SOURCE_ENGINE), game_state)
+        
+        if isinstance(decision, dict):
+            decision["llm_status"] = llm_status
+            decision["deadline_ms"] = deadline_ms
+            decision["time_left_ms"] = round(max(0.0, deadline - time.monotonic()) * 1000.0, 1)
+        return decision
+    
+    def _parse_response(self, response_str: str):
         try:
             # 解析JSON响应
             response = json.loads(response_str)
+            if isinstance(response, dict):
+                response["decision_source"] = SOURCE_LLM
             return response
         except json.JSONDecodeError:
             # 如果JSON解析失败，返回原始字符串
             return response_str
+    
+    def _validate(self, decision, game_state: dict, prompt_tokens: int = None):
+        """按局面中的手牌和待跟牌校验模型决策，不合法时本地修复"""
+        decision = self.validator.validate(decision, *self._position(game_state))
+        if isinstance(decision, dict):
+            decision.setdefault("decision_source", SOURCE_LLM)
+            if prompt_tokens is not None:
+                decision["prompt_tokens"] = prompt_tokens
+        return decision
+    
+    def get_prompt_stats(self) -> dict:
+        """
+        发送给模型的提示词统计：决策次数、估计的token数（累计/平均/最近一次）、省略的早期出牌手数，
+        以及API返回的token用量和前缀缓存命中情况（api）
+        """
+        stats = self.compactor.stats()
+        usage = getattr(self.qwen, "get_usage_stats", None)
+        stats["api"] = usage() if usage else None
+        return stats
+    
+    def get_decision_cache_stats(self) -> dict:
+        """决策缓存的命中统计（内存层/持久层命中、未命中、命中率）"""
+        return self.decision_cache.stats()
+    
+    def get_llm_stats(self) -> Optional[dict]:
+        """模型调用的重试次数、最终失败的请求数和熔断器状态；客户端不支持时返回None"""
+        stats = getattr(self.qwen, "get_resilience_stats", None)
+        return stats() if stats else None
+    
+    def get_validation_stats(self) -> dict:
+        """模型决策的校验统计：合法、用backup_move修复、用最接近的合法走法修复、无法解析等次数"""
+        return self.validator.stats()
+    
+    def _position(self, game_state: dict = None) -> Tuple[list, list]:
+        """(我的手牌, 桌面待跟牌的点数)；没有game_state时直接读取当前状态，无需构建完整局面"""
+        if game_state is None:
+            with self.lock:
+                return list(self.current_hand), parse_play(self.prev_card)[1]
+        situation = game_state.get("局面", {})
+        last_play = situation.get("桌面待跟牌(last_play)", {})
+        prev_ranks = last_play.get("牌", []) if last_play.get("是否存在") else []
+        return list(situation.get("我的手牌", {}).get("牌", [])), list(prev_ranks)
+    
+    def _forced_decision(self, game_state: dict = None) -> Optional[dict]:
+        """
+        不需要模型的局面由规则引擎直接给出决策：
+          - 跟牌时没有能压过上一手的牌，只能Pass
+          - 首发时只剩一张牌
+          - 剩余手牌本身就是一手合法的牌（且能压过上一手），一次出完
+        其他局面返回None
+        """
+        hand, prev_ranks = self._position(game_state)
+        if not hand:
+            return None
+        try:
+            counts = hand_counts(hand)
+            last = classify(prev_ranks)
+            whole_hand = classify(hand)
+        except ValueError:
+            return None
+        if last is None:
+            return None
+        
+        if whole_hand is not None and whole_hand in legal_moves(counts, last):
+            move = whole_hand
+            reasoning = [f"剩余手牌{'、'.join(hand)}可以作为一手{move.type}一次出完"]
+        elif last.type != PASS and legal_moves(counts, last) == [PASS_MOVE]:
+            move = PASS_MOVE
+            reasoning = [f"手牌中没有能压过上一手{last.type}{'、'.join(prev_ranks)}的牌，只能Pass"]
+        else:
+            return None
+        
+        recommended = move_to_dict(move)
+        return {
+            "recommended_move": recommended,
+            "backup_move": dict(recommended),
+            "reasoning": reasoning,
+            "decision_source": SOURCE_ENGINE
+        }
+    
+    def _endgame_decision(self, game_state: dict) -> Optional[dict]:
+        """残局中不依赖对手手牌分配、保证必胜的走法，由求解器直接给出；其他局面返回None"""
+        hand, prev_ranks = self._position(game_state)
+        situation = game_state.get("局面", {})
+        last_play = situation.get("桌面待跟牌(last_play)", {})
+        if last_play.get("是否存在") and not last_play.get("出牌者"):
+            # 不知道上一手是谁出的就无法确定之后的出牌顺序
+            return None
+        decision = self.endgame.decision(
+            hand, prev_ranks, situation.get("历史出牌", []),
+            my_seat=situation.get("我的座位", "B"),
+            last_player=last_play.get("出牌者") if last_play.get("是否存在") else None,
+            opponent_counts=situation.get("对手剩余张数")
+        )
+        if decision is not None:
+            decision["decision_source"] = SOURCE_ENGINE
+        return decision
+    
+    def decide_stream(self, game_state: dict = None) -> Iterator[Tuple[str, Any]]:
+        """
+        流式获取出牌决策，依次产出事件：
+          ("token", 文本片段)   模型输出的每一段文本
+          ("move", dict)        recommended_move 一旦完整输出立即产出（仅一次）
+          ("decision", 结果)    完整决策，与decide()的返回值相同
+        """
+        forced = self._forced_decision(game_state)
+        if forced is not None:
+            yield "move", forced["recommended_move"]
+            yield "decision", forced
+            return
+        if game_state is None:
+            game_state = self.build_game_state()
+        endgame = self._endgame_decision(game_state)
+        if endgame is not None:
+            yield "move", endgame["recommended_move"]
+            yield "decision", endgame
+            return
+        
+        position = self._position(game_state)
+        prompt_state, prompt_tokens = self.compactor.compact(game_state)
+        scanner = IncrementalJSONScanner()
+        move_sent = False
+        for delta in self.qwen.stream_card_recommendation(prompt_state):
+            yield "token", delta
+            if scanner.feed(delta) and not move_sent:
+                move = scanner.get("recommended_move")
+                # 不合法的出牌不提前发送，等完整结果校验修复后再发送
+                if self.validator.check(move, *position) is not False:
+                    move_sent = True
+                    yield "move", move
+        
+        decision = self._validate(self._parse_response(scanner.text), game_state, prompt_tokens)
+        if not move_sent and isinstance(decision, dict) and decision.get("recommended_move"):
+            yield "move", decision["recommended_move"]
+        yield "decision", decision
+    
+    def decide_early(self, game_state: dict = None, keep_reasoning: bool = True) -> EarlyDecision:
+        """
+        流式获取决策，recommended_move一闭合就返回，不等待后面的reasoning。
+        keep_reasoning为True时在后台继续接收完整输出（EarlyDecision.result()），
+        否则立即关闭流，完整结果中reasoning为空
+        """
+        forced = self._forced_decision(game_state)
+        if forced is None:
+            if game_state is None:
+                game_state = self.build_game_state()
+            forced = self._endgame_decision(game_state)
+        if forced is not None:
+            future = Future()
+            future.set_result(forced)
+            return EarlyDecision(forced["recommended_move"], future, threading.Event())
+        
+        position = self._position(game_state)
+        prompt_state, prompt_tokens = self.compactor.compact(game_state)
+        move_ready = threading.Event()
+        cancel_event = threading.Event()
+        future = Future()
+        early = {}
+        
+        def consume():
+            scanner = IncrementalJSONScanner()
+            cancelled = False
+            try:
+                stream = self.qwen.stream_card_recommendation(prompt_state)
+                try:
+                    for delta in stream:
+                        if scanner.feed(delta) and not move_ready.is_set():
+                            move = scanner.get("recommended_move")
+                            # 不合法的出牌不提前返回，等完整结果校验修复
+                            if self.validator.check(move, *position) is not False:
+                                early["move"] = move
+                                move_ready.set()
+                                if not keep_reasoning:
+                                    cancel_event.set()
+                        if cancel_event.is_set():
+                            cancelled = True
+                            break
+                finally:
+                    stream.close()
+                
+                if cancelled:
+                    decision = {
+                        "recommended_move": scanner.get("recommended_move"),
+                        "reasoning": [],
+                        "reasoning_cancelled": True,
+                        "decision_source": SOURCE_LLM
+                    }
+                else:
+                    decision = self._parse_response(scanner.text)
+                future.set_result(self._validate(decision, game_state, prompt_tokens))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                move_ready.set()
+        
+        threading.Thread(target=consume, name="decide-early", daemon=True).start()
+        move_ready.wait()
+        
+        move = early.get("move")
+        if move is None:
+            # 流结束前没有得到完整的recommended_move，退化为等待完整结果
+            decision = future.result()
+            move = decision.get("recommended_move") if isinstance(decision, dict) else None
+        return EarlyDecision(move, future, cancel_event)
 
 def main():
     agent = LandlordAgent(api_key=os.getenv("QWEN_API_KEY") or "")
@@ -0,0 +1,317 @@
+"""
+多模型服务路由：同一接口后面接多个OpenAI兼容的服务（Qwen、DeepSeek），
+按每个服务的延迟（EWMA与p95）和错误率选择，并用对冲请求削减长尾延迟
+
+  - 主服务：按配置顺序选第一个可用的服务（熔断中或错误率过高的排到最后）
+  - 对冲：主服务超过其p95延迟仍未返回时，把同一请求发给备用服务，取先返回的结果；
+    对冲请求数不超过总请求数的 max_hedge_ratio，额外成本有上限
+  - 故障转移：主服务出错时改用备用服务
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from circuit_breaker import OPEN, CircuitOpenError
+from qwen_client import QwenClient
+
+# 延迟EWMA与错误率的平滑系数
+EWMA_ALPHA = 0.2
+# 计算p95的最近延迟样本数
+LATENCY_WINDOW = 200
+# 样本不足时的对冲等待时间（秒）
+DEFAULT_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY") or "3")
+MIN_HEDGE_SAMPLES = 20
+MAX_HEDGE_RATIO = float(os.getenv("LLM_MAX_HEDGE_RATIO") or "0.1")
+# 错误率（EWMA）超过该值的服务不作为主服务
+MAX_ERROR_RATE = 0.5
+
+
+class ProviderStats:
+    """
+    单个服务的请求数、错误数、延迟EWMA、错误率EWMA和最近的延迟样本
+    （记录成功的请求，以及被取消的请求已等待的时间）
+    """
+
+    def __init__(self, alpha: float = EWMA_ALPHA, window: int = LATENCY_WINDOW):
+        self.alpha = alpha
+        self.latencies = deque(maxlen=window)
+        self.latency_ewma: Optional[float] = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    def record(self, latency: Optional[float]):
+        """latency为None表示请求失败"""
+        self.requests += 1
+        failed = latency is None
+        self.error_rate += self.alpha * (float(failed) - self.error_rate)
+        if failed:
+            self.errors += 1
+            return
+        self.latencies.append(latency)
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma += self.alpha * (latency - self.latency_ewma)
+
+    def p95(self) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        p95 = self.p95()
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(self.error_rate, 4),
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            "latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "samples": len(self.latencies)
+        }
+
+
+class LLMRouter:
+    """
+    providers为 [(名称, 客户端)]，客户端需提供 get_card_recommendation(_async)，按顺序表示优先级。
+    hedge为False时只做故障转移；min_samples为使用p95作为对冲等待时间所需的样本数，
+    样本不足时等待default_delay秒
+    """
+
+    def __init__(self, providers: List[Tuple[str, Any]], hedge: bool = True,
+                 default_delay: float = DEFAULT_HEDGE_DELAY, min_samples: int = MIN_HEDGE_SAMPLES,
+                 max_hedge_ratio: float = MAX_HEDGE_RATIO, workers: int = 32):
+        if not providers:
+            raise ValueError("至少需要一个模型服务")
+        self.providers = list(providers)
+        self.hedge = hedge
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self.max_hedge_ratio = max_hedge_ratio
+        self._stats = {name: ProviderStats() for name, _ in self.providers}
+        self._lock = threading.Lock()
+        self._counts = {"requests": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0}
+        # 同步对冲时，落后的请求在线程中自行结束，结果只用于更新延迟统计
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='llm-router')
+
+    # ====== 选择服务 ======
+
+    def _available(self, client) -> bool:
+        breaker = getattr(client, "breaker", None)
+        return breaker is None or breaker.state != OPEN
+
+    def _order(self) -> List[Tuple[str, Any]]:
+        """可用的服务按 (错误率是否过高, 配置顺序) 排序"""
+        with self._lock:
+            unhealthy = {name for name, stats in self._stats.items() if stats.error_rate > MAX_ERROR_RATE}
+        order = [(name, client) for name, client in self.providers if self._available(client)]
+        return sorted(order, key=lambda provider: provider[0] in unhealthy)
+
+    def _hedge_delay(self, name: str) -> Optional[float]:
+        """主服务name的对冲等待时间；不对冲（未开启或超出对冲预算）时返回None"""
+        with self._lock:
+            if not self.hedge or self._counts["hedged"] >= self.max_hedge_ratio * self._counts["requests"]:
+                return None
+            stats = self._stats[name]
+            if len(stats.latencies) < self.min_samples:
+                return self.default_delay
+            return stats.p95()
+
+    def _route(self):
+        """(主服务, 备用服务, 对冲等待时间)；所有服务都熔断时抛出 CircuitOpenError"""
+        order = self._order()
+        if not order:
+            raise CircuitOpenError("所有模型服务熔断中")
+        with self._lock:
+            self._counts["requests"] += 1
+        primary = order[0]
+        secondary = order[1] if len(order) > 1 else None
+        delay = self._hedge_delay(primary[0]) if secondary else None
+        return primary, secondary, delay
+
+    def _record(self, name: str, latency: Optional[float]):
+        with self._lock:
+            self._stats[name].record(latency)
+
+    def _count(self, key: str):
+        with self._lock:
+            self._counts[key] += 1
+
+    # ====== 同步接口 ======
+
+    def _call(self, provider, state: Dict[str, Any]) -> str:
+        name, client = provider
+        started = time.monotonic()
+        try:
+            response = client.get_card_recommendation(state)
+        except CircuitOpenError:
+            # 熔断拒绝的请求没有到达服务，不计入错误率
+            raise
+        except Exception:
+            self._record(name, None)
+            raise
+        self._record(name, time.monotonic() - started)
+        return response
+
+    def get_card_recommendation(self, state: Dict[str, Any]) -> str:
+        primary, secondary, delay = self._route()
+        if delay is None:
+            try:
+                return self._call(primary, state)
+            except Exception:
+                if secondary is None:
+                    raise
+                self._count("failovers")
+                return self._call(secondary, state)
+
+        first = self._executor.submit(self._call, primary, state)
+        done, _ = wait([first], timeout=delay)
+        if done:
+            try:
+                return first.result()
+            except Exception:
+                self._count("failovers")
+                return self._call(secondary, state)
+
+        self._count("hedged")
+        hedge = self._executor.submit(self._call, secondary, state)
+        pending, errors = {first, hedge}, []
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                if future is hedge:
+                    self._count("hedge_wins")
+                return response
+        raise errors[0]
+
+    # ====== 异步接口 ======
+
+    async def _call_async(self, provider, state: Dict[str, Any]) -> str:
+        name, client = provider
+        started = time.monotonic()
+        try:
+            response = await client.get_card_recommendation_async(state)
+        except CircuitOpenError:
+            raise
+        except asyncio.CancelledError:
+            # 对冲中落后而被取消：已等待的时间是真实延迟的下界，仍记为延迟样本，
+            # 否则慢请求永远不会进入p95，对冲等待时间越来越短、对冲成本随之上升
+            self._record(name, time.monotonic() - started)
+            raise
+        except Exception:
+            self._record(name, None)
+            raise
+        self._record(name, time.monotonic() - started)
+        return response
+
+    async def get_card_recommendation_async(self, state: Dict[str, Any]) -> str:
+        """异步版本：先返回的请求胜出后取消另一个请求，不再为其付费"""
+        primary, secondary, delay = self._route()
+        if delay is None:
+            try:
+                return await self._call_async(primary, state)
+            except Exception:
+                if secondary is None:
+                    raise
+                self._count("failovers")
+                return await self._call_async(secondary, state)
+
+        first = asyncio.ensure_future(self._call_async(primary, state))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            try:
+                return first.result()
+            except Exception:
+                self._count("failovers")
+                return await self._call_async(secondary, state)
+
+        self._count("hedged")
+        hedge = asyncio.ensure_future(self._call_async(secondary, state))
+        pending, errors = {first, hedge}, []
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                        continue
+                    if task is hedge:
+                        self._count("hedge_wins")
+                    return task.result()
+            raise errors[0]
+        finally:
+            for task in pending:
+                task.cancel()
+
+    # ====== 其他接口 ======
+
+    def stream_card_recommendation(self, state: Dict[str, Any]) -> Iterator[str]:
+        """流式输出不对冲，只使用主服务"""
+        _, client = self._route()[0]
+        return client.stream_card_recommendation(state)
+
+    def get_usage_stats(self) -> Dict[str, Any]:
+        """各服务token用量之和，providers为每个服务各自的统计"""
+        providers = {name: client.get_usage_stats() for name, client in self.providers
+                     if hasattr(client, "get_usage_stats")}
+        total = {}
+        for usage in providers.values():
+            for key, value in usage.items():
+                if key != "cache_hit_rate":
+                    total[key] = total.get(key, 0) + value
+        prompt_tokens = total.get("prompt_tokens", 0)
+        total["cache_hit_rate"] = total.get("cached_tokens", 0) / prompt_tokens if prompt_tokens else 0.0
+        total["providers"] = providers
+        return total
+
+    def get_resilience_stats(self) -> Dict[str, Any]:
+        """对冲/故障转移次数，以及每个服务的延迟、错误率、重试和熔断器状态"""
+        with self._lock:
+            stats = dict(self._counts)
+            providers = {name: s.snapshot() for name, s in self._stats.items()}
+        for name, client in self.providers:
+            resilience = getattr(client, "get_resilience_stats", None)
+            if resilience is not None:
+                providers[name].update(resilience())
+        stats["providers"] = providers
+        return stats
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def create_llm_client(api_key: str = None, http_client=None, async_http_client=None):
+    """
+    按环境变量创建模型客户端：LLM_PROVIDERS为逗号分隔的服务列表（按优先级，默认 qwen,deepseek），
+    只有配置了API密钥的服务才会加入（api_key或QWEN_API_KEY、DEEPSEEK_API_KEY），都没有配置时抛出 ValueError；
+    只有一个服务时直接返回 QwenClient，不经过路由。http_client为各服务共用的HTTP连接池，
+    async_http_client为返回当前事件循环共用的异步连接池的函数
+    """
+    names = [name.strip().lower() for name in (os.getenv("LLM_PROVIDERS") or "qwen,deepseek").split(",")]
+    qwen_key = api_key or os.getenv("QWEN_API_KEY")
+    providers = []
+    for name in names:
+        if name == "qwen" and qwen_key:
+            providers.append(("qwen", QwenClient(qwen_key, http_client=http_client,
+                                                 async_http_client=async_http_client)))
+        elif name == "deepseek" and os.getenv("DEEPSEEK_API_KEY"):
+            providers.append(("deepseek", QwenClient(
+                os.getenv("DEEPSEEK_API_KEY"),
+                os.getenv("DEEPSEEK_BASE_URL") or "https://api.deepseek.com",
+                model=os.getenv("DEEPSEEK_MODEL") or "deepseek-chat",
+                provider="DeepSeek", http_client=http_client, async_http_client=async_http_client)))
+    if not providers:
+        raise ValueError(f"请提供模型服务的API密钥（LLM_PROVIDERS: {','.join(names)}）")
+    if len(providers) == 1:
+        return providers[0][1]
+    return LLMRouter(providers, hedge=os.getenv("LLM_HEDGE", "1") != "0")
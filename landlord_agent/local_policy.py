@@ -0,0 +1,59 @@
+"""
+本地启发式出牌策略：模型超时或不可用时的兜底决策
+
+  - 跟牌：用能压过上一手的最小的牌，尽量不拆炸弹、不用王炸；有牌可压时不Pass
+    （与 MoveValidator 的规则一致），只剩炸弹可压时用最小的炸弹，王炸最后才用
+  - 首发：优先一次带走更多小牌的牌型（顺子、连对、飞机、三带），其次出最小的牌
+"""
+from typing import Optional, Sequence
+
+from play_notation import PASS, BOMB, ROCKET
+from rules_engine import Move, PASS_MOVE, classify, hand_counts, legal_moves, move_to_dict
+
+
+def _breaks_bomb(counts: Sequence[int], move: Move) -> bool:
+    """出这手牌是否会拆掉手中的炸弹"""
+    return any(counts[idx] == 4 for idx in set(move.cards)) and move.type != BOMB
+
+
+def heuristic_move(counts: Sequence[int], last: Optional[Move] = None) -> Move:
+    """按启发式规则选出一手合法的牌"""
+    moves = legal_moves(counts, last)
+    plays = [m for m in moves if m.type != PASS]
+    if not plays:
+        return PASS_MOVE
+
+    following = last is not None and last.type != PASS
+    normal = [m for m in plays if m.type not in (BOMB, ROCKET) and not _breaks_bomb(counts, m)]
+    if following:
+        if normal:
+            return min(normal, key=lambda m: (m.key, len(m.cards)))
+        return min(plays, key=lambda m: (m.type == ROCKET, m.key))
+
+    candidates = normal or plays
+    # 首发：从最小的牌出起，同样从最小的牌出时一次出得越多越好，带牌尽量小
+    return min(candidates, key=lambda m: (m.cards[0], -len(m.cards), m.cards[-1]))
+
+
+def engine_decision(hand: list, prev_ranks: list) -> Optional[dict]:
+    """以决策输出格式给出本地启发式决策；手牌或上一手无法识别时返回None"""
+    try:
+        counts = hand_counts(hand)
+        last = classify(prev_ranks)
+    except ValueError:
+        return None
+    if not hand or last is None:
+        return None
+    move = heuristic_move(counts, last)
+    if move.type == PASS:
+        reasoning = ["本地策略：没有能压过上一手的牌，选择Pass"]
+    elif last.type == PASS:
+        reasoning = [f"本地策略：首发出最小的{move.type}，尽量带走小牌"]
+    else:
+        reasoning = [f"本地策略：用最小的能压过上一手{last.type}的{move.type}跟牌"]
+    recommended = move_to_dict(move)
+    return {
+        "recommended_move": recommended,
+        "backup_move": dict(recommended),
+        "reasoning": reasoning
+    }
@@ -0,0 +1,231 @@
+"""
+完全信息蒙特卡洛搜索（PIMC）：本地、可自托管的出牌决策引擎
+
+对当前局面的每次模拟：
+  1. 从未出现的牌（整副牌 - 我的手牌 - 历史已出的牌）中随机发给两个对手，
+     张数按各座位已出牌数推算
+  2. 对每个候选走法，先走这一步，再用本地启发式策略（local_policy）快速打完
+  3. 统计我方阵营获胜的比例
+所有候选走法共用同一批发牌（公共随机数，方差更小），模拟按进程数切分到 multiprocessing 进程池
+"""
+import multiprocessing
+import os
+import random
+import time
+from typing import Dict, List, Optional, Sequence
+
+from play_notation import PASS
+from rules_engine import (Move, NUM_RANKS, SEATS, LANDLORD_SEAT, INITIAL_CARDS, FULL_DECK, classify,
+                          hand_counts, legal_moves, move_to_dict, remove_move)
+from local_policy import heuristic_move
+
+DEFAULT_SIMULATIONS = 2000
+
+
+def unseen_counts(hand: Sequence[int], played: Sequence[int]) -> List[int]:
+    """未出现的牌 = 整副牌 - 我的手牌 - 已出的牌（计数向量，不小于0）"""
+    return [max(0, FULL_DECK[i] - hand[i] - played[i]) for i in range(NUM_RANKS)]
+
+
+def _deal_sizes(estimates: Dict[str, int], total: int) -> Dict[str, int]:
+    """按对手估计的剩余张数分配total张未知牌（估计值与未知牌总数不一致时按比例调整）"""
+    seats = list(estimates)
+    weight = sum(estimates.values())
+    if weight <= 0:
+        sizes = {seat: total // len(seats) for seat in seats}
+    else:
+        sizes = {seat: total * estimates[seat] // weight for seat in seats}
+    sizes[seats[0]] += total - sum(sizes.values())
+    return sizes
+
+
+def _rollout(hands: list, turn: int, last: Optional[Move], last_player: int) -> int:
+    """用启发式策略打完一局，返回先出完牌的座位序号"""
+    while True:
+        if not any(hands[turn]):
+            # 发到0张牌的座位视为已经出完
+            return turn
+        if last_player == turn:
+            last = None
+        move = heuristic_move(hands[turn], last)
+        if move.type != PASS:
+            hands[turn] = remove_move(hands[turn], move)
+            last, last_player = move, turn
+            if not any(hands[turn]):
+                return turn
+        turn = (turn + 1) % 3
+
+
+def _simulate(task) -> List[int]:
+    """
+    进程池任务：生成 deals 次随机发牌，每次发牌对所有候选走法各模拟一局，
+    返回每个候选走法的获胜次数
+    """
+    my_counts, unseen, sizes, me, last, last_player, candidates, deals, seed = task
+    rng = random.Random(seed)
+    pool = [i for i in range(NUM_RANKS) for _ in range(unseen[i])]
+    landlord = SEATS.index(LANDLORD_SEAT)
+    my_team = me == landlord
+    wins = [0] * len(candidates)
+
+    for _ in range(deals):
+        rng.shuffle(pool)
+        hands = [None, None, None]
+        hands[me] = tuple(my_counts)
+        offset = 0
+        for seat, size in sizes:
+            counts = [0] * NUM_RANKS
+            for idx in pool[offset:offset + size]:
+                counts[idx] += 1
+            hands[seat] = tuple(counts)
+            offset += size
+
+        for c, move in enumerate(candidates):
+            sim_hands = list(hands)
+            if move.type == PASS:
+                sim_last, sim_last_player = last, last_player
+            else:
+                sim_hands[me] = remove_move(sim_hands[me], move)
+                if not any(sim_hands[me]):
+                    wins[c] += 1
+                    continue
+                sim_last, sim_last_player = move, me
+            winner = _rollout(sim_hands, (me + 1) % 3, sim_last, sim_last_player)
+            if (winner == landlord) == my_team:
+                wins[c] += 1
+    return wins
+
+
+class MonteCarloSearch:
+    """
+    PIMC搜索。processes为进程池大小（默认CPU核数，<=1时在当前进程内计算），
+    simulations为每次搜索的总模拟局数（候选走法数 × 发牌次数）
+    """
+
+    def __init__(self, processes: int = None, simulations: int = DEFAULT_SIMULATIONS):
+        self.processes = processes if processes is not None else (os.cpu_count() or 1)
+        self.simulations = simulations
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.processes)
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def search(self, hand: list, last_ranks: list = None, my_seat: str = 'B',
+               last_player: str = None, history_plays: list = None,
+               opponent_counts: Dict[str, int] = None, simulations: int = None,
+               seed: int = None) -> dict:
+        """
+        搜索当前局面。history_plays为 [{"玩家": "A", "牌": [...]}...]（与game_state中的历史出牌格式相同），
+        opponent_counts为对手剩余张数（缺省时按开局张数减去已出牌数推算）。
+        返回 {"moves": [{"move", "wins", "simulations", "win_rate"}...按胜率降序], "best", 统计信息}
+        """
+        started = time.perf_counter()
+        my_counts = hand_counts(hand)
+        last = classify(last_ranks or [])
+        if last is None:
+            raise ValueError(f"无法识别的上一手牌: {last_ranks}")
+        me = SEATS.index(my_seat)
+        if last.type == PASS:
+            last_index = me
+        else:
+            last_index = SEATS.index(last_player) if last_player else (me - 1) % 3
+
+        # 已出的牌与各座位已出张数
+        played = [0] * NUM_RANKS
+        played_by_seat = {seat: 0 for seat in SEATS}
+        for play in history_plays or []:
+            ranks = play.get("牌") or []
+            for idx, n in enumerate(hand_counts(ranks)):
+                played[idx] += n
+            if play.get("玩家") in played_by_seat:
+                played_by_seat[play["玩家"]] += len(ranks)
+        unseen = unseen_counts(my_counts, played)
+
+        opponents = [seat for seat in SEATS if seat != my_seat]
+        if opponent_counts is None:
+            opponent_counts = {seat: max(0, INITIAL_CARDS[seat] - played_by_seat[seat]) for seat in opponents}
+        sizes = _deal_sizes({seat: opponent_counts.get(seat, 0) for seat in opponents}, sum(unseen))
+        sizes = [(SEATS.index(seat), size) for seat, size in sizes.items()]
+
+        candidates = legal_moves(my_counts, last)
+        budget = simulations or self.simulations
+        deals = max(1, budget // len(candidates))
+
+        # 按进程数切分发牌次数，每个任务使用不同的随机种子
+        workers = max(1, min(self.processes, deals))
+        base_seed = seed if seed is not None else random.randrange(1 << 30)
+        tasks = []
+        for w in range(workers):
+            share = deals // workers + (1 if w < deals % workers else 0)
+            tasks.append((my_counts, unseen, sizes, me, last, last_index, candidates, share, base_seed + w))
+        if self.processes <= 1:
+            results = [_simulate(task) for task in tasks]
+        else:
+            results = self._get_pool().map(_simulate, tasks)
+
+        wins = [sum(r[c] for r in results) for c in range(len(candidates))]
+        moves = [{
+            "move": move_to_dict(move),
+            "wins": wins[c],
+            "simulations": deals,
+            "win_rate": wins[c] / deals
+        } for c, move in enumerate(candidates)]
+        moves.sort(key=lambda m: m["win_rate"], reverse=True)
+
+        elapsed = time.perf_counter() - started
+        total = deals * len(candidates)
+        return {
+            "moves": moves,
+            "best": moves[0],
+            "simulations": total,
+            "elapsed_s": elapsed,
+            "simulations_per_sec": total / elapsed if elapsed > 0 else 0.0,
+            "processes": workers
+        }
+
+    def search_state(self, game_state: dict, simulations: int = None, seed: int = None) -> dict:
+        """直接搜索 LandlordAgent.build_game_state() 构建的局面"""
+        situation = game_state["局面"]
+        last_play = situation.get("桌面待跟牌(last_play)", {})
+        has_prev = last_play.get("是否存在")
+        return self.search(
+            hand=situation["我的手牌"]["牌"],
+            last_ranks=last_play.get("牌", []) if has_prev else [],
+            my_seat=situation.get("我的座位", 'B'),
+            last_player=last_play.get("出牌者") if has_prev else None,
+            history_plays=situation.get("历史出牌", []),
+            opponent_counts=situation.get("对手剩余张数"),
+            simulations=simulations,
+            seed=seed
+        )
+
+    def decision(self, game_state: dict, simulations: int = None) -> dict:
+        """以决策输出格式（recommended_move/backup_move/reasoning）返回搜索结果"""
+        result = self.search_state(game_state, simulations)
+        best = result["moves"][0]
+        backup = result["moves"][1] if len(result["moves"]) > 1 else best
+        cards = "、".join(best["move"]["cards"]) or "Pass"
+        return {
+            "recommended_move": best["move"],
+            "backup_move": backup["move"],
+            "reasoning": [
+                f"蒙特卡洛模拟{result['simulations']}局，共{len(result['moves'])}种候选走法",
+                f"{cards}的模拟胜率最高：{best['win_rate']:.1%}"
+            ],
+            "win_rates": [{"cards": m["move"]["cards"], "type": m["move"]["type"],
+                           "win_rate": round(m["win_rate"], 4)} for m in result["moves"][:5]]
+        }
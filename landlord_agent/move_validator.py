@@ -0,0 +1,154 @@
+"""
+模型决策的合法性校验与本地修复
+
+检查 recommended_move 是否来自当前手牌、是否构成合法牌型、是否能压过桌面待跟牌
+（有牌可压时不允许Pass）。不合法或无法解析的结果在本地修复：
+backup_move 合法时改用 backup_move，否则选择与原出牌最接近的合法走法，不再重新请求模型
+"""
+import threading
+from typing import List, Optional
+
+from play_notation import JOKER_RANKS, PASS, BOMB, ROCKET
+from rules_engine import (Move, PASS_MOVE, classify, hand_counts, legal_moves, move_to_dict,
+                          can_afford, beats)
+
+# 校验结果
+VALID = "valid"
+REPAIRED_BACKUP = "repaired_backup"
+REPAIRED_NEAREST = "repaired_nearest"
+UNCHECKED = "unchecked"
+
+
+def move_from_dict(move: dict) -> Optional[Move]:
+    """决策中的出牌 {"action", "cards", "type"} -> Move，无法识别时返回None"""
+    if not isinstance(move, dict):
+        return None
+    cards = move.get("cards") or []
+    if move.get("action") == "pass" or not cards:
+        return PASS_MOVE if move.get("action") == "pass" else None
+    if not isinstance(cards, list):
+        return None
+    ranks = []
+    for card in cards:
+        # 兼容 "heart K"、"little_joker" 等带花色的写法
+        name = str(card).split()[-1] if str(card).split() else ""
+        ranks.append(JOKER_RANKS.get(name, name))
+    try:
+        return classify(ranks)
+    except ValueError:
+        return None
+
+
+def _distance(move: Move, target: Optional[Move]) -> int:
+    """两手牌之间的差异：点数多重集的对称差大小"""
+    if target is None:
+        return len(move.cards)
+    remaining = list(target.cards)
+    common = 0
+    for idx in move.cards:
+        if idx in remaining:
+            remaining.remove(idx)
+            common += 1
+    return len(move.cards) + len(target.cards) - 2 * common
+
+
+def nearest_legal(moves: List[Move], target: Optional[Move]) -> Move:
+    """
+    从合法走法中选与target最接近的一手：优先同牌型，其次差异最小，
+    尽量不动用炸弹和王炸，最后选点数最小的
+    """
+    candidates = [m for m in moves if m.type != PASS] or moves
+    target_type = target.type if target is not None else None
+    return min(candidates, key=lambda m: (m.type != target_type,
+                                          _distance(m, target),
+                                          m.type in (BOMB, ROCKET),
+                                          m.key))
+
+
+class MoveValidator:
+    """校验并修复决策，统计各类校验结果（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {
+            "total": 0,
+            VALID: 0,
+            REPAIRED_BACKUP: 0,
+            REPAIRED_NEAREST: 0,
+            UNCHECKED: 0,
+            "malformed": 0
+        }
+
+    def _count(self, *outcomes: str):
+        with self._lock:
+            self._counts["total"] += 1
+            for outcome in outcomes:
+                self._counts[outcome] += 1
+
+    def check(self, move: dict, hand: list, prev_ranks: list) -> Optional[bool]:
+        """单独检查一手出牌是否合法；手牌或上一手无法识别时返回None"""
+        try:
+            counts = hand_counts(hand)
+            last = classify(prev_ranks)
+        except ValueError:
+            return None
+        if not hand or last is None:
+            return None
+        return self._is_legal(move_from_dict(move), counts, last)
+
+    def _is_legal(self, move: Optional[Move], counts, last: Move) -> bool:
+        if move is None:
+            return False
+        if move.type == PASS:
+            # 首发不能Pass；跟牌时有牌可压也不能Pass
+            return legal_moves(counts, last) == [PASS_MOVE] if last.type != PASS else False
+        return can_afford(counts, move) and beats(move, last)
+
+    def validate(self, decision, hand: list, prev_ranks: list):
+        """
+        校验模型决策（dict或无法解析的原始字符串），返回带 "validation" 字段的决策dict；
+        手牌或上一手无法识别时原样返回
+        """
+        malformed = not isinstance(decision, dict) or not isinstance(decision.get("recommended_move"), dict)
+        try:
+            counts = hand_counts(hand)
+            last = classify(prev_ranks)
+        except ValueError:
+            last = None
+        if not hand or last is None:
+            self._count(UNCHECKED)
+            return decision
+
+        if malformed:
+            raw = decision
+            decision = dict(decision) if isinstance(decision, dict) else {"raw_response": raw}
+            decision.setdefault("reasoning", [])
+
+        proposed = move_from_dict(decision.get("recommended_move"))
+        if self._is_legal(proposed, counts, last):
+            self._count(VALID)
+            decision["validation"] = {"status": VALID}
+            return decision
+
+        backup = move_from_dict(decision.get("backup_move"))
+        if self._is_legal(backup, counts, last):
+            status, repaired = REPAIRED_BACKUP, backup
+        else:
+            status, repaired = REPAIRED_NEAREST, nearest_legal(legal_moves(counts, last), proposed)
+        self._count(status, *(["malformed"] if malformed else []))
+
+        decision["validation"] = {
+            "status": status,
+            "malformed": malformed,
+            "original_move": decision.get("recommended_move")
+        }
+        decision["recommended_move"] = move_to_dict(repaired)
+        return decision
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counts)
+        checked = stats["total"] - stats[UNCHECKED]
+        repaired = stats[REPAIRED_BACKUP] + stats[REPAIRED_NEAREST]
+        stats["repair_rate"] = repaired / checked if checked else 0.0
+        return stats
@@ -0,0 +1,79 @@
+"""
+从不完整的JSON文本中提取已经完整输出的对象（用于流式输出）
+"""
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class IncrementalJSONScanner:
+    """
+    增量扫描流式输出的JSON文本：每次feed只处理新到达的字符，
+    一旦顶层指定键对应的对象完整闭合，立即解析并记录到objects中
+    """
+
+    def __init__(self, keys: Iterable[str] = ("recommended_move",)):
+        self.keys = set(keys)
+        self.objects: Dict[str, Dict[str, Any]] = {}
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._last_string = None
+        self._capture_key = None
+        self._capture_start = -1
+
+    def feed(self, chunk: str) -> List[str]:
+        """追加一段文本，返回本次新完成的键"""
+        self.text += chunk
+        text = self.text
+        completed = []
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = text[self._string_start + 1:i]
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in '{[':
+                self._depth += 1
+                if (ch == '{' and self._depth == 2 and self._capture_key is None
+                        and self._last_string in self.keys and self._last_string not in self.objects):
+                    self._capture_key = self._last_string
+                    self._capture_start = i
+            elif ch in '}]':
+                if ch == '}' and self._depth == 2 and self._capture_key is not None:
+                    try:
+                        self.objects[self._capture_key] = json.loads(text[self._capture_start:i + 1])
+                        completed.append(self._capture_key)
+                    except json.JSONDecodeError:
+                        pass
+                    self._capture_key = None
+                self._depth -= 1
+            elif ch == ',' and self._depth == 1:
+                self._last_string = None
+        self._pos = len(text)
+        return completed
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.objects.get(key)
+
+
+def extract_object(text: str, key: str) -> Optional[Dict[str, Any]]:
+    """
+    在（可能不完整的）JSON文本中查找顶层的 "key": {...}，
+    当该对象已完整输出时返回解析结果，否则返回None
+    """
+    scanner = IncrementalJSONScanner(keys=(key,))
+    scanner.feed(text)
+    return scanner.get(key)
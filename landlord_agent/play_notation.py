@@ -0,0 +1,59 @@
+"""
+出牌记录的文本表示
+
+数据库 card 字段的格式：
+  - 单张：  "花色 点数"，如 "heart K"；王为 "little_joker" / "big_joker"
+  - 牌型：  "牌型 点数..."，如 "对子 K K"、"三带二 8 8 8 5 5"、"王炸 小王 大王"
+  - Pass：  "无" 或空
+"""
+from typing import List, Tuple
+
+# 点数从小到大
+RANK_ORDER = ['3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A', '2', '小王', '大王']
+RANK_INDEX = {rank: i for i, rank in enumerate(RANK_ORDER)}
+
+# 数据库中王的名称 -> 点数列表中的名称
+JOKER_RANKS = {'little_joker': '小王', 'big_joker': '大王'}
+
+PASS = 'Pass'
+SINGLE = '单张'
+PAIR = '对子'
+TRIO = '三张'
+TRIO_SINGLE = '三带一'
+TRIO_PAIR = '三带二'
+STRAIGHT = '顺子'
+PAIR_STRAIGHT = '连对'
+AIRPLANE = '飞机'
+AIRPLANE_WINGS = '飞机带翅膀'
+FOUR_TWO = '四带二'
+BOMB = '炸弹'
+ROCKET = '王炸'
+
+COMBO_TYPES = (SINGLE, PAIR, TRIO, TRIO_SINGLE, TRIO_PAIR, STRAIGHT, PAIR_STRAIGHT,
+               AIRPLANE, AIRPLANE_WINGS, FOUR_TWO, BOMB, ROCKET)
+
+
+def format_play(combo_type: str, ranks: List[str]) -> str:
+    """牌型和点数列表 -> 数据库中的card字符串"""
+    return ' '.join([combo_type] + list(ranks))
+
+
+def parse_play(card: str) -> Tuple[str, List[str]]:
+    """数据库中的card字符串 -> (牌型, 点数列表)，Pass返回 ("Pass", [])"""
+    if not card or card == '无':
+        return PASS, []
+    parts = card.split()
+    if parts[0] in COMBO_TYPES:
+        return parts[0], parts[1:]
+    # 单张 "花色 点数" 或王
+    return SINGLE, [JOKER_RANKS.get(parts[-1], parts[-1])]
+
+
+def key_rank(ranks: List[str]) -> str:
+    """牌型的关键点数：张数最多的点数中最大的一个（三带二取三张的点数，顺子取最大的点数）"""
+    if not ranks:
+        return ''
+    counts = {}
+    for rank in ranks:
+        counts[rank] = counts.get(rank, 0) + 1
+    return max(counts, key=lambda r: (counts[r], RANK_INDEX.get(r, -1)))
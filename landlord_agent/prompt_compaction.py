@@ -0,0 +1,75 @@
+"""
+提示词压缩：发送给模型前把完整的历史出牌压缩成最近若干手的紧凑记法，
+更早的出牌只保留汇总（各座位已出张数、已出炸弹、大牌已出张数，由 GameTracker 增量维护），
+并按token预算继续缩短最近出牌窗口
+
+紧凑记法：每手牌一个字符串 "座位:点数..."，Pass记为 "座位:Pass"，如 "A:8 8 8 5 5"、"B:Pass"
+"""
+import json
+import threading
+from typing import Any, Dict, Tuple
+
+HISTORY_KEY = "历史出牌"
+RECENT_KEY = "最近出牌"
+OMITTED_KEY = "省略的早期出牌手数"
+
+DEFAULT_WINDOW = 12
+DEFAULT_TOKEN_BUDGET = 1500
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计token数：中文等非ASCII字符按每字1个，ASCII字符按每4个1个"""
+    wide = sum(1 for ch in text if ord(ch) > 127)
+    return wide + (len(text) - wide + 3) // 4
+
+
+def compact_play(play: Dict[str, Any]) -> str:
+    """结构化的一手出牌 -> 紧凑记法"""
+    ranks = play.get("牌") or []
+    return f"{play.get('玩家', '')}:{' '.join(ranks) if ranks else 'Pass'}"
+
+
+class PromptCompactor:
+    """
+    window为保留的最近出牌手数，token_budget为用户消息的token预算（估计值）。
+    超出预算时从最早的一手开始继续省略，直到窗口为空
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW, token_budget: int = DEFAULT_TOKEN_BUDGET):
+        self.window = window
+        self.token_budget = token_budget
+        self._lock = threading.Lock()
+        self._stats = {"decisions": 0, "prompt_tokens": 0, "last_prompt_tokens": 0,
+                       "plays_omitted": 0, "over_budget": 0}
+
+    def compact(self, game_state: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+        """返回 (压缩后的局面, 估计的token数)；不修改传入的局面"""
+        situation = dict(game_state.get("局面", {}))
+        history = situation.pop(HISTORY_KEY, [])
+        recent = [compact_play(play) for play in history[-self.window:]] if self.window > 0 else []
+        state = dict(game_state)
+        state["局面"] = situation
+
+        while True:
+            situation[RECENT_KEY] = recent
+            situation[OMITTED_KEY] = len(history) - len(recent)
+            tokens = estimate_tokens(json.dumps(state, ensure_ascii=False, separators=(',', ':')))
+            if tokens <= self.token_budget or not recent:
+                break
+            recent = recent[1:]
+
+        with self._lock:
+            self._stats["decisions"] += 1
+            self._stats["prompt_tokens"] += tokens
+            self._stats["last_prompt_tokens"] = tokens
+            self._stats["plays_omitted"] += situation[OMITTED_KEY]
+            if tokens > self.token_budget:
+                self._stats["over_budget"] += 1
+        return state, tokens
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_prompt_tokens"] = stats["prompt_tokens"] / stats["decisions"] if stats["decisions"] else 0.0
+        stats["token_budget"] = self.token_budget
+        return stats
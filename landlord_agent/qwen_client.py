@@ -1,15 +1,26 @@
-import os
-import json
-from typing import List, Dict, Any, Optional
-from openai import OpenAI
-
-# ====== 1. 把系统提示单独放在常量里 ======
-SYSTEM_PROMPT = """
-你是斗地主游戏的出牌决策工具。
-
-### 任务
-根据输入的游戏状态（身份、手牌、当前轮到谁、桌面待跟牌、历史出牌等），仅输出下一手建议出牌的具体数据。
-
+import os
+import json
+import random
+import asyncio
+import threading
+import time
+import weakref
+from typing import List, Dict, Any, Iterator, Callable
+from openai import OpenAI, AsyncOpenAI, APIConnectionError, APITimeoutError
+from circuit_breaker import CircuitBreaker
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# ====== 1. 把系统提示单独放在常量里 ======
+SYSTEM_PROMPT = """
+你是斗地主游戏的出牌决策工具。
+
+### 任务
+根据输入的游戏状态（身份、手牌、当前轮到谁、桌面待跟牌、历史出牌等），仅输出下一手建议出牌的具体数据。
+
 ### 规则约束
 - **首发出牌规则（强制）：当桌面没有待跟牌时，你必须出牌，绝对不能选择 Pass。只要你手中有牌，无论牌的大小，都必须从手牌中选择合适的牌型出牌。**
 - **跟牌规则（强制）：当桌面有待跟牌时，如果手中有同牌型且更大的牌，必须跟牌压制上一手；只有当手中确实没有能压制的牌时，才能选择 Pass。**
@@ -19,10 +30,12 @@ SYSTEM_PROMPT = """
   - 如果对方出A，你手牌中有2，必须出2，绝对不能Pass。
   - 你必须严格按照牌面大小规则进行比较。
   - **如果桌面没有待跟牌（即你是首发出牌），你必须出牌，不能选择Pass，无论你手中的牌是什么。**
-  - **例如：如果你的手牌是["K"]，且桌面没有待跟牌，你必须出K，绝对不能Pass。**
-- 炸弹(四张同点)可压任何非火箭组合；火箭(双王)压制一切。
-- 顺子/连对/飞机等必须长度匹配才能互压；2 和王不能参与顺子。
-
+  - **例如：如果你的手牌是["K"]，且桌面没有待跟牌，你必须出K，绝对不能Pass。**
+- 炸弹(四张同点)可压任何非火箭组合；火箭(双王)压制一切。
+- 顺子/连对/飞机等必须长度匹配才能互压；2 和王不能参与顺子。
+- 输入中"最近出牌"只保留最近若干手，格式为"座位:点数"（Pass记为"座位:Pass"），更早的出牌见"历史汇总"。
+- 输入中"手牌分析"给出了手牌的最少出牌手数和对应的拆牌方案，出牌时优先选择不增加剩余手数的牌，以加速走牌。
+
 ### 输出格式
 仅输出严格的JSON格式数据，包含推荐出牌信息和完整的推理链条，不添加任何其他内容：
 {
@@ -36,54 +49,325 @@ SYSTEM_PROMPT = """
     "第二步推理...",
     "第三步推理..."
   ]
-}
-"""
-
-QWEN_API_KEY = os.getenv("QWEN_API_KEY") or ""
-class QwenClient:
-    def __init__(self, api_key: str = None, base_url: str = None):
-        self.api_key = api_key or os.getenv("QWEN_API_KEY") or QWEN_API_KEY
-        self.base_url = base_url or os.getenv("QWEN_BASE_URL") or "https://dashscope.aliyuncs.com/compatible-mode/v1"
-        
-        if not self.api_key:
-            raise ValueError("请提供Qwen API密钥")
-        
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url=self.base_url
-        )
-    
-    def chat(self, messages: List[Dict[str, str]], 
-             model: str = "qwen-turbo",
-             temperature: float = 0.2,
-             max_tokens: int = 2000) -> str:
-        try:
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                stream=False,
-                response_format={"type": "json_object"}
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            raise Exception(f"Qwen API调用失败: {str(e)}")
-    
-    def get_card_recommendation(self, state: Dict[str, Any]) -> str:
-        user_prompt = json.dumps(state, ensure_ascii=False)
-        messages = [
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_prompt}
-        ]
-        return self.chat(messages)
-
-if __name__ == "__main__":
-    try:
-        client = QwenClient()
-        result = client.get_card_recommendation({"test": "message"})
-        print(result)
-    except ValueError as e:
-        print(f"配置错误: {e}")
-    except Exception as e:
-        print(f"错误: {e}")
+}
+"""
+
+# ====== 2. 局面中的固定内容，与系统提示一起组成每次请求都完全相同的前缀 ======
+STATIC_CONTEXT = {
+    "元信息": {
+        "游戏": "斗地主",
+        "版本": "prompt_v1.0",
+        "语言": "zh-CN",
+        "输出要求": "只输出JSON（不要Markdown、不要多余文字）"
+    },
+    "规则": {
+        "牌面大小(从大到小)": ["大王", "小王", "2", "A", "K", "Q", "J", "10", "9", "8", "7", "6", "5", "4", "3"],
+        "跟牌规则": "当桌面有待跟牌时，如果手中有同牌型且更大的牌，必须跟牌压制上一手；只有当没有能压制的牌时，才能选择Pass",
+        "火箭": "王炸（大小王）压制一切",
+        "炸弹": "四张同点数可压制任何非火箭牌型",
+        "顺子相关": "2和王不能参与顺子"
+    },
+    "玩家与阵营": [
+        {"座位": "A", "阵营": "地主"},
+        {"座位": "B", "阵营": "农民"},
+        {"座位": "C", "阵营": "农民"}
+    ]
+}
+STATIC_KEYS = tuple(STATIC_CONTEXT)
+
+# 导入时序列化一次，之后每次请求的系统消息逐字节相同，可以命中服务端的前缀缓存
+SYSTEM_MESSAGE = SYSTEM_PROMPT + "\n### 固定信息\n" + json.dumps(STATIC_CONTEXT, ensure_ascii=False, separators=(',', ':'))
+
+
+def serialize_state(state: Dict[str, Any]) -> str:
+    """只序列化局面中的可变部分（调用方传入的固定内容已包含在系统消息中，不再重复发送）"""
+    return json.dumps({k: v for k, v in state.items() if k not in STATIC_KEYS},
+                      ensure_ascii=False, separators=(',', ':'))
+
+
+def print_usage(record: Dict[str, Any]):
+    """打印一次请求的提示词大小和token用量，可作为usage_hook使用"""
+    print(f"提示词 {record['prompt_chars']} 字符（固定前缀 {record['prefix_chars']}），"
+          f"prompt_tokens={record['prompt_tokens']}，cached_tokens={record['cached_tokens']}")
+
+
+# ====== 3. 超时、重试与熔断 ======
+CONNECT_TIMEOUT = float(os.getenv("QWEN_CONNECT_TIMEOUT") or "5")
+READ_TIMEOUT = float(os.getenv("QWEN_READ_TIMEOUT") or "30")
+MAX_RETRIES = int(os.getenv("QWEN_MAX_RETRIES") or "2")
+# 指数退避的初始等待和上限（秒），实际等待在 [0, 上限) 之间随机取值
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+
+
+class QwenAPIError(Exception):
+    """模型调用失败（已按需重试），retryable表示是否为限流/服务端错误/超时"""
+
+    def __init__(self, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def is_retryable(error: Exception) -> bool:
+    """只重试限流（429）、服务端错误（5xx）和超时"""
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or 500 <= status < 600
+    return isinstance(error, (APITimeoutError, TimeoutError))
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_MAX) -> float:
+    """第attempt次重试前的等待时间：指数增长的上限内均匀随机（full jitter）"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def make_timeout(connect: float, read: float):
+    """分别设置连接和读取超时；没有httpx时只能使用统一的超时"""
+    if httpx is None:
+        return max(connect, read)
+    return httpx.Timeout(read, connect=connect)
+
+
+QWEN_API_KEY = os.getenv("QWEN_API_KEY") or ""
+class QwenClient:
+    def __init__(self, api_key: str = None, base_url: str = None,
+                 usage_hook: Callable[[Dict[str, Any]], None] = None,
+                 connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT,
+                 max_retries: int = MAX_RETRIES, breaker: CircuitBreaker = None,
+                 model: str = None, provider: str = "Qwen", http_client=None,
+                 async_http_client: Callable[[], Any] = None):
+        """
+        usage_hook: 每次请求结束后以提示词大小和API返回的token用量（含缓存命中的token数）调用，
+        未指定且设置了环境变量 QWEN_LOG_USAGE 时打印到标准输出。
+        失败时只重试限流/服务端错误/超时，最多max_retries次；连续失败过多时熔断，
+        熔断期间直接抛出 CircuitOpenError。
+        model/provider 用于接入其他OpenAI兼容的服务（如DeepSeek），provider只用于错误信息和统计；
+        http_client为共享的 httpx.Client（见 client_registry），多个客户端复用同一个连接池；
+        async_http_client为返回当前事件循环共享的 httpx.AsyncClient 的函数，异步调用使用它的连接池
+        """
+        self.provider = provider
+        self.model = model or os.getenv("QWEN_MODEL") or "qwen-turbo"
+        self.max_retries = max_retries
+        self.timeout = make_timeout(connect_timeout, read_timeout)
+        self.breaker = breaker or CircuitBreaker(name=f"{provider} API")
+        self._retry_lock = threading.Lock()
+        self._retries = {"retries": 0, "failed_requests": 0}
+        self.usage_hook = usage_hook or (print_usage if os.getenv("QWEN_LOG_USAGE") else None)
+        self._usage_lock = threading.Lock()
+        self._usage = {"requests": 0, "prompt_chars": 0, "prompt_tokens": 0, "cached_tokens": 0,
+                       "completion_tokens": 0}
+        self.api_key = api_key or os.getenv("QWEN_API_KEY") or QWEN_API_KEY
+        self.base_url = base_url or os.getenv("QWEN_BASE_URL") or "https://dashscope.aliyuncs.com/compatible-mode/v1"
+        
+        if not self.api_key:
+            raise ValueError(f"请提供{provider} API密钥")
+        
+        # 重试由本类按错误类型控制，关闭SDK自带的重试
+        self.client = OpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            timeout=self.timeout,
+            max_retries=0,
+            http_client=http_client
+        )
+        # 异步客户端的连接绑定在创建它的事件循环上，每个事件循环在第一次异步调用时各自创建；
+        # 事件循环被回收后对应的客户端随之释放
+        self._async_http_client = async_http_client
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._async_lock = threading.Lock()
+        self._async_client = None
+    
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """当前事件循环的异步客户端（需在事件循环中调用）；通过赋值指定时所有事件循环都使用指定的客户端"""
+        if self._async_client is not None:
+            return self._async_client
+        loop = asyncio.get_running_loop()
+        with self._async_lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                http_client = self._async_http_client() if self._async_http_client else None
+                client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                     timeout=self.timeout, max_retries=0, http_client=http_client)
+                self._async_clients[loop] = client
+            return client
+    
+    @async_client.setter
+    def async_client(self, client):
+        self._async_client = client
+    
+    def _count_retry(self):
+        with self._retry_lock:
+            self._retries["retries"] += 1
+    
+    def _on_error(self, error: Exception, attempt: int) -> bool:
+        """处理一次失败的调用：需要重试时返回True，否则记录失败并抛出 QwenAPIError"""
+        retryable = is_retryable(error)
+        if retryable and attempt < self.max_retries:
+            self._count_retry()
+            return True
+        self._record_outcome(error)
+        raise QwenAPIError(f"{self.provider} API调用失败: {str(error)}", retryable) from error
+    
+    def _record_outcome(self, error: Exception = None):
+        """把一次请求的最终结果记入熔断器；只有服务不可用类的错误计入熔断，请求本身有误（4xx）说明服务仍然可用"""
+        if error is not None and (is_retryable(error) or isinstance(error, APIConnectionError)):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        if error is not None:
+            with self._retry_lock:
+                self._retries["failed_requests"] += 1
+    
+    def _request(self, create: Callable[[], Any], record_success: bool = True):
+        """带重试和熔断的同步请求；record_success为False时由调用方在请求真正结束后记录结果"""
+        self.breaker.before_call()
+        attempt = 0
+        while True:
+            try:
+                response = create()
+            except Exception as e:
+                if self._on_error(e, attempt):
+                    time.sleep(backoff_delay(attempt))
+                    attempt += 1
+                    continue
+            if record_success:
+                self.breaker.record_success()
+            return response
+    
+    async def _request_async(self, create: Callable[[], Any]):
+        """带重试和熔断的异步请求，退避等待不阻塞事件循环"""
+        self.breaker.before_call()
+        attempt = 0
+        while True:
+            try:
+                response = await create()
+            except Exception as e:
+                if self._on_error(e, attempt):
+                    await asyncio.sleep(backoff_delay(attempt))
+                    attempt += 1
+                    continue
+            self.breaker.record_success()
+            return response
+    
+    def get_resilience_stats(self) -> Dict[str, Any]:
+        """重试次数、最终失败的请求数和熔断器状态"""
+        with self._retry_lock:
+            stats = dict(self._retries)
+        stats["breaker"] = self.breaker.stats()
+        return stats
+    
+    def chat(self, messages: List[Dict[str, str]], 
+             model: str = None,
+             temperature: float = 0.2,
+             max_tokens: int = 2000) -> str:
+        response = self._request(lambda: self.client.chat.completions.create(
+            model=model or self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=False,
+            response_format={"type": "json_object"}
+        ))
+        self._record_usage(messages, getattr(response, "usage", None))
+        return response.choices[0].message.content
+    
+    async def chat_async(self, messages: List[Dict[str, str]],
+                         model: str = None,
+                         temperature: float = 0.2,
+                         max_tokens: int = 2000) -> str:
+        """chat的异步版本，等待响应时不占用线程，一个进程内可同时进行大量请求"""
+        response = await self._request_async(lambda: self.async_client.chat.completions.create(
+            model=model or self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=False,
+            response_format={"type": "json_object"}
+        ))
+        self._record_usage(messages, getattr(response, "usage", None))
+        return response.choices[0].message.content
+    
+    def chat_stream(self, messages: List[Dict[str, str]],
+                    model: str = None,
+                    temperature: float = 0.2,
+                    max_tokens: int = 2000) -> Iterator[str]:
+        """
+        流式调用，逐段返回模型输出的文本；只在收到第一段输出之前重试。
+        熔断器在流结束（读完、中途出错或调用方提前结束）后才记录这次请求的结果
+        """
+        stream = self._request(lambda: self.client.chat.completions.create(
+            model=model or self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            stream_options={"include_usage": True},
+            response_format={"type": "json_object"}
+        ), record_success=False)
+        usage = None
+        error = None
+        try:
+            for chunk in stream:
+                # 最后一个chunk只携带token用量
+                usage = getattr(chunk, "usage", None) or usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+            self._record_usage(messages, usage)
+        except Exception as e:
+            error = e
+            raise QwenAPIError(f"{self.provider} API调用失败: {str(e)}", is_retryable(e)) from e
+        finally:
+            self._record_outcome(error)
+            # 调用方提前结束迭代时关闭连接，停止继续生成
+            stream.close()
+    
+    def _record_usage(self, messages: List[Dict[str, str]], usage):
+        """记录提示词大小和API返回的token用量，调用usage_hook"""
+        details = getattr(usage, "prompt_tokens_details", None)
+        record = {
+            "prefix_chars": len(messages[0]["content"]),
+            "prompt_chars": sum(len(m["content"]) for m in messages),
+            "prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "cached_tokens": getattr(details, "cached_tokens", None),
+            "completion_tokens": getattr(usage, "completion_tokens", None)
+        }
+        with self._usage_lock:
+            self._usage["requests"] += 1
+            self._usage["prompt_chars"] += record["prompt_chars"]
+            for key in ("prompt_tokens", "cached_tokens", "completion_tokens"):
+                self._usage[key] += record[key] or 0
+        if self.usage_hook is not None:
+            self.usage_hook(record)
+    
+    def get_usage_stats(self) -> Dict[str, Any]:
+        """累计的提示词大小与token用量，cache_hit_rate为缓存命中的提示词token比例"""
+        with self._usage_lock:
+            stats = dict(self._usage)
+        stats["cache_hit_rate"] = stats["cached_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0
+        return stats
+    
+    def _build_messages(self, state: Dict[str, Any]) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": serialize_state(state)}
+        ]
+    
+    def get_card_recommendation(self, state: Dict[str, Any]) -> str:
+        return self.chat(self._build_messages(state))
+    
+    async def get_card_recommendation_async(self, state: Dict[str, Any]) -> str:
+        return await self.chat_async(self._build_messages(state))
+    
+    def stream_card_recommendation(self, state: Dict[str, Any]) -> Iterator[str]:
+        return self.chat_stream(self._build_messages(state))
+
+if __name__ == "__main__":
+    try:
+        client = QwenClient()
+        result = client.get_card_recommendation({"test": "message"})
+        print(result)
+    except ValueError as e:
+        print(f"配置错误: {e}")
+    except Exception as e:
+        print(f"错误: {e}")
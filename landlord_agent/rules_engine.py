@@ -0,0 +1,337 @@
+"""
+斗地主规则引擎：牌型识别、合法走法枚举与大小比较
+
+手牌用长度为15的点数计数向量表示（下标为 play_notation.RANK_ORDER 中的序号，
+3=0 ... 2=12，小王=13，大王=14），走法用 Move 表示，cards 为排序后的点数序号
+"""
+from collections import namedtuple
+from itertools import combinations_with_replacement
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from play_notation import (RANK_ORDER, RANK_INDEX, PASS, SINGLE, PAIR, TRIO, TRIO_SINGLE, TRIO_PAIR,
+                           STRAIGHT, PAIR_STRAIGHT, AIRPLANE, AIRPLANE_WINGS, FOUR_TWO, BOMB, ROCKET)
+
+NUM_RANKS = 15
+RANK_2 = RANK_INDEX['2']
+RANK_A = RANK_INDEX['A']
+LITTLE_JOKER = RANK_INDEX['小王']
+BIG_JOKER = RANK_INDEX['大王']
+
+# type: 牌型；key: 比较大小用的关键点数序号；length: 连续部分的组数（顺子张数、连对对数、飞机组数）
+Move = namedtuple('Move', ['type', 'key', 'length', 'cards'])
+
+PASS_MOVE = Move(PASS, -1, 0, ())
+
+MIN_STRAIGHT = 5
+MIN_PAIR_STRAIGHT = 3
+MIN_AIRPLANE = 2
+
+# 座位：地主固定坐A座，出牌顺序为 A -> B -> C
+SEATS = ['A', 'B', 'C']
+LANDLORD_SEAT = 'A'
+# 开局张数：地主20张（含底牌），农民各17张
+INITIAL_CARDS = {'A': 20, 'B': 17, 'C': 17}
+# 整副牌各点数的张数
+FULL_DECK = tuple([4] * 13 + [1, 1])
+
+
+def hand_counts(ranks: Iterable) -> Tuple[int, ...]:
+    """点数列表（"K"、"10"、"小王"或点数序号）-> 计数向量"""
+    counts = [0] * NUM_RANKS
+    for rank in ranks:
+        idx = rank if isinstance(rank, int) else RANK_INDEX.get(str(rank).strip().upper(),
+                                                                RANK_INDEX.get(str(rank).strip()))
+        if idx is None:
+            raise ValueError(f"无法识别的点数: {rank}")
+        counts[idx] += 1
+    return tuple(counts)
+
+
+def move_ranks(move: Move) -> List[str]:
+    """走法 -> 点数名称列表"""
+    return [RANK_ORDER[i] for i in move.cards]
+
+
+def move_to_dict(move: Move) -> dict:
+    """走法 -> 决策输出格式 {"action", "cards", "type"}"""
+    if move.type == PASS:
+        return {"action": "pass", "cards": [], "type": PASS}
+    return {"action": "play", "cards": move_ranks(move), "type": move.type}
+
+
+def remove_move(counts: Sequence[int], move: Move) -> Tuple[int, ...]:
+    """从手牌计数中减去走法用掉的牌"""
+    remaining = list(counts)
+    for idx in move.cards:
+        remaining[idx] -= 1
+    return tuple(remaining)
+
+
+def can_afford(counts: Sequence[int], move: Move) -> bool:
+    """手牌中是否有这手牌"""
+    need = [0] * NUM_RANKS
+    for idx in move.cards:
+        need[idx] += 1
+    return all(need[i] <= counts[i] for i in range(NUM_RANKS))
+
+
+def beats(move: Move, last: Optional[Move]) -> bool:
+    """move能否压过last（last为空或Pass时任意出牌均可）"""
+    if move.type == PASS:
+        return False
+    if last is None or last.type == PASS:
+        return True
+    if last.type == ROCKET:
+        return False
+    if move.type == ROCKET:
+        return True
+    if move.type == BOMB:
+        return last.type != BOMB or move.key > last.key
+    if last.type == BOMB:
+        return False
+    return (move.type == last.type and move.length == last.length
+            and len(move.cards) == len(last.cards) and move.key > last.key)
+
+
+def _make(move_type: str, key: int, length: int, cards: Iterable[int]) -> Move:
+    return Move(move_type, key, length, tuple(sorted(cards)))
+
+
+# ====== 牌型识别 ======
+
+def classify(ranks: Iterable) -> Optional[Move]:
+    """识别一手牌的牌型，空列表为Pass，不构成合法牌型时返回None"""
+    counts = hand_counts(ranks)
+    n = sum(counts)
+    if n == 0:
+        return PASS_MOVE
+    cards = [i for i in range(NUM_RANKS) for _ in range(counts[i])]
+    present = [i for i in range(NUM_RANKS) if counts[i]]
+
+    if n == 1:
+        return _make(SINGLE, cards[0], 1, cards)
+    if n == 2 and counts[LITTLE_JOKER] and counts[BIG_JOKER]:
+        return _make(ROCKET, BIG_JOKER, 1, cards)
+    if len(present) == 1:
+        rank = present[0]
+        if n == 2:
+            return _make(PAIR, rank, 1, cards)
+        if n == 3:
+            return _make(TRIO, rank, 1, cards)
+        if n == 4:
+            return _make(BOMB, rank, 1, cards)
+        return None
+
+    # 顺子、连对、飞机（不带翅膀）：所有点数张数相同且连续
+    same = {counts[i] for i in present}
+    consecutive = present[-1] - present[0] + 1 == len(present) and present[-1] <= RANK_A
+    if len(same) == 1 and consecutive:
+        width = same.pop()
+        if width == 1 and len(present) >= MIN_STRAIGHT:
+            return _make(STRAIGHT, present[-1], len(present), cards)
+        if width == 2 and len(present) >= MIN_PAIR_STRAIGHT:
+            return _make(PAIR_STRAIGHT, present[-1], len(present), cards)
+        if width == 3 and len(present) >= MIN_AIRPLANE:
+            return _make(AIRPLANE, present[-1], len(present), cards)
+
+    # 三带一、三带二
+    if n in (4, 5):
+        trio = [i for i in present if counts[i] == 3]
+        if len(trio) == 1:
+            rest = [i for i in present if i != trio[0]]
+            if n == 4:
+                return _make(TRIO_SINGLE, trio[0], 1, cards)
+            if len(rest) == 1 and counts[rest[0]] == 2:
+                return _make(TRIO_PAIR, trio[0], 1, cards)
+
+    # 四带二：两张单牌或两对
+    for rank in reversed(present):
+        if counts[rank] == 4:
+            rest = list(counts)
+            rest[rank] = 0
+            rest_ranks = [i for i in range(NUM_RANKS) if rest[i]]
+            if n == 6 and not (rest[LITTLE_JOKER] and rest[BIG_JOKER]):
+                return _make(FOUR_TWO, rank, 1, cards)
+            if n == 8 and all(rest[i] in (2, 4) for i in rest_ranks):
+                return _make(FOUR_TWO, rank, 1, cards)
+
+    # 飞机带翅膀：从最长的连续三张开始尝试，同样长度时取最大的一组（与走法枚举的关键点数一致）
+    triples = [i for i in range(RANK_A + 1) if counts[i] >= 3]
+    for length in range(len(triples), MIN_AIRPLANE - 1, -1):
+        if n not in (length * 4, length * 5):
+            continue
+        for start in reversed(range(0, RANK_A - length + 2)):
+            body = range(start, start + length)
+            if not all(counts[i] >= 3 for i in body):
+                continue
+            rest = list(counts)
+            for i in body:
+                rest[i] -= 3
+            if n == length * 4:
+                if not (rest[LITTLE_JOKER] and rest[BIG_JOKER]):
+                    return _make(AIRPLANE_WINGS, start + length - 1, length, cards)
+            elif all(c in (0, 2, 4) for c in rest) and sum(c // 2 for c in rest) == length:
+                return _make(AIRPLANE_WINGS, start + length - 1, length, cards)
+    return None
+
+
+# ====== 走法枚举 ======
+
+def _singles(counts):
+    return [Move(SINGLE, i, 1, (i,)) for i in range(NUM_RANKS) if counts[i] >= 1]
+
+
+def _pairs(counts):
+    return [Move(PAIR, i, 1, (i, i)) for i in range(LITTLE_JOKER) if counts[i] >= 2]
+
+
+def _trios(counts, kicker: int):
+    """kicker: 0=不带，1=带单张，2=带对子"""
+    moves = []
+    for i in range(LITTLE_JOKER):
+        if counts[i] < 3:
+            continue
+        if kicker == 0:
+            moves.append(_make(TRIO, i, 1, (i,) * 3))
+        else:
+            for j in range(NUM_RANKS):
+                if j != i and counts[j] >= kicker and (kicker == 1 or j < LITTLE_JOKER):
+                    moves.append(_make(TRIO_SINGLE if kicker == 1 else TRIO_PAIR, i, 1, (i,) * 3 + (j,) * kicker))
+    return moves
+
+
+def _sequences(counts, width: int, min_length: int, move_type: str, length: int = None):
+    """连续牌型：width=1顺子，2连对，3飞机；length为None时枚举所有长度"""
+    moves = []
+    run = 0
+    # 一次扫描3到A：run为以end结尾、每个点数都至少有width张的连续长度
+    for end in range(RANK_A + 1):
+        run = run + 1 if counts[end] >= width else 0
+        if length:
+            lengths = [length] if length >= min_length and run >= length else []
+        else:
+            lengths = range(min_length, run + 1)
+        for seq_len in lengths:
+            cards = tuple(i for i in range(end - seq_len + 1, end + 1) for _ in range(width))
+            moves.append(Move(move_type, end, seq_len, cards))
+    return moves
+
+
+def _kicker_sets(rest, number: int, width: int):
+    """
+    从剩余牌rest中选number组带牌（width=1单张，2对子），同一点数在张数允许时可以重复
+    （如四带二带一对、飞机的两张翅膀是同一点数），不同时带双王
+    """
+    units = [rest[i] // width for i in range(NUM_RANKS)]
+    candidates = [i for i in range(NUM_RANKS) if units[i]]
+    for combo in combinations_with_replacement(candidates, number):
+        if width == 1 and LITTLE_JOKER in combo and BIG_JOKER in combo:
+            continue
+        if any(combo.count(i) > units[i] for i in set(combo)):
+            continue
+        yield [i for i in combo for _ in range(width)]
+
+
+def _canonical(move: Move) -> bool:
+    """带牌的走法是否与classify对这些牌的识别一致（如333444555带666会被识别为四连飞机，不能作为三连带翅膀）"""
+    return classify(move.cards) == move
+
+
+def _airplanes_with_wings(counts, length: int = None, width: int = None):
+    moves = []
+    for plane in _sequences(counts, 3, MIN_AIRPLANE, AIRPLANE, length):
+        rest = list(counts)
+        for i in plane.cards:
+            rest[i] -= 1
+        for wing_width in ([width] if width else (1, 2)):
+            for wings in _kicker_sets(rest, plane.length, wing_width):
+                move = _make(AIRPLANE_WINGS, plane.key, plane.length, plane.cards + tuple(wings))
+                if _canonical(move):
+                    moves.append(move)
+    return moves
+
+
+def _four_with_two(counts, width: int = None):
+    moves = []
+    for i in range(LITTLE_JOKER):
+        if counts[i] < 4:
+            continue
+        rest = list(counts)
+        rest[i] = 0
+        for kicker_width in ([width] if width else (1, 2)):
+            for kickers in _kicker_sets(rest, 2, kicker_width):
+                move = _make(FOUR_TWO, i, 1, (i,) * 4 + tuple(kickers))
+                if _canonical(move):
+                    moves.append(move)
+    return moves
+
+
+def _bombs(counts):
+    return [Move(BOMB, i, 1, (i,) * 4) for i in range(LITTLE_JOKER) if counts[i] == 4]
+
+
+def _rocket(counts):
+    if counts[LITTLE_JOKER] and counts[BIG_JOKER]:
+        return [_make(ROCKET, BIG_JOKER, 1, (LITTLE_JOKER, BIG_JOKER))]
+    return []
+
+
+def generate_moves(counts: Sequence[int]) -> List[Move]:
+    """枚举手牌中所有可以打出的牌（不含Pass）"""
+    moves = []
+    moves += _singles(counts)
+    moves += _pairs(counts)
+    moves += _trios(counts, 0)
+    moves += _trios(counts, 1)
+    moves += _trios(counts, 2)
+    moves += _sequences(counts, 1, MIN_STRAIGHT, STRAIGHT)
+    moves += _sequences(counts, 2, MIN_PAIR_STRAIGHT, PAIR_STRAIGHT)
+    moves += _sequences(counts, 3, MIN_AIRPLANE, AIRPLANE)
+    moves += _airplanes_with_wings(counts)
+    moves += _four_with_two(counts)
+    moves += _bombs(counts)
+    moves += _rocket(counts)
+    return moves
+
+
+def _same_type_moves(counts, last: Move) -> List[Move]:
+    """只枚举与last同牌型、同长度的走法"""
+    if last.type == SINGLE:
+        return _singles(counts)
+    if last.type == PAIR:
+        return _pairs(counts)
+    if last.type == TRIO:
+        return _trios(counts, 0)
+    if last.type == TRIO_SINGLE:
+        return _trios(counts, 1)
+    if last.type == TRIO_PAIR:
+        return _trios(counts, 2)
+    if last.type == STRAIGHT:
+        return _sequences(counts, 1, MIN_STRAIGHT, STRAIGHT, last.length)
+    if last.type == PAIR_STRAIGHT:
+        return _sequences(counts, 2, MIN_PAIR_STRAIGHT, PAIR_STRAIGHT, last.length)
+    if last.type == AIRPLANE:
+        return _sequences(counts, 3, MIN_AIRPLANE, AIRPLANE, last.length)
+    if last.type == AIRPLANE_WINGS:
+        width = 1 if len(last.cards) == last.length * 4 else 2
+        return _airplanes_with_wings(counts, last.length, width)
+    if last.type == FOUR_TWO:
+        return _four_with_two(counts, 1 if len(last.cards) == 6 else 2)
+    return []
+
+
+def legal_moves(counts: Sequence[int], last: Optional[Move] = None) -> List[Move]:
+    """
+    当前可选的全部合法走法：
+      - 首发（last为空或Pass）：手牌中任意牌型，不能Pass
+      - 跟牌：能压过last的走法（同牌型更大、炸弹、王炸），再加上Pass
+    """
+    if last is None or last.type == PASS:
+        return generate_moves(counts)
+    if last.type == ROCKET:
+        return [PASS_MOVE]
+    candidates = [] if last.type == BOMB else _same_type_moves(counts, last)
+    candidates += _bombs(counts) + _rocket(counts)
+    moves = [move for move in candidates if beats(move, last)]
+    moves.append(PASS_MOVE)
+    return moves
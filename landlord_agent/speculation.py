@@ -0,0 +1,182 @@
+"""
+推测执行：一次决策完成后，预测下一次轮到自己时最可能出现的局面，
+在空闲的决策容量上提前算好决策，局面真正出现时直接返回
+
+预测的局面（手牌由调用方给出，一般为打出推荐走法后的手牌）：
+  - 其余两家都Pass，轮到自己首发
+  - 下家用未出现的牌中最小的几手压过桌面上的牌（自己出牌时压自己的牌，Pass时压原来的待跟牌）
+自己和下家出的牌同步更新到对手剩余张数、未出现的牌和历史汇总中；
+预测结果按与决策缓存相同的规范化局面放入短时缓存，不区分最近出牌窗口的细节
+"""
+import copy
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional
+
+from play_notation import PASS, BOMB, ROCKET
+from rules_engine import SEATS, classify, hand_counts, legal_moves, move_ranks
+from ttl_cache import TTLCache, make_cache_key
+from decision_cache import normalize_state
+from landlord_agent import last_play_state, hand_state
+
+DEFAULT_TTL = 30.0
+DEFAULT_PREDICTIONS = 3
+
+
+def speculation_key(state: Dict[str, Any]) -> str:
+    return make_cache_key('speculation', normalize_state(state))
+
+
+def _after_play(situation: Dict[str, Any], seat: str, ranks: list, play_type: str):
+    """seat打出ranks后，局面中由牌局跟踪得到的部分（对手剩余张数、未出现的牌、历史汇总）"""
+    if not ranks:
+        return
+    counts = situation.get("对手剩余张数")
+    if isinstance(counts, dict) and seat in counts:
+        situation["对手剩余张数"] = dict(counts, **{seat: max(0, counts[seat] - len(ranks))})
+    unseen = situation.get("未出现的牌")
+    if isinstance(unseen, dict) and seat != situation.get("我的座位"):
+        unseen = dict(unseen)
+        for rank in ranks:
+            unseen[rank] = unseen.get(rank, 0) - 1
+        situation["未出现的牌"] = {rank: n for rank, n in unseen.items() if n > 0}
+    summary = situation.get("历史汇总")
+    if isinstance(summary, dict):
+        played = summary.get("各座位已出张数", {})
+        high = summary.get("大牌已出张数", {})
+        bombs = list(summary.get("已出炸弹", []))
+        if play_type in (BOMB, ROCKET):
+            bombs.append(f"{seat}:{' '.join(ranks)}")
+        situation["历史汇总"] = dict(
+            summary,
+            各座位已出张数=dict(played, **{seat: played.get(seat, 0) + len(ranks)}),
+            已出炸弹=bombs,
+            大牌已出张数={rank: n + ranks.count(rank) for rank, n in high.items()}
+        )
+
+
+def predict_states(state: Dict[str, Any], decision: Optional[dict], next_hand: list,
+                   limit: int = DEFAULT_PREDICTIONS) -> List[Dict[str, Any]]:
+    """按可能性从高到低列出下一次轮到自己时的局面（最多limit个）"""
+    situation = state.get("局面", {})
+    role = situation.get("我的阵营", "农民")
+    last_play = situation.get("桌面待跟牌(last_play)", {})
+    move = (decision or {}).get("recommended_move") or {}
+    target = move.get("cards") if move.get("action") == "play" else (
+        last_play.get("牌", []) if last_play.get("是否存在") else [])
+
+    plays = [[]]
+    try:
+        unseen = hand_counts([rank for rank, n in (situation.get("未出现的牌") or {}).items() for _ in range(n)])
+        last = classify(target or [])
+    except ValueError:
+        last = None
+    if last is not None and last.type != PASS:
+        responses = [m for m in legal_moves(unseen, last) if m.type not in (PASS, BOMB, ROCKET)]
+        responses.sort(key=lambda m: (m.key, len(m.cards)))
+        plays += [move_ranks(m) for m in responses[:limit - 1]]
+
+    # 自己打出推荐走法后的局面；下家紧接着出牌
+    base = dict(situation)
+    my_seat = situation.get("我的座位")
+    if move.get("action") == "play" and move.get("cards"):
+        _after_play(base, my_seat, list(move["cards"]), move.get("type"))
+    next_seat = SEATS[(SEATS.index(my_seat) + 1) % len(SEATS)] if my_seat in SEATS else None
+
+    states = []
+    for ranks in plays[:limit]:
+        play_type = classify(ranks).type if ranks else PASS
+        predicted = dict(state)
+        predicted["局面"] = dict(base)
+        if next_seat is not None:
+            _after_play(predicted["局面"], next_seat, ranks, play_type)
+        predicted["局面"]["我的手牌"] = hand_state(list(next_hand))
+        predicted["局面"]["桌面待跟牌(last_play)"] = last_play_state(play_type, ranks, role, next_seat)
+        states.append(predicted)
+    return states
+
+
+class SpeculativeExecutor:
+    """
+    agent为执行决策的 LandlordAgent；workers为推测决策的线程数，正在进行的推测数达到该值时
+    不再提交（只使用空闲容量）；ttl为推测结果的有效期（秒）
+    """
+
+    def __init__(self, agent, workers: int = 1, ttl: float = DEFAULT_TTL,
+                 predictions: int = DEFAULT_PREDICTIONS):
+        self.agent = agent
+        self.workers = max(1, workers)
+        self.predictions = predictions
+        self.cache = TTLCache(max_size=self.workers * predictions * 4, ttl=ttl)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='speculate')
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._counts = {"submitted": 0, "skipped_busy": 0, "hits": 0, "misses": 0, "late": 0, "failed": 0}
+
+    def speculate(self, state: Dict[str, Any], decision: Optional[dict], next_hand: list) -> int:
+        """为预测的局面提交推测决策，返回提交的个数"""
+        submitted = 0
+        for predicted in predict_states(state, decision, next_hand, self.predictions):
+            key = speculation_key(predicted)
+            if key in self.cache:
+                continue
+            with self._lock:
+                if self._in_flight >= self.workers:
+                    self._counts["skipped_busy"] += 1
+                    continue
+                self._in_flight += 1
+                self._counts["submitted"] += 1
+            future = self._executor.submit(self._run, copy.deepcopy(predicted))
+            self.cache.put(key, future)
+            submitted += 1
+        return submitted
+
+    def _run(self, state: Dict[str, Any]):
+        try:
+            return self.agent.decide(state)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def lookup(self, state: Dict[str, Any], timeout: float = None) -> Optional[dict]:
+        """
+        局面已被推测时返回其决策，否则返回None。推测仍在进行时最多等待timeout秒
+        （None为等到完成），超时未完成视为未命中
+        """
+        future: Future = self.cache.pop(speculation_key(state))
+        if future is None:
+            self._count("misses")
+            return None
+        try:
+            decision = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            self._count("late")
+            return None
+        except Exception as e:
+            print(f"推测决策失败: {e}")
+            self._count("failed")
+            return None
+        if not isinstance(decision, dict):
+            self._count("misses")
+            return None
+        self._count("hits")
+        return dict(decision, speculative=True)
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counts)
+            stats["in_flight"] = self._in_flight
+        pending = len(self.cache.items())
+        lookups = stats["hits"] + stats["misses"] + stats["late"] + stats["failed"]
+        stats["pending"] = pending
+        # 已提交但没有被使用、也不再等待使用的推测
+        stats["wasted"] = max(0, stats["submitted"] - stats["hits"] - stats["failed"] - pending)
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,80 @@
+"""
+测试进程内共享的模型客户端：多个LandlordAgent复用同一个客户端，预热为每个服务建立连接
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import client_registry
+import qwen_client
+from client_registry import get_llm_client, prewarm
+from llm_router import LLMRouter
+
+
+class FakeHTTPClient:
+    """记录HEAD请求的URL，fail中的URL抛出异常"""
+    def __init__(self, fail=()):
+        self.urls = []
+        self.fail = set(fail)
+
+    def head(self, url, timeout=None):
+        self.urls.append(url)
+        if url in self.fail:
+            raise ConnectionError("connection refused")
+
+
+@pytest.fixture(autouse=True)
+def registry():
+    """每个测试使用空的客户端注册表"""
+    client_registry.reset()
+    yield client_registry
+    client_registry.reset()
+
+
+def test_shared_client(make_agent):
+    """同一API密钥的多个LandlordAgent共用一个客户端，不同密钥各自创建"""
+    first, second = make_agent(llm_client=get_llm_client("test")), make_agent(llm_client=get_llm_client("test"))
+    assert first.qwen.client is second.qwen.client
+    assert make_agent(llm_client=get_llm_client("other")).qwen.client is not first.qwen.client
+    assert client_registry.stats()["clients"] == 2
+    # 每个LandlordAgent的决策缓存仍然独立
+    assert first.decision_cache is not second.decision_cache
+    # 未传入llm_client时单独创建
+    assert make_agent().qwen.client is not first.qwen.client
+
+
+def test_prewarm(monkeypatch):
+    """预热向每个服务的地址发请求，失败的服务记为None"""
+    http_client = FakeHTTPClient(fail={"https://api.deepseek.com"})
+    monkeypatch.setattr(client_registry, "get_http_client", lambda: http_client)
+    router = LLMRouter([
+        ("qwen", SimpleNamespace(provider="Qwen", base_url="https://dashscope.example/v1")),
+        ("deepseek", SimpleNamespace(provider="DeepSeek", base_url="https://api.deepseek.com"))
+    ])
+    results = prewarm(router)
+    assert http_client.urls == ["https://dashscope.example/v1", "https://api.deepseek.com"]
+    assert results["qwen"] is not None and results["deepseek"] is None
+    assert client_registry.stats()["prewarm"] == results
+    router.shutdown()
+
+
+def test_async_client_per_loop(monkeypatch):
+    """异步客户端和连接池按事件循环创建：同一循环内复用，再次asyncio.run时重新创建"""
+    for name in ("DEEPSEEK_API_KEY", "LLM_PROVIDERS"):
+        monkeypatch.delenv(name, raising=False)
+    fake_httpx = SimpleNamespace(Limits=lambda **kwargs: kwargs,
+                                 Client=lambda limits: SimpleNamespace(close=lambda: None),
+                                 AsyncClient=lambda limits: SimpleNamespace(limits=limits))
+    monkeypatch.setattr(client_registry, "httpx", fake_httpx)
+    monkeypatch.setattr(qwen_client, "AsyncOpenAI", lambda **kwargs: SimpleNamespace(**kwargs))
+    client = get_llm_client("test")
+
+    async def current():
+        return client.async_client, client.async_client, client_registry.get_async_http_client()
+
+    first, again, pool = asyncio.run(current())
+    assert first is again and first.http_client is pool
+    second, _, other_pool = asyncio.run(current())
+    assert second is not first and other_pool is not pool and second.http_client is other_pool
@@ -0,0 +1,82 @@
+"""
+测试带截止时间的决策：模型按时返回用模型结果，否则用本地策略
+"""
+
+import time
+
+import pytest
+
+from fakes import FakeClient, model_response
+from landlord_agent import SOURCE_ENGINE, SOURCE_LLM
+from local_policy import engine_decision
+from move_validator import MoveValidator, VALID
+
+HAND = ["3", "5", "9", "K", "A", "2"]
+
+
+@pytest.fixture
+def agent_with(make_agent):
+    """以给定模型客户端创建agent，手牌为HAND、待跟红桃Q"""
+    def factory(client):
+        agent = make_agent(client)
+        agent.set_hand(HAND, 2, "heart Q")
+        return agent
+    return factory
+
+
+def slow_client(delay, cards=("2",), error=None):
+    """延迟delay秒后返回固定决策的模型"""
+    return FakeClient(model_response(*cards, reasoning=["模型推理"]), delay=delay, error=error)
+
+
+def test_llm_in_time(agent_with):
+    """模型在截止时间内返回合法决策"""
+    result = agent_with(slow_client(0.05)).decide(deadline_ms=2000)
+    print(result)
+    assert result["decision_source"] == SOURCE_LLM
+    assert result["llm_status"] == "ok"
+    assert result["recommended_move"]["cards"] == ["2"]
+    assert 0 < result["time_left_ms"] < 2000
+
+
+def test_llm_timeout(agent_with):
+    """模型超时时按截止时间返回本地策略的决策"""
+    start = time.perf_counter()
+    result = agent_with(slow_client(1.0)).decide(deadline_ms=100)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"{result} 耗时{elapsed:.0f}ms")
+    assert elapsed < 500
+    assert result["decision_source"] == SOURCE_ENGINE
+    assert result["llm_status"] == "timeout"
+    assert result["recommended_move"]["cards"] == ["K"]
+    assert result["time_left_ms"] == 0
+
+
+def test_llm_illegal_or_error(agent_with):
+    """模型结果不合法或调用失败时用本地策略"""
+    result = agent_with(slow_client(0, cards=["7"])).decide(deadline_ms=1000)
+    assert result["decision_source"] == SOURCE_ENGINE and result["llm_status"] == "illegal"
+    result = agent_with(slow_client(0, error=Exception("Qwen API调用失败: 模拟错误"))).decide(deadline_ms=1000)
+    assert result["decision_source"] == SOURCE_ENGINE and result["llm_status"] == "error"
+
+
+def test_unknown_position_timeout(agent_with):
+    """本地策略无法识别局面时只等到截止时间，超时抛出 TimeoutError"""
+    agent = agent_with(slow_client(1.0))
+    agent.set_hand(["3", "X"], 2, "heart Q")
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        agent.decide(deadline_ms=100)
+    assert time.perf_counter() - start < 0.5
+
+
+def test_fallback_is_legal(agent_with):
+    """只剩炸弹可压时本地策略出炸弹（有牌可压不能Pass），兜底决策同样经过校验"""
+    hand = ["5", "5", "5", "5", "3", "4", "6", "7"]
+    fallback = engine_decision(hand, ["K"])
+    assert fallback["recommended_move"]["cards"] == ["5", "5", "5", "5"]
+    assert MoveValidator().check(fallback["recommended_move"], hand, ["K"])
+    agent = agent_with(slow_client(1.0))
+    agent.set_hand(hand, 2, "heart K")
+    result = agent.decide(deadline_ms=50)
+    assert result["llm_status"] == "timeout" and result["validation"]["status"] == VALID
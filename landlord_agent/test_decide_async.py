@@ -0,0 +1,72 @@
+"""
+测试异步决策：decide_async与decide结果一致，decide_many批量并发
+"""
+
+import time
+import asyncio
+
+import pytest
+
+from fakes import completion, model_response, openai_stub
+from landlord_agent import SOURCE_ENGINE, SOURCE_LLM
+
+DELAY = 0.2
+
+
+class FakeAsyncCompletions:
+    """模拟本地OpenAI兼容服务：每个请求延迟DELAY秒，记录同时进行的请求数"""
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    async def create(self, **kwargs):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(DELAY)
+        self.active -= 1
+        return completion(model_response("2"))
+
+
+@pytest.fixture
+def async_agent(make_agent):
+    """异步客户端替换为FakeAsyncCompletions的agent：返回 (agent, completions)"""
+    def factory():
+        agent = make_agent()
+        agent.decision_cache.bypass = True
+        completions = FakeAsyncCompletions()
+        agent.qwen.client.async_client = openai_stub(completions)
+        return agent, completions
+    return factory
+
+
+def test_decide_async(async_agent):
+    """异步决策经过校验，强制局面不调用模型"""
+    agent, completions = async_agent()
+    agent.set_hand(["3", "5", "9", "2"], 1, "heart K")
+    result = asyncio.run(agent.decide_async())
+    assert result["recommended_move"]["cards"] == ["2"]
+    assert result["decision_source"] == SOURCE_LLM
+    agent.set_hand(["3", "5"], 1, "heart K")
+    assert asyncio.run(agent.decide_async())["decision_source"] == SOURCE_ENGINE
+    assert completions.peak == 1
+
+
+def test_decide_many(async_agent):
+    """数百个决策同时进行，总耗时接近单个请求的延迟"""
+    agent, completions = async_agent()
+    states = []
+    for i in range(300):
+        agent.set_hand(["3", "5", "9", "2"] + ["4"] * (i % 3), i + 1, "heart K")
+        states.append(agent.build_game_state())
+    started = time.perf_counter()
+    results = asyncio.run(agent.decide_many(states, concurrency=300))
+    elapsed = time.perf_counter() - started
+    print(f"300个决策耗时 {elapsed:.2f} 秒，最多同时进行 {completions.peak} 个")
+    assert all(r["recommended_move"]["cards"] == ["2"] for r in results)
+    assert completions.peak >= 200
+    assert elapsed < DELAY * 10
+
+    # 并发上限
+    agent, completions = async_agent()
+    asyncio.run(agent.decide_many(states[:20], concurrency=5))
+    assert completions.peak == 5
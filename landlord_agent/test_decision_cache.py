@@ -0,0 +1,75 @@
+"""
+测试决策缓存：规范化局面、LRU+TTL内存层、SQLite持久层、命中率与bypass
+"""
+
+import pytest
+
+from decision_cache import CachingClient, DecisionCache, state_key
+from fakes import FakeClient, model_response
+
+RESPONSE = model_response("K")
+
+
+@pytest.fixture
+def make_state(make_agent):
+    """发送给模型的（压缩后的）局面"""
+    def factory(hand, round_num=1, prev=None, history=()):
+        agent = make_agent()
+        for player, card in history:
+            agent.record(player, round_num, card)
+        agent.set_hand(hand, round_num, prev)
+        return agent.compactor.compact(agent.build_game_state())[0]
+    return factory
+
+
+def test_equivalent_states(make_state):
+    """手牌顺序、回合数不同的相同局面键相同，手牌或待跟牌不同时键不同"""
+    a = make_state(["K", "3", "5"], 1, "heart 9")
+    b = make_state(["3", "5", "K"], 7, "spade 9")
+    assert state_key(a) == state_key(b)
+    assert state_key(a) != state_key(make_state(["3", "5", "A"], 1, "heart 9"))
+    assert state_key(a) != state_key(make_state(["K", "3", "5"], 1, "heart 10"))
+
+
+def test_memory_tier(make_state):
+    """相同局面只调用一次模型，无法解析的输出不缓存"""
+    inner = FakeClient(RESPONSE)
+    client = CachingClient(inner, DecisionCache())
+    state = make_state(["3", "5", "K"])
+    assert client.get_card_recommendation(state) == RESPONSE
+    assert client.get_card_recommendation(state) == RESPONSE
+    assert inner.calls == 1
+    stats = client.cache.stats()
+    assert stats["memory_hits"] == 1 and stats["misses"] == 1 and stats["hit_rate"] == 0.5
+
+    bad = FakeClient("不是JSON")
+    client = CachingClient(bad, DecisionCache())
+    client.get_card_recommendation(state)
+    client.get_card_recommendation(state)
+    assert bad.calls == 2
+
+
+def test_persistent_tier(make_state, tmp_path):
+    """持久层在重启后仍然命中，过期后失效"""
+    path = str(tmp_path / "decisions.db")
+    state = make_state(["3", "5", "K"])
+    CachingClient(FakeClient(RESPONSE), DecisionCache(db_path=path)).get_card_recommendation(state)
+    restarted = CachingClient(FakeClient(RESPONSE), DecisionCache(db_path=path))
+    assert restarted.get_card_recommendation(state) == RESPONSE
+    assert restarted.client.calls == 0 and restarted.cache.stats()["disk_hits"] == 1
+
+    expired = DecisionCache(db_path=str(tmp_path / "expired.db"), ttl=-1)
+    expired.put(state_key(state), RESPONSE)
+    expired.memory.clear()
+    assert expired.get(state_key(state)) is None
+
+
+def test_bypass(make_state):
+    """bypass时每次都调用模型"""
+    inner = FakeClient(RESPONSE)
+    client = CachingClient(inner, DecisionCache(bypass=True))
+    state = make_state(["3", "5", "K"])
+    client.get_card_recommendation(state)
+    client.get_card_recommendation(state)
+    assert inner.calls == 2
+    assert client.cache.stats()["bypassed"] == 2
@@ -0,0 +1,77 @@
+"""
+测试残局求解：手牌编码、完全信息胜负、未知牌分配下的必胜走法，以及decide中的自动求解
+"""
+
+import pytest
+
+from endgame_solver import (EndgameSolver, LANDLORD_WINS, FARMERS_WIN, encode_hand, decode_hand)
+from fakes import NoCallClient
+from rules_engine import classify, hand_counts
+from landlord_agent import SOURCE_ENGINE
+
+
+def test_encoding():
+    """手牌编码可以还原为计数向量"""
+    counts = hand_counts(["3", "3", "3", "3", "K", "2", "小王", "大王"])
+    assert decode_hand(encode_hand(counts)) == counts
+    assert encode_hand(hand_counts([])) == 0
+
+
+def test_solve_perfect_information():
+    """完全信息局面：地主首发王炸后出最后一张必胜；地主只剩小牌而农民有大牌时农民必胜"""
+    solver = EndgameSolver()
+    hands = [hand_counts(["小王", "大王", "3"]), hand_counts(["2", "2"]), hand_counts(["A"])]
+    assert solver.solve(hands, 0) == LANDLORD_WINS
+    hands = [hand_counts(["3", "4"]), hand_counts(["2"]), hand_counts(["A", "K"])]
+    assert solver.solve(hands, 1, classify(["3"]), 0) == FARMERS_WIN
+    assert solver.table, "置换表应记录搜索过的局面"
+
+
+def test_proven_move():
+    """对手手牌未知时，找出不依赖对手手牌分配的必胜走法"""
+    solver = EndgameSolver()
+    move = solver.proven_move(hand_counts(["小王", "大王", "3"]), hand_counts(["4", "4", "5", "5"]),
+                              {"A": 2, "C": 2}, "B", classify(["A"]), "A")
+    print(move)
+    assert move is not None and move.cards[0] >= 13
+    # 下家C只有一张牌时，可能是压不过的4，地主拿到K、2后必胜，因此无法证明必胜
+    move = solver.proven_move(hand_counts(["5", "7"]), hand_counts(["4", "K", "2"]),
+                              {"A": 2, "C": 1}, "B")
+    assert move is None
+    # 每种分配下先出J都必胜，但之后的打法取决于B手里是10还是J，看不到对手的牌就无法保证必胜
+    hand = hand_counts(["J", "A", "10", "6", "6"])
+    for b, c in ((["10"], ["J", "J"]), (["J"], ["10", "J"])):
+        assert classify(["J"]) in solver.winning_moves([hand, hand_counts(b), hand_counts(c)], 0)
+    assert solver.proven_move(hand, hand_counts(["10", "J", "J"]), {"B": 1, "C": 2}, "A") is None
+    # 超过阈值时不求解
+    assert EndgameSolver(threshold=4).proven_move(hand_counts(["小王", "大王", "3"]), hand_counts(["4", "4"]),
+                                                  {"A": 1, "C": 1}, "B") is None
+
+
+def test_decide_uses_endgame(make_agent):
+    """历史记录完整、剩余牌很少时decide直接返回求解结果"""
+    agent = make_agent(NoCallClient())
+    hand = ["小王", "大王", "3"]
+    # 除手牌和对手手中的 4 4 5 5 外，其余的牌都已出过
+    deck = {rank: (1 if rank in ("小王", "大王") else 4) for rank in
+            ["3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K", "A", "2", "小王", "大王"]}
+    for rank in hand + ["4", "4", "5", "5"]:
+        deck[rank] -= 1
+    played = [rank for rank, n in deck.items() for _ in range(n)]
+    quotas = {"A": 18, "B": 14, "C": 15}
+    records = []
+    for seat, quota in quotas.items():
+        for _ in range(quota):
+            records.append({"player": seat, "round": 1, "card": "heart " + played.pop(), "weighting": 1.0})
+    agent.record_batch(records)
+    agent.set_hand(hand, 10, "club A", last_player="A")
+    result = agent.decide()
+    print(result)
+    assert result["decision_source"] == SOURCE_ENGINE
+    assert result["recommended_move"]["action"] == "play"
+    assert agent.build_game_state()["局面"]["桌面待跟牌(last_play)"]["出牌者"] == "A"
+
+    # 不知道上一手的出牌者时不使用求解器
+    agent.set_hand(hand, 10, "club A")
+    with pytest.raises(AssertionError, match="不应调用模型"):
+        agent.decide()
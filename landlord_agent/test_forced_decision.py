@@ -0,0 +1,55 @@
+"""
+测试规则引擎快速路径：强制/简单局面不调用模型
+"""
+
+import pytest
+
+from fakes import NoCallClient
+from landlord_agent import SOURCE_ENGINE
+
+
+@pytest.fixture
+def agent(make_agent):
+    return make_agent(NoCallClient())
+
+
+def test_forced_pass(agent):
+    """没有能压过上一手的牌时直接Pass"""
+    agent.set_hand(["3", "5", "9"], 2, "heart 2")
+    result = agent.decide()
+    print(result)
+    assert result["recommended_move"]["action"] == "pass"
+    assert result["decision_source"] == SOURCE_ENGINE
+
+
+def test_last_card_on_lead(agent):
+    """首发只剩一张牌时直接出"""
+    agent.set_hand(["K"], 3)
+    result = agent.decide()
+    print(result)
+    assert result["recommended_move"] == {"action": "play", "cards": ["K"], "type": "单张"}
+    assert result["decision_source"] == SOURCE_ENGINE
+
+
+def test_whole_hand(agent):
+    """剩余手牌是一手能压过上一手的牌时一次出完"""
+    agent.set_hand(["9", "9", "9", "4", "4"], 5, "三带二 8 8 8 5 5")
+    result = agent.decide()
+    print(result)
+    assert result["recommended_move"]["cards"] == ["4", "4", "9", "9", "9"]
+    assert result["recommended_move"]["type"] == "三带二"
+
+    agent.set_hand(["2", "2", "2", "2"], 5, "club A")
+    assert agent.decide()["recommended_move"]["type"] == "炸弹"
+
+
+def test_game_state_snapshot(agent):
+    """传入局面快照时同样走快速路径，stream/early接口与decide一致"""
+    agent.set_hand(["3", "4"], 2, "big_joker")
+    state = agent.build_game_state()
+    assert agent.decide(state)["recommended_move"]["action"] == "pass"
+    events = list(agent.decide_stream(state))
+    assert [event for event, _ in events] == ["move", "decision"]
+    early = agent.decide_early(state)
+    assert early.move["action"] == "pass"
+    assert early.result()["decision_source"] == SOURCE_ENGINE
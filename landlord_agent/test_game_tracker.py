@@ -0,0 +1,68 @@
+"""
+测试牌局跟踪：剩余张数、未出现的牌、内存中的历史出牌、从数据库重建与清空
+"""
+
+from game_tracker import GameTracker
+
+
+def test_counts_and_unseen():
+    """单张和组合牌型都计入出牌座位的张数，未出现的牌不含自己的手牌"""
+    tracker = GameTracker()
+    tracker.record("A", "heart K")
+    tracker.record("B", "对子 K K")
+    tracker.record("C", "无")
+    tracker.record("A", "little_joker")
+    assert tracker.remaining == {"A": 18, "B": 15, "C": 17}
+    unseen = tracker.unseen_counts(["K", "3"])
+    assert "K" not in unseen and "小王" not in unseen
+    assert unseen["3"] == 3 and unseen["大王"] == 1
+    assert sum(unseen.values()) == 54 - 4 - 2
+    # 同一张牌重复记录时取同点数的另一张
+    tracker.record("B", "heart K")
+    assert bin(tracker.played_mask).count("1") == 5
+
+
+def test_agent_live_counts(make_agent):
+    """局面中的对手剩余张数随记录实时更新"""
+    agent = make_agent()
+    agent.record("A", 1, "三带二 8 8 8 5 5")
+    agent.record_batch([{"player": "C", "round": 1, "card": "spade 9", "weighting": 1.0}])
+    agent.set_hand(["3", "4"], 1, "spade 9")
+    situation = agent.build_game_state()["局面"]
+    print(situation["对手剩余张数"], situation["未出现的牌"])
+    assert situation["对手剩余张数"] == {"A": 15, "C": 16}
+    assert situation["未出现的牌"]["8"] == 1
+
+
+def test_history_in_memory(make_agent):
+    """构建局面时不再读取数据库，历史出牌与数据库中的记录一致"""
+    agent = make_agent()
+    agent.record("A", 1, "heart K")
+    agent.record_batch([{"player": "B", "round": 1, "card": "无", "weighting": 1.0},
+                        {"player": "C", "round": 1, "card": "对子 2 2", "weighting": 1.0}])
+
+    def no_reload():
+        raise AssertionError("不应重新读取整个历史")
+    agent.db.get_all = no_reload
+    agent.db.get_records = no_reload
+    agent.set_hand(["3"], 2)
+    history = agent.build_game_state()["局面"]["历史出牌"]
+    assert [play["玩家"] for play in history] == ["A", "B", "C"]
+    assert history[1]["动作"] == "Pass"
+    assert history[2] == {"回合": 1, "玩家": "C", "动作": "出牌", "牌型": "对子", "牌": ["2", "2"]}
+
+
+def test_rebuild_and_clear(make_agent, tmp_path):
+    """重启后从数据库重建，清空数据库后重置"""
+    db_path = str(tmp_path / "restart.db")
+    agent = make_agent(db_path=db_path)
+    agent.record("B", 1, "顺子 3 4 5 6 7")
+    restarted = make_agent(db_path=db_path)
+    assert restarted.tracker.remaining == agent.tracker.remaining
+    assert restarted.tracker.played_mask == agent.tracker.played_mask
+    assert restarted.history_plays == agent.history_plays
+    restarted.db.clear()
+    restarted.set_hand(["3"], 1, None, "地主")
+    situation = restarted.build_game_state()["局面"]
+    assert situation["对手剩余张数"] == {"B": 17, "C": 17}
+    assert situation["历史出牌"] == []
@@ -0,0 +1,78 @@
+"""
+测试手牌拆分：最少出牌手数、拆牌方案合法性、手牌特征与局面中的手牌分析
+"""
+
+import sys
+import threading
+import time
+
+from hand_analysis import decompose, min_plays, hand_features
+from rules_engine import classify, hand_counts
+from landlord_agent import LandlordAgent
+
+
+def test_min_plays():
+    """常见手牌的最少出牌手数"""
+    assert min_plays([]) == 0
+    assert min_plays(["K"]) == 1
+    assert min_plays(["3", "4", "5", "6", "7"]) == 1
+    assert min_plays(["3", "4", "5", "6", "7", "9"]) == 2
+    assert min_plays(["8", "8", "8", "5", "5"]) == 1
+    assert min_plays(["3", "3", "4", "4", "5", "5", "K", "小王", "大王"]) == 3
+
+
+def test_plan_is_legal():
+    """拆牌方案中每一手都是合法牌型，合起来正好是整手牌"""
+    hand = ["3", "4", "5", "6", "7", "8", "8", "9", "10", "J", "J", "Q", "K", "A", "2", "2", "小王"]
+    plan = decompose(hand)
+    used = [0] * 15
+    for move in plan:
+        assert classify([i for i in move.cards]) is not None
+        for idx in move.cards:
+            used[idx] += 1
+    assert tuple(used) == hand_counts(hand)
+    print(f"{len(hand)}张牌拆成{len(plan)}手")
+
+
+def test_features():
+    """控制牌张数与可用炸弹数（含王炸），结果跨调用缓存"""
+    hand = ["9", "9", "9", "9", "2", "2", "小王", "大王", "3"]
+    features = hand_features(hand)
+    print(features)
+    assert features["控制牌张数"] == 4
+    assert features["炸弹数"] == 2
+    assert features["最少出牌手数"] == len(features["拆牌方案"])
+    started = time.perf_counter()
+    assert hand_features(hand) == features
+    assert time.perf_counter() - started < 0.01
+    assert hand_features(["X"]) == {}
+
+
+def test_game_state(make_agent):
+    """发送给模型的局面中包含手牌分析"""
+    agent = make_agent()
+    agent.set_hand(["3", "4", "5", "6", "7", "K", "K"], 1)
+    analysis = agent.build_game_state()["局面"]["我的手牌"]["手牌分析"]
+    assert analysis["最少出牌手数"] == 2
+
+
+def test_features_outside_lock(make_agent, monkeypatch):
+    """手牌分析在agent锁外计算，计算期间其他线程可以record/set_hand"""
+    agent = make_agent()
+    lock_free = []
+
+    def features(hand):
+        def probe():
+            acquired = agent.lock.acquire(blocking=False)
+            lock_free.append(acquired)
+            if acquired:
+                agent.lock.release()
+        thread = threading.Thread(target=probe)
+        thread.start()
+        thread.join()
+        return {"最少出牌手数": 1}
+
+    monkeypatch.setattr(sys.modules[LandlordAgent.__module__], "hand_features", features)
+    agent.set_hand(["K", "K"], 1)
+    assert agent.build_game_state()["局面"]["我的手牌"]["手牌分析"] == {"最少出牌手数": 1}
+    assert lock_free == [True]
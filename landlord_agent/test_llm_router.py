@@ -0,0 +1,143 @@
+"""
+测试多模型服务路由：延迟统计、超过p95时对冲、对冲预算、故障转移和熔断的服务
+"""
+
+import time
+import asyncio
+
+import pytest
+
+from llm_router import LLMRouter, ProviderStats, create_llm_client
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+class FakeProvider:
+    """每个请求延迟delay秒后返回name；fail为True时抛出异常"""
+    def __init__(self, name, delay=0.0, fail=False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.cancelled = 0
+        self.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+
+    def get_card_recommendation(self, state):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise Exception(f"{self.name} API调用失败: HTTP 503")
+        return self.name
+
+    async def get_card_recommendation_async(self, state):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise Exception(f"{self.name} API调用失败: HTTP 503")
+        return self.name
+
+
+def warm(router, name, latency, n=20):
+    for _ in range(n):
+        router._record(name, latency)
+
+
+def test_provider_stats():
+    """延迟EWMA、p95和错误率"""
+    stats = ProviderStats()
+    for ms in range(1, 101):
+        stats.record(ms / 1000)
+    assert abs(stats.p95() - 0.096) < 1e-9
+    assert 0.08 < stats.latency_ewma < 0.1
+    stats.record(None)
+    snapshot = stats.snapshot()
+    assert snapshot["errors"] == 1 and snapshot["samples"] == 100
+    assert abs(snapshot["error_rate"] - 0.2) < 1e-9
+
+
+def test_no_hedge_when_fast():
+    """主服务在p95内返回时不发对冲请求"""
+    primary, secondary = FakeProvider("qwen", 0.01), FakeProvider("deepseek")
+    router = LLMRouter([("qwen", primary), ("deepseek", secondary)], max_hedge_ratio=1.0)
+    warm(router, "qwen", 0.2)
+    assert router.get_card_recommendation({}) == "qwen"
+    assert secondary.calls == 0
+    assert router.get_resilience_stats()["hedged"] == 0
+
+
+def test_hedge_slow_primary():
+    """主服务超过p95仍未返回时对冲，取先返回的结果"""
+    primary, secondary = FakeProvider("qwen", 0.5), FakeProvider("deepseek", 0.01)
+    router = LLMRouter([("qwen", primary), ("deepseek", secondary)], max_hedge_ratio=1.0)
+    warm(router, "qwen", 0.05)
+    started = time.monotonic()
+    assert router.get_card_recommendation({}) == "deepseek"
+    assert time.monotonic() - started < 0.3
+    stats = router.get_resilience_stats()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+
+    # 异步版本取消落后的请求
+    assert asyncio.run(router.get_card_recommendation_async({})) == "deepseek"
+    assert primary.cancelled == 1
+    router.shutdown()
+
+
+def test_hedged_latency_recorded():
+    """异步对冲中被取消的主服务请求按已等待的时间记录，p95不会因为只记录快请求而越来越小"""
+    primary, secondary = FakeProvider("qwen"), FakeProvider("deepseek", 0.005)
+    router = LLMRouter([("qwen", primary), ("deepseek", secondary)], max_hedge_ratio=1.0)
+    warm(router, "qwen", 0.01, n=19)
+    router._record("qwen", 0.05)
+    p95 = router._stats["qwen"].p95()
+    for delay in (0.3, 0.01) * 3:
+        primary.delay = delay
+        asyncio.run(router.get_card_recommendation_async({}))
+        assert router._stats["qwen"].p95() >= p95
+    assert primary.cancelled == 3 and router.get_resilience_stats()["hedged"] == 3
+    router.shutdown()
+
+
+def test_hedge_budget():
+    """对冲请求数不超过总请求数的max_hedge_ratio"""
+    primary, secondary = FakeProvider("qwen", 0.05), FakeProvider("deepseek", 0.0)
+    # 样本不足时使用固定的对冲等待时间
+    router = LLMRouter([("qwen", primary), ("deepseek", secondary)], max_hedge_ratio=0.25,
+                       default_delay=0.01, min_samples=1000)
+    for _ in range(8):
+        router.get_card_recommendation({})
+    assert router.get_resilience_stats()["hedged"] == 2
+    router.shutdown()
+
+
+def test_failover():
+    """主服务出错时改用备用服务；熔断的服务不再被选中，全部熔断时抛出 CircuitOpenError"""
+    primary, secondary = FakeProvider("qwen", fail=True), FakeProvider("deepseek")
+    router = LLMRouter([("qwen", primary), ("deepseek", secondary)], hedge=False)
+    assert router.get_card_recommendation({}) == "deepseek"
+    assert router.get_resilience_stats()["failovers"] == 1
+    assert router.get_resilience_stats()["providers"]["qwen"]["errors"] == 1
+
+    primary.breaker.record_failure()
+    assert router.get_card_recommendation({}) == "deepseek"
+    assert primary.calls == 1
+    secondary.breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        router.get_card_recommendation({})
+
+
+def test_create_llm_client(monkeypatch):
+    """只为配置了API密钥的服务创建客户端，一个都没有时才报错"""
+    for name in ("QWEN_API_KEY", "DEEPSEEK_API_KEY", "LLM_PROVIDERS"):
+        monkeypatch.delenv(name, raising=False)
+    with pytest.raises(ValueError):
+        create_llm_client()
+    assert create_llm_client("qwen-key").provider == "Qwen"
+
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "deepseek-key")
+    assert create_llm_client().provider == "DeepSeek"
+    router = create_llm_client("qwen-key")
+    assert [name for name, _ in router.providers] == ["qwen", "deepseek"]
+    router.shutdown()
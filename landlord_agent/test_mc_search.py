@@ -0,0 +1,47 @@
+"""
+测试蒙特卡洛搜索：未知牌推算、必胜走法识别与进程池
+"""
+
+from mc_search import MonteCarloSearch, unseen_counts
+from rules_engine import hand_counts
+
+
+def test_unseen_counts():
+    """未出现的牌 = 整副牌 - 我的手牌 - 已出的牌"""
+    unseen = unseen_counts(hand_counts(["3", "3", "小王"]), hand_counts(["3", "K"]))
+    assert unseen[0] == 1 and unseen[10] == 3 and unseen[13] == 0 and unseen[14] == 1
+    assert sum(unseen) == 54 - 5
+
+
+def test_winning_move():
+    """王炸后再出最后一张必胜，胜率应为100%"""
+    with MonteCarloSearch(processes=1, simulations=200) as search:
+        result = search.search(["小王", "大王", "3"], ["A"], my_seat="B", last_player="A", seed=7)
+    rates = {tuple(m["move"]["cards"]): m["win_rate"] for m in result["moves"]}
+    print(rates)
+    assert rates[("小王", "大王")] == 1.0
+    assert result["best"]["win_rate"] == 1.0
+
+
+def test_process_pool():
+    """进程池模式与单进程模式的模拟局数一致"""
+    hand = ["3", "4", "5", "6", "7", "9", "9", "J", "Q", "K"]
+    with MonteCarloSearch(processes=2, simulations=300) as search:
+        pooled = search.search(hand, [], my_seat="A", seed=3)
+    with MonteCarloSearch(processes=1, simulations=300) as search:
+        single = search.search(hand, [], my_seat="A", seed=3)
+    print(f"进程池: {pooled['simulations']}局，单进程: {single['simulations']}局")
+    assert pooled["simulations"] == single["simulations"]
+    assert pooled["processes"] == 2
+
+
+def test_search_game_state(make_agent):
+    """直接搜索agent构建的局面，返回决策输出格式"""
+    agent = make_agent()
+    agent.record("A", 1, "heart 8")
+    agent.set_hand(["5", "9", "9", "K", "2"], 1, "heart 8")
+    with MonteCarloSearch(processes=1, simulations=200) as search:
+        decision = search.decision(agent.build_game_state())
+    print(decision["reasoning"])
+    assert decision["recommended_move"]["action"] in ("play", "pass")
+    assert decision["win_rates"]
@@ -0,0 +1,72 @@
+"""
+测试模型决策的合法性校验与本地修复
+"""
+
+from fakes import FakeClient, model_response
+from move_validator import MoveValidator, VALID, REPAIRED_BACKUP, REPAIRED_NEAREST
+
+HAND = ["3", "5", "9", "K", "A", "2"]
+
+
+def play(*cards, combo_type="单张"):
+    return {"action": "play", "cards": list(cards), "type": combo_type}
+
+
+PASS = {"action": "pass", "cards": [], "type": "Pass"}
+
+
+def test_valid_move():
+    """合法出牌原样通过"""
+    validator = MoveValidator()
+    decision = validator.validate({"recommended_move": play("A"), "reasoning": []}, HAND, ["K"])
+    assert decision["validation"]["status"] == VALID
+    assert decision["recommended_move"]["cards"] == ["A"]
+
+
+def test_illegal_pass():
+    """有牌可压时Pass不合法，改用合法的backup_move"""
+    validator = MoveValidator()
+    decision = {"recommended_move": PASS, "backup_move": play("2"), "reasoning": []}
+    decision = validator.validate(decision, HAND, ["K"])
+    print(decision["validation"])
+    assert decision["validation"]["status"] == REPAIRED_BACKUP
+    assert decision["recommended_move"]["cards"] == ["2"]
+
+    # 首发时Pass不合法，没有backup_move时选最小的单张
+    decision = validator.validate({"recommended_move": PASS}, ["K"], [])
+    assert decision["recommended_move"] == play("K")
+
+
+def test_not_in_hand():
+    """出了手牌中没有的牌或压不过上一手时，修复为最接近的合法走法"""
+    validator = MoveValidator()
+    decision = validator.validate({"recommended_move": play("Q")}, HAND, ["J"])
+    print(decision["recommended_move"])
+    assert decision["validation"]["status"] == REPAIRED_NEAREST
+    assert decision["recommended_move"] == play("K")
+
+    decision = validator.validate({"recommended_move": play("9")}, HAND, ["10"])
+    assert decision["recommended_move"]["cards"] in (["K"], ["A"], ["2"])
+
+
+def test_malformed():
+    """无法解析的模型输出也在本地修复"""
+    validator = MoveValidator()
+    decision = validator.validate("这不是JSON", HAND, ["K"])
+    print(decision)
+    assert decision["raw_response"] == "这不是JSON"
+    assert decision["validation"]["malformed"]
+    assert decision["recommended_move"] == play("A")
+    stats = validator.stats()
+    assert stats["malformed"] == 1 and stats[REPAIRED_NEAREST] == 1
+
+
+def test_agent_decide(make_agent):
+    """decide() 返回校验后的决策并统计结果"""
+    agent = make_agent(FakeClient(model_response(reasoning=[])))
+    agent.set_hand(HAND, 2, "heart K")
+    result = agent.decide()
+    print(result)
+    assert result["recommended_move"] == play("A")
+    assert result["decision_source"] == "llm"
+    assert agent.get_validation_stats()[REPAIRED_NEAREST] == 1
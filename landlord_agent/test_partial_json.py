@@ -0,0 +1,43 @@
+"""
+测试流式JSON扫描：对象跨多个分片到达、字符串中含转义字符和括号时仍能正确提取
+"""
+
+import json
+
+from partial_json import IncrementalJSONScanner, extract_object
+
+MOVE = {"cards": ["3", "3"], "type": "对子", "note": "含\"引号\"和{括号}"}
+TEXT = json.dumps({"reasoning": "先出小牌 } ] \\ {", "recommended_move": MOVE, "backup_move": {"cards": []}},
+                  ensure_ascii=False)
+
+
+def test_chunked_feed():
+    """逐字符输入时，recommended_move闭合的那一刻返回，之前返回空"""
+    scanner = IncrementalJSONScanner()
+    end = TEXT.index('"backup_move"')
+    completed_at = None
+    for i, ch in enumerate(TEXT):
+        if scanner.feed(ch):
+            completed_at = i
+    assert completed_at is not None and completed_at < end
+    assert TEXT[completed_at] == "}"
+    assert scanner.get("recommended_move") == MOVE
+    # 未指定的键不提取
+    assert scanner.get("backup_move") is None
+
+
+def test_split_inside_escape():
+    """分片边界落在转义符和字符串中间"""
+    scanner = IncrementalJSONScanner(keys=("recommended_move", "backup_move"))
+    split = TEXT.index('\\"')
+    assert scanner.feed(TEXT[:split + 1]) == []
+    assert scanner.feed(TEXT[split + 1:]) == ["recommended_move", "backup_move"]
+    assert scanner.get("backup_move") == {"cards": []}
+
+
+def test_extract_object():
+    """只在对象完整输出后返回；嵌套层级中的同名键和字符串中的键名不算"""
+    assert extract_object(TEXT, "recommended_move") == MOVE
+    assert extract_object(TEXT[:TEXT.index('"backup_move"') - 3], "recommended_move") is None
+    nested = '{"analysis": {"recommended_move": {"cards": ["2"]}}, "text": "recommended_move"}'
+    assert extract_object(nested, "recommended_move") is None
@@ -0,0 +1,66 @@
+"""
+测试提示词压缩：紧凑记法、最近出牌窗口、历史汇总与token预算
+"""
+
+import json
+
+import pytest
+
+from fakes import FakeClient, model_response
+from prompt_compaction import PromptCompactor, compact_play, estimate_tokens
+
+
+@pytest.fixture
+def agent_with_history(make_agent):
+    """创建已有plays手出牌记录（最后一手为C的炸弹）的agent"""
+    def factory(plays: int, client=None):
+        agent = make_agent(client)
+        seats = ["A", "B", "C"]
+        agent.record_batch([{"player": seats[i % 3], "round": i // 3 + 1, "card": "无" if i % 2 else "heart 5",
+                             "weighting": 1.0} for i in range(plays)])
+        agent.record("C", 99, "炸弹 9 9 9 9")
+        agent.set_hand(["3", "4", "6", "8", "10", "Q"], 99)
+        return agent
+    return factory
+
+
+def test_compact_play():
+    """紧凑记法"""
+    assert compact_play({"玩家": "A", "牌": ["8", "8", "8", "5", "5"]}) == "A:8 8 8 5 5"
+    assert compact_play({"玩家": "B", "牌": []}) == "B:Pass"
+    assert estimate_tokens("abcd") == 1 and estimate_tokens("对子") == 2
+
+
+def test_window_and_summary(agent_with_history):
+    """只保留最近的出牌，汇总中包含各座位已出张数和炸弹，不修改原局面"""
+    agent = agent_with_history(8)
+    state = agent.build_game_state()
+    compact, tokens = PromptCompactor(window=5, token_budget=100000).compact(state)
+    situation = compact["局面"]
+    assert len(state["局面"]["历史出牌"]) == 9
+    assert "历史出牌" not in situation
+    assert situation["最近出牌"][-1] == "C:9 9 9 9"
+    assert len(situation["最近出牌"]) == 5 and situation["省略的早期出牌手数"] == 4
+    assert situation["历史汇总"]["已出炸弹"] == ["C:9 9 9 9"]
+    assert sum(situation["历史汇总"]["各座位已出张数"].values()) == 4 + 4
+    assert tokens == estimate_tokens(json.dumps(compact, ensure_ascii=False, separators=(',', ':')))
+
+
+def test_token_budget(agent_with_history):
+    """超出预算时继续缩短窗口，提示词大小不随历史增长"""
+    small = PromptCompactor(token_budget=1).compact(agent_with_history(10).build_game_state())
+    assert small[0]["局面"]["最近出牌"] == []
+    sizes = [PromptCompactor().compact(agent_with_history(n).build_game_state())[1] for n in (20, 200)]
+    print(f"20手历史: {sizes[0]} tokens，200手历史: {sizes[1]} tokens")
+    assert sizes[1] - sizes[0] < 20
+
+
+def test_decide_reports_tokens(agent_with_history):
+    """decide发送压缩后的局面，并报告提示词token数"""
+    agent = agent_with_history(30, FakeClient(model_response("3")))
+    result = agent.decide()
+    sent = agent.qwen.states[0]["局面"]
+    assert "最近出牌" in sent and "历史出牌" not in sent
+    assert result["prompt_tokens"] > 0
+    stats = agent.get_prompt_stats()
+    assert stats["decisions"] == 1 and stats["last_prompt_tokens"] == result["prompt_tokens"]
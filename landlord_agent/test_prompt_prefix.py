@@ -0,0 +1,57 @@
+"""
+测试提示词前缀：系统消息逐字节不变，用户消息只包含可变局面，token用量钩子
+"""
+
+from types import SimpleNamespace
+
+from fakes import completion, model_response, openai_stub
+from qwen_client import QwenClient, SYSTEM_MESSAGE, STATIC_KEYS
+
+
+class FakeCompletions:
+    """返回固定结果和token用量的 chat.completions"""
+    def __init__(self):
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        usage = SimpleNamespace(prompt_tokens=800, completion_tokens=40,
+                                prompt_tokens_details=SimpleNamespace(cached_tokens=600))
+        return completion(model_response(), usage)
+
+
+def make_client(hook=None):
+    client = QwenClient(api_key="test", usage_hook=hook)
+    completions = FakeCompletions()
+    client.client = openai_stub(completions)
+    return client, completions
+
+
+def test_stable_prefix(make_agent):
+    """不同局面的系统消息完全相同，固定内容不出现在用户消息中"""
+    agent = make_agent()
+    client, completions = make_client()
+    agent.set_hand(["3", "5"], 1)
+    client.get_card_recommendation(agent.build_game_state())
+    agent.record("A", 1, "heart 9")
+    agent.set_hand(["3", "5", "K"], 2, "heart 9", "农民")
+    # 调用方传入含固定内容的完整局面时同样去掉
+    client.get_card_recommendation(dict(agent.build_game_state(), 规则={"跟牌规则": "..."}))
+    first, second = [call["messages"] for call in completions.calls]
+    assert first[0]["content"] == second[0]["content"] == SYSTEM_MESSAGE
+    assert first[1]["content"] != second[1]["content"]
+    for key in STATIC_KEYS:
+        assert f'"{key}"' not in second[1]["content"]
+        assert f'"{key}"' in SYSTEM_MESSAGE
+
+
+def test_usage_hook():
+    """每次请求后记录提示词大小和缓存命中的token数"""
+    records = []
+    client, _ = make_client(records.append)
+    client.get_card_recommendation({"局面": {"我的手牌": {"牌": ["3"]}}})
+    assert records[0]["cached_tokens"] == 600 and records[0]["prompt_tokens"] == 800
+    assert records[0]["prefix_chars"] == len(SYSTEM_MESSAGE)
+    stats = client.get_usage_stats()
+    print(stats)
+    assert stats["requests"] == 1 and stats["cache_hit_rate"] == 0.75
@@ -0,0 +1,173 @@
+"""
+测试模型调用的容错：只重试限流/服务端错误/超时，连续失败后熔断，熔断期间用本地策略决策
+"""
+
+import time
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import qwen_client
+from qwen_client import QwenClient, QwenAPIError, is_retryable, backoff_delay
+from circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+from fakes import StatusError, completion, model_response, openai_stub
+from landlord_agent import SOURCE_ENGINE
+
+RESPONSE = model_response("2")
+
+
+class FakeCompletions:
+    """依次抛出errors中的异常，之后正常返回"""
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def _next(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return completion(RESPONSE)
+
+    def create(self, **kwargs):
+        return self._next()
+
+
+class FakeAsyncCompletions(FakeCompletions):
+    async def create(self, **kwargs):
+        return self._next()
+
+
+class FakeStream:
+    """依次产出chunks中的文本，之后抛出error（模拟输出中途断开）"""
+    def __init__(self, chunks, error=None):
+        self.chunks = chunks
+        self.error = error
+        self.closed = False
+
+    def __iter__(self):
+        for text in self.chunks:
+            delta = SimpleNamespace(content=text)
+            yield SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=delta)])
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        self.closed = True
+
+
+class StreamCompletions:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def create(self, **kwargs):
+        return self.stream
+
+
+def make_client(errors=(), max_retries=2, breaker=None):
+    client = QwenClient(api_key="test", max_retries=max_retries, breaker=breaker)
+    completions = FakeCompletions(errors)
+    client.client = openai_stub(completions)
+    return client, completions
+
+
+def test_retryable_errors():
+    """429/5xx/超时可重试，其余4xx不重试"""
+    assert is_retryable(StatusError(429))
+    assert is_retryable(StatusError(503))
+    assert is_retryable(TimeoutError())
+    assert not is_retryable(StatusError(400))
+    assert not is_retryable(ValueError("bad"))
+    for attempt in range(6):
+        assert 0 <= backoff_delay(attempt) <= qwen_client.BACKOFF_MAX
+
+
+def test_retry_then_success():
+    """服务端错误重试后成功，4xx直接失败"""
+    client, completions = make_client([StatusError(503), StatusError(429)])
+    assert client.chat([{"role": "user", "content": "x"}]) == RESPONSE
+    assert completions.calls == 3
+    stats = client.get_resilience_stats()
+    assert stats["retries"] == 2 and stats["failed_requests"] == 0
+    assert stats["breaker"]["state"] == CLOSED
+
+    client, completions = make_client([StatusError(400)])
+    with pytest.raises(QwenAPIError, match="Qwen API调用失败") as error:
+        client.chat([{"role": "user", "content": "x"}])
+    assert not error.value.retryable
+    assert completions.calls == 1
+    # 请求本身有误不计入熔断
+    assert client.get_resilience_stats()["breaker"]["consecutive_failures"] == 0
+
+
+def test_async_retry():
+    """异步调用同样重试"""
+    client, _ = make_client()
+    completions = FakeAsyncCompletions([TimeoutError()])
+    client.async_client = openai_stub(completions)
+    assert asyncio.run(client.chat_async([{"role": "user", "content": "x"}])) == RESPONSE
+    assert completions.calls == 2
+
+
+def test_circuit_breaker():
+    """连续失败达到阈值后熔断，冷却后放行一个试探请求"""
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    client, completions = make_client([StatusError(500)] * 2, max_retries=0, breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(QwenAPIError):
+            client.chat([{"role": "user", "content": "x"}])
+    assert breaker.state == OPEN
+    # 熔断期间直接拒绝
+    with pytest.raises(CircuitOpenError):
+        client.chat([{"role": "user", "content": "x"}])
+    assert completions.calls == 2
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+    assert client.chat([{"role": "user", "content": "x"}]) == RESPONSE
+    stats = breaker.stats()
+    assert stats["state"] == CLOSED and stats["opened"] == 1 and stats["rejected"] == 1
+
+
+def test_stream_outcome():
+    """流式调用读完或中途断开后才记入熔断器"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    client, _ = make_client(breaker=breaker)
+    stream = FakeStream(['{"recommended_move"', ': {}}'], error=StatusError(503))
+    client.client = openai_stub(StreamCompletions(stream))
+    chunks = client.chat_stream([{"role": "user", "content": "x"}])
+    assert next(chunks) == '{"recommended_move"'
+    with pytest.raises(QwenAPIError):
+        list(chunks)
+    assert stream.closed and breaker.state == OPEN
+    assert client.get_resilience_stats()["failed_requests"] == 1
+
+    # 冷却后的试探请求：调用方提前结束迭代也会释放试探名额
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+    client, _ = make_client(breaker=breaker)
+    breaker.record_failure()
+    time.sleep(0.02)
+    client.client = openai_stub(StreamCompletions(FakeStream(["a", "b"])))
+    chunks = client.chat_stream([{"role": "user", "content": "x"}])
+    assert next(chunks) == "a"
+    assert breaker.state == HALF_OPEN
+    chunks.close()
+    assert breaker.state == CLOSED
+
+
+def test_agent_fallback(make_agent):
+    """熔断期间不调用模型，直接返回本地策略的决策"""
+    agent = make_agent()
+    agent.decision_cache.bypass = True
+    agent.qwen.client.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    completions = FakeCompletions([StatusError(502)])
+    agent.qwen.client.client = openai_stub(completions)
+    agent.qwen.client.max_retries = 0
+    agent.set_hand(["3", "5", "9", "2"], 1, "heart K")
+    with pytest.raises(QwenAPIError):
+        agent.decide()
+    result = agent.decide()
+    assert result["decision_source"] == SOURCE_ENGINE
+    assert result["llm_status"] == "circuit_open"
+    assert asyncio.run(agent.decide_async())["llm_status"] == "circuit_open"
+    assert completions.calls == 1
+    assert agent.get_llm_stats()["breaker"]["state"] == OPEN
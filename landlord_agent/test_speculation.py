@@ -0,0 +1,115 @@
+"""
+测试推测执行：预测下一个局面、命中时直接返回、空闲容量与浪费统计
+"""
+
+import threading
+import time
+
+import pytest
+
+from fakes import model_response
+from speculation import SpeculativeExecutor, predict_states
+
+HAND = ["3", "5", "9", "J", "K", "A", "2"]
+
+
+class CountingClient:
+    """统计模型调用次数，可阻塞直到release"""
+    def __init__(self, block=False):
+        self.calls = 0
+        self.gate = threading.Event()
+        if not block:
+            self.gate.set()
+
+    def get_card_recommendation(self, state):
+        self.calls += 1
+        self.gate.wait(5)
+        return model_response(state["局面"]["我的手牌"]["牌"][-1])
+
+
+@pytest.fixture
+def agent_with(make_agent):
+    def factory(client):
+        agent = make_agent(client)
+        agent.decision_cache.bypass = True
+        return agent
+    return factory
+
+
+def current_state(agent, prev_card="heart 8", hand=HAND, last_player="A"):
+    agent.set_hand(hand, 1, prev_card, last_player=last_player)
+    return agent.build_game_state()
+
+
+def test_predict_states(agent_with):
+    """先预测首发局面，再预测对手用最小的牌压过自己出的牌"""
+    agent = agent_with(CountingClient())
+    state = current_state(agent)
+    decision = {"recommended_move": {"action": "play", "cards": ["9"], "type": "单张"}}
+    predicted = predict_states(state, decision, ["3", "5"], limit=3)
+    lasts = [p["局面"]["桌面待跟牌(last_play)"]["牌"] for p in predicted]
+    print(lasts)
+    assert lasts == [[], ["10"], ["J"]]
+    assert all(p["局面"]["我的手牌"]["牌"] == ["3", "5"] for p in predicted)
+    # 自己（B）出的9和下家（C）压牌的10计入剩余张数、未出现的牌和历史汇总
+    situation = state["局面"]
+    first, second = predicted[0]["局面"], predicted[1]["局面"]
+    assert first["对手剩余张数"] == situation["对手剩余张数"]
+    assert first["历史汇总"]["各座位已出张数"]["B"] == situation["历史汇总"]["各座位已出张数"]["B"] + 1
+    assert second["对手剩余张数"]["C"] == situation["对手剩余张数"]["C"] - 1
+    assert second["未出现的牌"]["10"] == situation["未出现的牌"]["10"] - 1
+    assert first["未出现的牌"] == situation["未出现的牌"]
+
+
+def test_hit(agent_with):
+    """预测的局面出现时直接返回推测的决策，不再调用模型"""
+    client = CountingClient()
+    agent = agent_with(client)
+    speculator = SpeculativeExecutor(agent, workers=2, predictions=2)
+    state = current_state(agent)
+    decision = {"recommended_move": {"action": "play", "cards": ["9"], "type": "单张"}}
+    next_hand = [rank for rank in HAND if rank != "9"]
+    assert speculator.speculate(state, decision, next_hand) == 2
+
+    # 只有牌局跟踪的部分也一致时才命中
+    assert speculator.lookup(current_state(agent, "diamond 10", next_hand, "C")) is None
+    agent.record("B", 1, "heart 9")
+    agent.record("C", 1, "diamond 10")
+    served = speculator.lookup(current_state(agent, "diamond 10", next_hand, "C"))
+    assert served is not None and served["speculative"]
+    calls = client.calls
+    assert speculator.lookup(current_state(agent, "heart Q", next_hand)) is None
+    assert client.calls == calls
+    stats = speculator.stats()
+    print(stats)
+    assert stats["hits"] == 1 and stats["misses"] == 2 and stats["wasted"] == 0 and stats["pending"] == 1
+    speculator.shutdown()
+
+
+def test_lookup_timeout(agent_with):
+    """推测未在timeout内完成时视为未命中，不阻塞到推测结束"""
+    client = CountingClient(block=True)
+    agent = agent_with(client)
+    speculator = SpeculativeExecutor(agent, workers=1, predictions=1)
+    state = current_state(agent)
+    assert speculator.speculate(state, {"recommended_move": {"action": "pass", "cards": []}}, HAND) == 1
+    started = time.monotonic()
+    assert speculator.lookup(current_state(agent, None), timeout=0.05) is None
+    assert time.monotonic() - started < 1
+    assert speculator.stats()["late"] == 1
+    client.gate.set()
+    speculator.shutdown()
+
+
+def test_idle_capacity(agent_with):
+    """推测线程都在忙时不再提交；过期未使用的推测计为浪费"""
+    client = CountingClient(block=True)
+    agent = agent_with(client)
+    speculator = SpeculativeExecutor(agent, workers=1, predictions=3, ttl=0.01)
+    state = current_state(agent)
+    assert speculator.speculate(state, {"recommended_move": {"action": "pass", "cards": []}}, HAND) == 1
+    assert speculator.stats()["skipped_busy"] == 2
+    client.gate.set()
+    speculator._executor.shutdown(wait=True)
+    time.sleep(0.05)
+    assert speculator.stats()["wasted"] == 1
@@ -0,0 +1,47 @@
+"""
+测试LRU + TTL缓存：过期条目不再返回，超出容量时淘汰最久未使用的条目
+"""
+
+import time
+
+from ttl_cache import TTLCache, make_cache_key
+
+
+def test_cache_key():
+    """相同内容（字典键顺序无关）得到相同的定长键"""
+    assert make_cache_key("a", {"x": 1, "y": 2}) == make_cache_key("a", {"y": 2, "x": 1})
+    assert make_cache_key("a", 1) != make_cache_key("b", 1)
+    assert len(make_cache_key("红桃K")) == 40
+
+
+def test_ttl_expiry():
+    """过期的条目视为不存在并计入expirations；put可单独指定ttl"""
+    cache = TTLCache(max_size=4, ttl=0.05)
+    cache.put("a", 1)
+    cache.put("b", 2, ttl=60)
+    assert cache.get("a") == 1 and "a" in cache
+    time.sleep(0.06)
+    assert "a" not in cache
+    assert cache.items() == [("b", 2)]
+    assert cache.get("a", "missing") == "missing"
+    assert cache.get("b") == 2
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1 and stats["expirations"] == 1
+    assert stats["size"] == 1
+
+
+def test_lru_eviction():
+    """超出容量时淘汰最久未使用的条目，get会刷新使用顺序"""
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert "b" not in cache and cache.get("a") == 1 and cache.get("c") == 3
+    # 覆盖已有的键不会淘汰其他条目
+    cache.put("a", 10)
+    assert len(cache) == 2 and cache.get("a") == 10
+    assert cache.stats()["evictions"] == 1
+    assert cache.pop("a") == 10 and cache.pop("a", "gone") == "gone"
+    cache.clear()
+    assert len(cache) == 0
@@ -78,7 +78,8 @@ class VoiceLandlordIntegrator:
                     hand=current_hand,
                     round=parsed_data['round'],
                     prev_card=prev_card,
-                    role=role
+                    role=role,
+                    last_player=parsed_data['player']
                 )
                 
                 # 获取AI决策
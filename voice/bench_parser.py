@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+语音解析吞吐量基准测试
+使用方法：python bench_parser.py [迭代次数]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from server import VoiceCardParser
+
+SENTENCES = [
+    "玩家A在第一轮出了一张红桃K",
+    "玩家B在第二轮出了一张黑桃A",
+    "玩家C在第三轮出了一张方片2",
+    "玩家A在第二轮出了一张黑桃10",
+    "玩家B在第四轮出了一张方片Q",
+    "玩家C在第五轮出了一张梅花J",
+    "player a 第3轮 红桃7",
+    "玩家乙在第十轮出了一张红心老K",
+]
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    parser = VoiceCardParser()
+
+    for sentence in SENTENCES:
+        result = parser.parse(sentence)
+        print(f"{sentence} -> {result['player']} / {result['round']} / {result['card']}")
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for sentence in SENTENCES:
+            parser.parse(sentence)
+    elapsed = time.perf_counter() - start
+
+    total = iterations * len(SENTENCES)
+    print(f"\n解析 {total} 条语音，耗时 {elapsed:.3f} 秒")
+    print(f"吞吐量: {total / elapsed:,.0f} 条/秒，平均 {elapsed / total * 1e6:.2f} 微秒/条")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+后台AI决策任务 - 提交后立即返回任务ID，决策在线程池中完成
+"""
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+JOB_PENDING = 'pending'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+
+class DecisionJobStore:
+    """决策任务存储：任务ID -> 任务状态，按ID直接哈希查找"""
+
+    def __init__(self, workers: int = 4, max_jobs: int = 1000):
+        self.workers = max(1, workers)
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='decision')
+
+    def submit(self, task: Callable[[], Any], context: Dict[str, Any] = None) -> str:
+        """提交决策任务，返回任务ID；task的返回值作为任务结果"""
+        job_id = self._add(JOB_PENDING, context)
+        self._executor.submit(self._run, job_id, task)
+        return job_id
+
+    def complete(self, result: Any, context: Dict[str, Any] = None) -> str:
+        """直接登记一个已完成的任务（如命中缓存的决策），返回任务ID"""
+        return self._add(JOB_DONE, context, result)
+
+    def _add(self, status: str, context: Dict[str, Any] = None, result: Any = None) -> str:
+        job_id = uuid.uuid4().hex
+        now = datetime.now().isoformat()
+        job = {
+            'job_id': job_id,
+            'status': status,
+            'created_at': now,
+            'finished_at': now if status != JOB_PENDING else None,
+            'context': context or {},
+            'result': result,
+            'error': None
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            # 超出容量时丢弃最早的任务
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        return job_id
+
+    def _run(self, job_id: str, task: Callable[[], Any]):
+        try:
+            result = task()
+            update = {'status': JOB_DONE, 'result': result}
+        except Exception as e:
+            print(f"决策任务 {job_id} 失败: {e}")
+            update = {'status': JOB_FAILED, 'error': str(e)}
+        update['finished_at'] = datetime.now().isoformat()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(update)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """按任务ID查找，返回任务状态的副本；不存在时返回None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {JOB_PENDING: 0, JOB_DONE: 0, JOB_FAILED: 0}
+            for job in self._jobs.values():
+                counts[job['status']] += 1
+        counts['total'] = sum(counts.values())
+        return counts
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
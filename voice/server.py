@@ -5,16 +5,31 @@ import json
 import os
 import re
 import sys
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from http.server import HTTPServer, SimpleHTTPRequestHandler
-from urllib.parse import urlparse
+from urllib.parse import parse_qs, unquote, urlparse
+
+from decision_jobs import DecisionJobStore
 
 # 添加landlord_agent目录到Python路径
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'landlord_agent'))
 
+from ttl_cache import TTLCache, make_cache_key
+from play_notation import (RANK_ORDER, RANK_INDEX, SINGLE, PAIR, TRIO, TRIO_SINGLE, TRIO_PAIR,
+                           STRAIGHT, PAIR_STRAIGHT, AIRPLANE, AIRPLANE_WINGS, FOUR_TWO, BOMB, ROCKET,
+                           COMBO_TYPES, format_play, key_rank)
+from card_table import (CARD_ID, CARD_WEIGHTS, RANK_WEIGHTS, JOKER_RANKS, LITTLE_JOKER, BIG_JOKER,
+                        ranks_to_card_ids)
+
 # 导入landlord_agent模块
 try:
     from landlord_agent import LandlordAgent
+    from speculation import SpeculativeExecutor
+    import client_registry
 except ImportError as e:
     print(f"警告：无法导入landlord_agent模块: {e}")
     LandlordAgent = None
@@ -22,6 +37,85 @@ except ImportError as e:
 # Qwen API密钥
 QWEN_API_KEY = os.getenv("QWEN_API_KEY") or ""
 
+# 请求处理线程数（可通过环境变量或命令行参数配置）
+SERVER_WORKERS = int(os.getenv("VOICE_SERVER_WORKERS") or "8")
+# 为健康检查、语音解析等轻量请求预留的线程数，其余线程可用于AI决策
+RESERVED_WORKERS = 2
+# 任务模式下后台执行AI决策的线程数
+DECISION_WORKERS = int(os.getenv("VOICE_DECISION_WORKERS") or "4")
+# 推测执行（提前计算下一个局面的决策）的线程数，0为关闭
+SPECULATION_WORKERS = int(os.getenv("VOICE_SPECULATION_WORKERS") or "1")
+# 解析/决策结果缓存的容量与过期时间（秒）
+RESULT_CACHE_SIZE = int(os.getenv("VOICE_CACHE_SIZE") or "512")
+RESULT_CACHE_TTL = float(os.getenv("VOICE_CACHE_TTL") or "600")
+
+# 归一化语音文本时去除的空白与标点
+UTTERANCE_STRIP_RE = re.compile(r'[\s，。！？、,.!?;；:：]+')
+
+
+def normalize_utterance(text: str) -> str:
+    """归一化语音文本：全角转半角、转小写、去除空白和标点"""
+    return UTTERANCE_STRIP_RE.sub('', unicodedata.normalize('NFKC', text).lower())
+
+
+CHINESE_DIGITS = '零一二三四五六七八九'
+
+
+def chinese_numeral(n: int) -> str:
+    """1-99的中文数字，如 10 -> 十, 12 -> 十二, 21 -> 二十一"""
+    tens, ones = divmod(n, 10)
+    if tens == 0:
+        return CHINESE_DIGITS[ones]
+    prefix = ('' if tens == 1 else CHINESE_DIGITS[tens]) + '十'
+    return prefix + (CHINESE_DIGITS[ones] if ones else '')
+
+
+class VocabularyTrie:
+    """多类别词表的前缀树：一次从左到右扫描，按最长匹配切分出所有词"""
+    
+    _END = ''
+    
+    def __init__(self):
+        self.root = {}
+    
+    def add(self, word: str, category: str, value):
+        node = self.root
+        for ch in word:
+            node = node.setdefault(ch, {})
+        # 同一个词可同时属于多个类别（如"a"既是玩家也是牌面），先加入的值优先
+        node.setdefault(self._END, {}).setdefault(category, value)
+    
+    def scan(self, text: str) -> list:
+        tokens = []
+        i = 0
+        n = len(text)
+        root = self.root
+        end_key = self._END
+        while i < n:
+            node = root.get(text[i])
+            if node is None:
+                # 不是任何词的首字，直接跳过
+                i += 1
+                continue
+            j = i + 1
+            match_values = node.get(end_key)
+            match_end = j if match_values is not None else -1
+            while j < n:
+                node = node.get(text[j])
+                if node is None:
+                    break
+                j += 1
+                values = node.get(end_key)
+                if values is not None:
+                    match_end = j
+                    match_values = values
+            if match_end > 0:
+                tokens.append((i, match_end, text[i:match_end], match_values))
+                i = match_end
+            else:
+                i += 1
+        return tokens
+
 
 class VoiceCardParser:
     """扑克牌语音解析器"""
@@ -75,116 +169,291 @@ class VoiceCardParser:
         '第十轮': 10, '第十局': 10, '第十把': 10, '十': 10,
     }
     
-    def parse_player(self, text: str):
-        text_lower = text.lower()
-        for pattern, player in self.PLAYER_MAP.items():
-            if pattern in text_lower:
-                return player
-        return None
-    
-    def parse_round(self, text: str):
-        text_lower = text.lower()
-        round_match = re.search(r'(?:第|)([一二三四五六七八九十\d]+)(?:轮|局|把)', text)
-        if round_match:
-            chinese_num = round_match.group(1)
-            num_map = {
-                '一': 1, '二': 2, '三': 3, '四': 4, '五': 5,
-                '六': 6, '七': 7, '八': 8, '九': 9, '十': 10
-            }
-            if chinese_num in num_map:
-                return num_map[chinese_num]
-            try:
-                return int(chinese_num)
-            except:
-                pass
-        
-        for pattern, round_num in sorted(self.ROUND_MAP.items(), key=lambda x: -len(x[0])):
-            if pattern in text_lower:
-                return round_num
-        return None
-    
-    def parse_suit(self, text: str):
-        text_lower = text.lower()
-        for pattern, suit in self.SUIT_MAP.items():
-            if pattern.lower() in text_lower:
-                return suit
-        return None
-    
-    RANK_WEIGHT_MAP = {
-        '2': 0.95,
-        'A': 0.90,
-        'K': 0.80,
-        'Q': 0.70,
-        'J': 0.60,
-        '10': 0.50,
-        '9': 0.45,
-        '8': 0.40,
-        '7': 0.35,
-        '6': 0.30,
-        '5': 0.25,
-        '4': 0.20,
-        '3': 0.15,
+    JOKER_MAP = {
+        '小王': LITTLE_JOKER, '小鬼': LITTLE_JOKER, 'little joker': LITTLE_JOKER,
+        '大王': BIG_JOKER, '大鬼': BIG_JOKER, 'big joker': BIG_JOKER,
     }
     
-    SPECIAL_WEIGHT_MAP = {
-        'big_joker': 1.0,
-        'little_joker': 0.98,
+    # 牌型语法中的关键字
+    COMBO_MAP = {
+        '王炸': 'rocket', '火箭': 'rocket', '双王': 'rocket', '对王': 'rocket',
+        '炸弹': 'bomb',
+        '四个': 'four', '四张': 'four',
+        '三个': 'trio', '三张': 'trio', '三条': 'trio',
+        '对': 'pair', '对子': 'pair', '一对': 'pair', '两个': 'pair', '两张': 'pair',
+        '两对': 'two_pairs',
+        '顺子': 'straight', '连对': 'pair_straight', '飞机': 'airplane',
+        '带': 'attach',
+        '到': 'range', '至': 'range', '-': 'range', '~': 'range',
+        '一个': 'one', '一张': 'one', '单张': 'one',
     }
     
-    def parse_rank(self, text: str):
-        text_lower = text.lower()
-        sorted_patterns = sorted(self.RANK_MAP.items(), key=lambda x: -len(x[0]))
-        for pattern, rank in sorted_patterns:
-            if pattern in text_lower:
-                return rank
-        return None
+    # 能开始一个牌型的关键字
+    COMBO_START = {'rocket', 'bomb', 'four', 'trio', 'pair', 'straight', 'pair_straight', 'airplane'}
     
     def calculate_weight(self, card: str, suit: str = None) -> float:
+        """牌的权重：单张直接按规范牌表的ID索引，组合牌型取关键点数的权重"""
         if not card:
             return 0.5
         
-        parts = card.split()
-        if len(parts) >= 2:
-            rank = parts[-1]
-            if rank in self.RANK_WEIGHT_MAP:
-                return self.RANK_WEIGHT_MAP[rank]
-            if rank in self.RANK_MAP:
-                mapped_rank = self.RANK_MAP[rank]
-                return self.RANK_WEIGHT_MAP.get(mapped_rank, 0.5)
-        
-        if card in self.SPECIAL_WEIGHT_MAP:
-            return self.SPECIAL_WEIGHT_MAP[card]
+        card_id = CARD_ID.get(card)
+        if card_id is not None:
+            return CARD_WEIGHTS[card_id]
         
+        parts = card.split()
+        if len(parts) >= 2 and parts[0] in COMBO_TYPES:
+            return RANK_WEIGHTS.get(key_rank(parts[1:]), 0.5)
+        if len(parts) >= 2 and parts[-1] in self.RANK_MAP:
+            return RANK_WEIGHTS.get(self.RANK_MAP[parts[-1]], 0.5)
         return 0.5
     
-    def parse(self, voice_text: str):
-        text_lower = voice_text.lower()
+    # 轮次表达（第X轮/X轮，X为阿拉伯数字或中文数字）支持的最大轮数
+    MAX_ROUND = 99
+    
+    _trie = None
+    
+    @classmethod
+    def _get_trie(cls) -> "VocabularyTrie":
+        """按类构建一次词表前缀树（玩家、花色、牌面、轮次）"""
+        if cls.__dict__.get('_trie') is None:
+            trie = VocabularyTrie()
+            for word, player in cls.PLAYER_MAP.items():
+                trie.add(word, 'player', player)
+            for word, suit in cls.SUIT_MAP.items():
+                trie.add(word.lower(), 'suit', suit)
+            for word, rank in cls.RANK_MAP.items():
+                trie.add(word, 'rank', rank)
+            for word, joker in cls.JOKER_MAP.items():
+                trie.add(word, 'joker', joker)
+            for word, kind in cls.COMBO_MAP.items():
+                trie.add(word, 'combo', kind)
+            for n in range(1, cls.MAX_ROUND + 1):
+                for numeral in (str(n), chinese_numeral(n)):
+                    for unit in ('轮', '局', '把'):
+                        trie.add(f"{numeral}{unit}", 'round', n)
+                        trie.add(f"第{numeral}{unit}", 'round', n)
+            # 没有明确轮次表达时，单个中文数字作为兜底；以数字开头的牌型关键字（如"一张"）
+            # 按最长匹配会整体切分出来，同样带上该数字的兜底轮次
+            for word, round_num in cls.ROUND_MAP.items():
+                if len(word) == 1:
+                    trie.add(word, 'round_fallback', round_num)
+                    for combo_word in cls.COMBO_MAP:
+                        if combo_word.startswith(word):
+                            trie.add(combo_word, 'round_fallback', round_num)
+            cls._trie = trie
+        return cls._trie
+    
+    def tokenize(self, text: str) -> list:
+        """一次从左到右扫描，返回所有识别到的词 (start, end, word, {类别: 值})"""
+        return self._get_trie().scan(text.lower())
+    
+    def extract_entities(self, tokens: list) -> dict:
+        """
+        一次遍历词序列，提取玩家、轮次、花色、牌面（取花色之后的第一个）、王，
+        以及第一个能开始牌型的关键字的位置（combo_start，供parse_combo使用）
+        """
+        player = round_num = suit = rank = joker = None
+        bare_player = fallback_round = first_rank = combo_start = None
+        combo_kinds = self.COMBO_START
+        for index, (_, _, word, values) in enumerate(tokens):
+            for category, value in values.items():
+                if category == 'rank':
+                    if first_rank is None:
+                        first_rank = value
+                    if suit is not None and rank is None:
+                        rank = value
+                elif category == 'player':
+                    # "玩家a"等完整表达优先于单独的字母
+                    if len(word) > 1:
+                        player = player or value
+                    elif bare_player is None:
+                        bare_player = value
+                elif category == 'combo':
+                    if combo_start is None and value in combo_kinds:
+                        combo_start = index
+                elif category == 'suit':
+                    suit = suit or value
+                elif category == 'round':
+                    round_num = round_num or value
+                elif category == 'round_fallback':
+                    fallback_round = fallback_round or value
+                elif category == 'joker':
+                    joker = joker or value
+        return {
+            'player': player or bare_player,
+            'round': round_num or fallback_round,
+            'suit': suit,
+            'rank': rank,
+            'joker': joker,
+            'first_rank': first_rank,
+            'combo_start': combo_start
+        }
+    
+    def parse_combo(self, tokens: list, start: int = None):
+        """
+        按牌型语法解析组合出牌，返回 (牌型, 点数列表)；没有牌型关键字时返回None，
+        有关键字但不构成合法牌型时抛出ValueError。start为牌型关键字的位置（extract_entities
+        的combo_start），未给出时从tokens中查找。支持的说法如：
+          对K / 三个8 / 三个8带一个5 / 三个8带一对5 / 顺子3到7 / 连对334455 /
+          飞机3到4带5和6 / 四个9带两对 ... / 炸弹8 / 四个8 / 王炸
+        """
+        if start is None:
+            start = self.extract_entities(tokens)['combo_start']
+        if start is None:
+            return None
+        kind = tokens[start][3]['combo']
+        if kind == 'rocket':
+            return ROCKET, ['小王', '大王']
+        
+        main, attachments = self._combo_operands(tokens, start)
+        if kind in ('straight', 'pair_straight', 'airplane'):
+            ranks = list(dict.fromkeys(main))
+        else:
+            ranks = main[:1] if main else []
+        if not ranks:
+            raise ValueError("牌型缺少点数，例如：对K、三个8带一对5、顺子3到7")
+        rank = ranks[0]
         
-        suit = self.parse_suit(voice_text)
+        if kind == 'bomb' or (kind == 'four' and not attachments):
+            if attachments:
+                raise ValueError("炸弹不能带牌，四带二请说：四个8带3和5")
+            return BOMB, [rank] * 4
+        if kind == 'four':
+            attached = [r for r, count in attachments for _ in range(count)]
+            if len(attached) not in (2, 4) or (len(attached) == 4 and any(c != 2 for _, c in attachments)):
+                raise ValueError("四带二需要带两张单牌或两对")
+            return FOUR_TWO, [rank] * 4 + attached
+        if kind == 'pair':
+            return PAIR, [rank] * 2
+        if kind == 'trio':
+            if not attachments:
+                return TRIO, [rank] * 3
+            if len(attachments) == 1 and attachments[0][1] == 1:
+                return TRIO_SINGLE, [rank] * 3 + [attachments[0][0]]
+            if len(attachments) == 1 and attachments[0][1] == 2:
+                return TRIO_PAIR, [rank] * 3 + [attachments[0][0]] * 2
+            raise ValueError("三带只能带一张单牌或一对")
         
-        card_text = voice_text
-        if suit:
-            suit_chinese = None
-            for pattern, s in self.SUIT_MAP.items():
-                if s == suit and pattern.lower() in text_lower:
-                    suit_chinese = pattern
+        # 顺子、连对、飞机：点数必须连续且不含2和王
+        indices = sorted(RANK_INDEX[r] for r in ranks)
+        if indices[-1] > RANK_INDEX['A'] or indices != list(range(indices[0], indices[0] + len(indices))):
+            raise ValueError("顺子、连对、飞机的点数必须连续，且不能包含2和王")
+        ranks = [RANK_ORDER[i] for i in indices]
+        if kind == 'straight':
+            if len(ranks) < 5:
+                raise ValueError("顺子至少需要5张连续的牌")
+            return STRAIGHT, ranks
+        if kind == 'pair_straight':
+            if len(ranks) < 3:
+                raise ValueError("连对至少需要3对连续的牌")
+            return PAIR_STRAIGHT, [r for r in ranks for _ in range(2)]
+        if len(ranks) < 2:
+            raise ValueError("飞机至少需要2组连续的三张")
+        body = [r for r in ranks for _ in range(3)]
+        if not attachments:
+            return AIRPLANE, body
+        counts = {count for _, count in attachments}
+        wings = [r for r, count in attachments for _ in range(count)]
+        if len(counts) != 1 or len(attachments) != len(ranks):
+            raise ValueError("飞机带翅膀需要带与三张组数相同的单牌或对子")
+        return AIRPLANE_WINGS, body + wings
+    
+    def _combo_operands(self, tokens: list, start: int):
+        """
+        收集牌型关键字之后的点数：返回 (主体点数列表, [(带牌点数, 张数), ...])
+        关键字之后没有点数时（如"3到7的顺子"），使用关键字之前紧邻的点数
+        """
+        main = []
+        attachments = []
+        in_attach = False
+        pending_range = False
+        attach_count = 1
+        for _, _, _, values in tokens[start + 1:]:
+            combo = values.get('combo')
+            rank = values.get('rank')
+            if combo == 'attach':
+                in_attach = True
+            elif combo == 'range':
+                pending_range = True
+            elif in_attach and combo in ('pair', 'two_pairs', 'one'):
+                attach_count = 1 if combo == 'one' else 2
+            elif rank is not None:
+                if in_attach:
+                    attachments.append((rank, attach_count))
+                elif pending_range and main:
+                    low, high = RANK_INDEX[main[-1]], RANK_INDEX[rank]
+                    main.extend(RANK_ORDER[i] for i in range(low + 1, high + 1))
+                    pending_range = False
+                else:
+                    main.append(rank)
+        
+        if not main and not attachments:
+            # 尾置关键字："3到7的顺子"
+            for _, _, _, values in reversed(tokens[:start]):
+                if values.get('combo') == 'range':
+                    main.insert(0, '到')
+                elif values.get('rank') is not None and 'round' not in values:
+                    main.insert(0, values['rank'])
+                else:
                     break
-            
-            suit_match = re.search(rf'[{suit_chinese}](\w+)', voice_text) if suit_chinese else None
-            if suit_match:
-                card_text = suit_match.group(0)
-            else:
-                for pattern in ['红桃', '黑桃', '梅花', '方片']:
-                    if pattern in voice_text:
-                        idx = voice_text.find(pattern)
-                        card_text = voice_text[idx:idx+10]
-                        break
+            expanded = []
+            for i, rank in enumerate(main):
+                if rank == '到' and expanded and i + 1 < len(main):
+                    low, high = RANK_INDEX[expanded[-1]], RANK_INDEX[main[i + 1]]
+                    expanded.extend(RANK_ORDER[j] for j in range(low + 1, high))
+                elif rank != '到':
+                    expanded.append(rank)
+            main = expanded
+        return main, attachments
+    
+    def parse_player(self, text: str):
+        return self.extract_entities(self.tokenize(text))['player']
+    
+    def parse_round(self, text: str):
+        return self.extract_entities(self.tokenize(text))['round']
+    
+    def parse_suit(self, text: str):
+        return self.extract_entities(self.tokenize(text))['suit']
+    
+    def parse_rank(self, text: str):
+        return self.extract_entities(self.tokenize(text))['first_rank']
+    
+    def parse(self, voice_text: str):
+        tokens = self.tokenize(voice_text)
+        entities = self.extract_entities(tokens)
+        player = entities['player']
+        round_num = entities['round']
+        suit = entities['suit']
+        rank = entities['rank']
+        error = "无法解析语音内容，请检查是否包含：玩家、轮次、花色、牌面"
         
-        rank = self.parse_rank(card_text)
-        player = self.parse_player(voice_text)
-        round_num = self.parse_round(voice_text)
+        combo = None
+        if entities['combo_start'] is not None:
+            try:
+                combo = self.parse_combo(tokens, entities['combo_start'])
+            except ValueError as e:
+                error = f"无法解析牌型：{e}"
         
-        card = f"{suit} {rank}" if suit and rank else None
+        if combo:
+            combo_type, cards = combo
+            card = format_play(combo_type, cards)
+        elif suit and rank:
+            combo_type, cards = SINGLE, [rank]
+            card = f"{suit} {rank}"
+        elif entities['joker']:
+            combo_type, cards = SINGLE, [JOKER_RANKS[entities['joker']]]
+            card = entities['joker']
+        else:
+            combo_type, cards, card = None, None, None
+        
+        # 映射到规范牌表（组合牌型按点数取规范花色）
+        card_ids = None
+        if card:
+            try:
+                card_ids = [CARD_ID[card]] if card in CARD_ID else ranks_to_card_ids(cards)
+            except ValueError as e:
+                card = None
+                error = f"无法解析牌型：{e}"
         
         if player and round_num and card:
             weighting = self.calculate_weight(card, suit)
@@ -192,6 +461,9 @@ class VoiceCardParser:
                 "player": player,
                 "round": round_num,
                 "card": card,
+                "cards": cards,
+                "card_ids": card_ids,
+                "type": combo_type,
                 "weighting": weighting,
                 "original_text": voice_text,
                 "timestamp": datetime.now().isoformat()
@@ -200,27 +472,43 @@ class VoiceCardParser:
             "player": None,
             "round": None,
             "card": None,
+            "cards": None,
+            "card_ids": None,
+            "type": None,
             "weighting": None,
             "original_text": voice_text,
-            "error": "无法解析语音内容，请检查是否包含：玩家、轮次、花色、牌面",
+            "error": error,
             "timestamp": datetime.now().isoformat()
         }
 
 
 class VoiceAIHandler(SimpleHTTPRequestHandler):
     
-    API_CACHE = {}
+    # 识别与决策共用的结果缓存，键由归一化语音文本和相关局面哈希得到
+    result_cache = TTLCache(max_size=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+    # 已记录的语音命令：记录后局面对应的命令键 -> 记录前局面对应的命令键（即结果缓存的键）
+    recorded_commands = TTLCache(max_size=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+    # 同时进行的AI决策数上限，由run_server根据线程数设置
+    decision_slots = threading.BoundedSemaphore(max(1, SERVER_WORKERS - RESERVED_WORKERS))
     parser = VoiceCardParser()
+    # 服务器侧默认的玩家角色
+    default_role = "农民"
+    # 任务模式的后台决策线程池，由run_server根据配置重建
+    job_store = DecisionJobStore(workers=DECISION_WORKERS)
     
     # 初始化landlord agent
     if LandlordAgent:
         try:
-            landlord_agent = LandlordAgent(api_key=QWEN_API_KEY)
+            landlord_agent = LandlordAgent(api_key=QWEN_API_KEY,
+                                           llm_client=client_registry.get_llm_client(QWEN_API_KEY))
         except Exception as e:
             print(f"警告：无法初始化LandlordAgent: {e}")
             landlord_agent = None
     else:
         landlord_agent = None
+    # 推测执行：每次决策后在空闲容量上提前计算下一个最可能局面的决策
+    speculator = SpeculativeExecutor(landlord_agent, workers=SPECULATION_WORKERS) \
+        if landlord_agent and SPECULATION_WORKERS > 0 else None
     
     def log_message(self, format, *args):
         print(f"[{datetime.now().strftime('%H:%M:%S')}] {args[0]}")
@@ -236,6 +524,18 @@ class VoiceAIHandler(SimpleHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(response.encode('utf-8'))
     
+    def send_sse_headers(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+    
+    def send_sse_event(self, event: str, data):
+        payload = json.dumps(data, ensure_ascii=False)
+        self.wfile.write(f"event: {event}\ndata: {payload}\n\n".encode('utf-8'))
+        self.wfile.flush()
+    
     def do_OPTIONS(self):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
@@ -255,12 +555,19 @@ class VoiceAIHandler(SimpleHTTPRequestHandler):
                 'status': 'ok',
                 'service': 'VoiceAI Recognition',
                 'version': '1.0.0',
-                'timestamp': datetime.now().isoformat()
+                'timestamp': datetime.now().isoformat(),
+                'cache': self.result_cache.stats(),
+                'validation': self.landlord_agent.get_validation_stats() if self.landlord_agent else None,
+                'prompt': self.landlord_agent.get_prompt_stats() if self.landlord_agent else None,
+                'decision_cache': self.landlord_agent.get_decision_cache_stats() if self.landlord_agent else None,
+                'llm': self.landlord_agent.get_llm_stats() if self.landlord_agent else None,
+                'llm_clients': client_registry.stats() if self.landlord_agent else None,
+                'speculation': self.speculator.stats() if self.speculator else None
             })
         
         elif path == '/api/history':
             history = []
-            for key, value in self.API_CACHE.items():
+            for key, value in self.result_cache.items():
                 history.append({
                     'id': key,
                     'original_text': value.get('original_text', '')[:100],
@@ -274,12 +581,20 @@ class VoiceAIHandler(SimpleHTTPRequestHandler):
                 'results': history[:20][::-1]
             })
         
+        elif path == '/api/process_voice_command/stream':
+            self._stream_voice_command()
+        
         elif path.startswith('/api/result/'):
-            result_id = path.split('/api/result/')[1]
-            for key, value in self.API_CACHE.items():
-                if result_id in key:
-                    self.send_json_response(value)
-                    return
+            result_id = unquote(path.split('/api/result/')[1])
+            # 决策任务与缓存结果均按ID直接查找
+            job = self.job_store.get(result_id)
+            if job is not None:
+                self.send_json_response(job)
+                return
+            cached = self.result_cache.get(result_id)
+            if cached is not None:
+                self.send_json_response(cached)
+                return
             self.send_json_response({'error': '结果未找到'}, 404)
         
         else:
@@ -304,20 +619,7 @@ class VoiceAIHandler(SimpleHTTPRequestHandler):
                     }, 400)
                     return
                 
-                cache_key = f"{audio_text[:50]}-{timestamp}"
-                if cache_key in self.API_CACHE:
-                    print(f"返回缓存结果")
-                    self.send_json_response(self.API_CACHE[cache_key])
-                    return
-                
-                print(f"解析语音输入: {audio_text}")
-                result = self.parser.parse(audio_text)
-                self.API_CACHE[cache_key] = result
-                
-                if len(self.API_CACHE) > 100:
-                    first_key = next(iter(self.API_CACHE))
-                    del self.API_CACHE[first_key]
-                
+                result = self._parse_cached(audio_text)
                 self.send_json_response(result)
                 
             except json.JSONDecodeError:
@@ -329,11 +631,16 @@ class VoiceAIHandler(SimpleHTTPRequestHandler):
         elif path == '/api/process_voice_command':
             content_length = int(self.headers.get('Content-Length', 0))
             body = self.rfile.read(content_length).decode('utf-8')
+            query = parse_qs(urlparse(self.path).query)
             
             try:
                 data = json.loads(body)
                 audio_text = data.get('audio_text', '')
                 timestamp = data.get('timestamp', datetime.now().isoformat())
+                # 任务模式：解析并记录后立即返回任务ID，决策在后台完成
+                job_mode = data.get('mode', query.get('mode', [''])[0]) == 'job'
+                # 决策截止时间（毫秒）：超时返回本地策略的决策
+                deadline_ms = self._deadline_ms(data, query)
                 
                 if not audio_text:
                     self.send_json_response({
@@ -342,19 +649,27 @@ class VoiceAIHandler(SimpleHTTPRequestHandler):
                     }, 400)
                     return
                 
-                cache_key = f"command-{audio_text[:50]}-{timestamp}"
-                if cache_key in self.API_CACHE:
+                # 相同语音在相同局面下（客户端重试或重复播报）直接返回已有结果，跳过解析、记录和模型调用
+                cache_key, recorded = self._command_cache_key(audio_text, self._request_key(data))
+                cached = self.result_cache.get(cache_key)
+                if cached is not None:
                     print(f"返回缓存结果")
-                    self.send_json_response(self.API_CACHE[cache_key])
+                    if job_mode and cached.get('status') == 'success':
+                        # 任务模式命中缓存时返回已完成的任务，响应格式与提交新任务一致
+                        job_id = self.job_store.complete(cached, context={'voice_text': audio_text})
+                        self._send_job_accepted(job_id, 'done', cached)
+                    else:
+                        self.send_json_response(cached)
                     return
                 
                 print(f"处理语音命令: {audio_text}")
                 
-                # 解析语音输入
-                parsed_data = self.parser.parse(audio_text)
+                # 解析语音输入（与/api/recognize共用缓存）
+                parsed_data = self._parse_cached(audio_text)
                 
                 # 构建处理结果
                 process_result = {
+                    'result_id': cache_key,
                     'timestamp': timestamp,
                     'voice_text': audio_text,
                     'parsed_data': parsed_data,
@@ -362,49 +677,51 @@ class VoiceAIHandler(SimpleHTTPRequestHandler):
                     'status': 'parse_success' if parsed_data.get('player') and parsed_data.get('round') and parsed_data.get('card') else 'parse_error'
                 }
                 
-                # 如果解析成功，记录到数据库并获取AI决策
+                # 解析成功时记录出牌并取得局面快照（已记录过的重试不再重复记录）
+                game_state = None
                 if process_result['status'] == 'parse_success' and self.landlord_agent:
+                    game_state = self._record_and_snapshot(parsed_data, cache_key, audio_text,
+                                                           self._request_key(data), record=not recorded)
+                
+                # 如果解析成功，获取AI决策
+                if process_result['status'] == 'parse_success' and self.landlord_agent and job_mode:
+                    job_id = self._submit_decision_job(cache_key, process_result, game_state, deadline_ms)
+                    self._send_job_accepted(job_id, 'pending', process_result)
+                    return
+                elif process_result['status'] == 'parse_success' and self.landlord_agent:
+                    if not self.decision_slots.acquire(blocking=False):
+                        # 决策线程已满，直接返回而不是占用轻量请求的线程
+                        self.send_json_response({
+                            'error': '服务繁忙',
+                            'message': '当前AI决策请求过多，请稍后重试'
+                        }, 503)
+                        return
                     try:
-                        # 记录到数据库
-                        self.landlord_agent.record(
-                            player=parsed_data['player'],
-                            round=parsed_data['round'],
-                            card=parsed_data['card'],
-                            weighting=parsed_data['weighting']
-                        )
-                        
-                        # 获取AI决策
-                        # 设置当前游戏状态（示例）
-                        current_hand = self._get_current_hand(parsed_data['round'])
-                        prev_card = parsed_data['card']  # 假设上一手是当前解析的牌
-                        role = "农民"  # 默认角色
-                        
-                        self.landlord_agent.set_hand(
-                            hand=current_hand,
-                            round=parsed_data['round'],
-                            prev_card=prev_card,
-                            role=role
-                        )
-                        
-                        # 获取AI决策
-                        ai_decision = self.landlord_agent.decide()
-                        process_result['ai_decision'] = ai_decision
+                        # 获取AI决策（模型调用不持有agent锁，多个决策可并发进行）
+                        if data.get('early'):
+                            # 提前返回：recommended_move闭合即响应，推理过程在后台补全到缓存
+                            early = self.landlord_agent.decide_early(game_state)
+                            process_result['ai_decision'] = {'recommended_move': early.move}
+                            process_result['reasoning_pending'] = True
+                            early.add_done_callback(self._cache_full_decision(cache_key, process_result))
+                        else:
+                            process_result['ai_decision'] = self._decide(game_state, deadline_ms)
                         process_result['status'] = 'success'
+                        self._speculate(game_state, process_result['ai_decision'], parsed_data['round'])
                         
                     except Exception as e:
                         print(f"AI决策错误: {e}")
                         process_result['status'] = 'ai_error'
                         process_result['error'] = f'AI决策生成失败: {str(e)}'
+                    finally:
+                        self.decision_slots.release()
                 elif not self.landlord_agent:
                     process_result['status'] = 'no_agent'
                     process_result['error'] = 'landlord_agent模块未初始化'
                 
-                # 缓存结果
-                self.API_CACHE[cache_key] = process_result
-                
-                if len(self.API_CACHE) > 100:
-                    first_key = next(iter(self.API_CACHE))
-                    del self.API_CACHE[first_key]
+                # 缓存结果（AI决策失败或退回本地策略的结果不缓存，下次重新尝试）
+                if process_result['status'] != 'ai_error' and not self._is_fallback(process_result):
+                    self.result_cache.put(cache_key, process_result)
                 
                 self.send_json_response(process_result)
                 
@@ -417,6 +734,228 @@ class VoiceAIHandler(SimpleHTTPRequestHandler):
         else:
             self.send_json_response({'error': '接口不存在'}, 404)
     
+    def _send_job_accepted(self, job_id: str, status: str, process_result: dict):
+        """任务模式的202响应：任务ID与查询结果的地址"""
+        self.send_json_response({
+            'status': status,
+            'job_id': job_id,
+            'result_url': f'/api/result/{job_id}',
+            'timestamp': process_result['timestamp'],
+            'voice_text': process_result['voice_text'],
+            'parsed_data': process_result['parsed_data']
+        }, 202)
+    
+    @staticmethod
+    def _deadline_ms(data: dict, query: dict):
+        """请求体或查询参数中的deadline_ms，未提供或无效时返回None"""
+        value = data.get('deadline_ms', query.get('deadline_ms', [None])[0])
+        try:
+            return float(value) if value is not None else None
+        except (TypeError, ValueError):
+            return None
+    
+    @staticmethod
+    def _is_fallback(result: dict) -> bool:
+        """决策是否因模型超时、失败、熔断或输出不合法而退回本地策略"""
+        decision = result.get('ai_decision')
+        return isinstance(decision, dict) and decision.get('llm_status', 'ok') != 'ok'
+    
+    def _parse_cached(self, audio_text: str) -> dict:
+        """解析语音文本，相同（归一化后）文本直接返回缓存的解析结果"""
+        cache_key = make_cache_key('recognize', normalize_utterance(audio_text))
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            print(f"返回缓存结果")
+            return cached
+        
+        print(f"解析语音输入: {audio_text}")
+        result = self.parser.parse(audio_text)
+        result['result_id'] = cache_key
+        self.result_cache.put(cache_key, result)
+        return result
+    
+    @staticmethod
+    def _request_key(data: dict):
+        """客户端给出的幂等键：request_id，未提供时使用客户端的timestamp"""
+        return data.get('request_id') or data.get('timestamp')
+    
+    def _command_cache_key(self, audio_text: str, request_key: str = None):
+        """
+        语音命令的缓存键：归一化文本 + 幂等键 + 记录这手牌之前的牌局进度。
+        返回 (缓存键, 是否已记录)；命令已记录过时（当前进度正是记录它之后的进度）返回记录时使用的键
+        """
+        position = self.landlord_agent.position_key() if self.landlord_agent else None
+        key = make_cache_key('command', normalize_utterance(audio_text), request_key, position)
+        recorded_key = self.recorded_commands.get(key)
+        return (key, False) if recorded_key is None else (recorded_key, True)
+    
+    def _stream_voice_command(self):
+        """
+        以SSE流式返回AI决策：parsed -> token... -> move -> decision -> done
+        move事件在recommended_move完整输出后立即发送，无需等待推理过程
+        """
+        query = parse_qs(urlparse(self.path).query)
+        audio_text = query.get('audio_text', [''])[0]
+        timestamp = query.get('timestamp', [datetime.now().isoformat()])[0]
+        request_key = query.get('request_id', query.get('timestamp', [None]))[0]
+        
+        if not audio_text:
+            self.send_json_response({
+                'error': '缺少音频文本内容',
+                'message': '请提供 audio_text 参数'
+            }, 400)
+            return
+        
+        cache_key, recorded = self._command_cache_key(audio_text, request_key)
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            self.send_sse_headers()
+            self.send_sse_event('parsed', cached['parsed_data'])
+            decision = cached.get('ai_decision')
+            if isinstance(decision, dict) and decision.get('recommended_move'):
+                self.send_sse_event('move', decision['recommended_move'])
+            self.send_sse_event('decision', decision)
+            self.send_sse_event('done', {'status': cached['status'], 'result_id': cache_key, 'cached': True})
+            return
+        
+        print(f"流式处理语音命令: {audio_text}")
+        parsed_data = self._parse_cached(audio_text)
+        if not (parsed_data.get('player') and parsed_data.get('round') and parsed_data.get('card')):
+            self.send_json_response({
+                'status': 'parse_error',
+                'parsed_data': parsed_data,
+                'error': parsed_data.get('error', '语音解析失败')
+            }, 400)
+            return
+        if not self.landlord_agent:
+            self.send_json_response({'status': 'no_agent', 'error': 'landlord_agent模块未初始化'}, 503)
+            return
+        
+        try:
+            game_state = self._record_and_snapshot(parsed_data, cache_key, audio_text, request_key,
+                                                   record=not recorded)
+        except Exception as e:
+            # SSE响应头尚未发送，与POST接口一样返回JSON错误
+            print(f"Error: {e}")
+            self.send_json_response({'error': '服务器错误', 'message': str(e)}, 500)
+            return
+        
+        if not self.decision_slots.acquire(blocking=False):
+            self.send_json_response({
+                'error': '服务繁忙',
+                'message': '当前AI决策请求过多，请稍后重试'
+            }, 503)
+            return
+        try:
+            self.send_sse_headers()
+            self.send_sse_event('parsed', parsed_data)
+            try:
+                for event, data in self.landlord_agent.decide_stream(game_state):
+                    if event == 'token':
+                        self.send_sse_event('token', {'text': data})
+                    else:
+                        self.send_sse_event(event, data)
+                    if event == 'decision':
+                        result = {
+                            'result_id': cache_key,
+                            'timestamp': timestamp,
+                            'voice_text': audio_text,
+                            'parsed_data': parsed_data,
+                            'ai_decision': data,
+                            'status': 'success'
+                        }
+                        if not self._is_fallback(result):
+                            self.result_cache.put(cache_key, result)
+                self.send_sse_event('done', {'status': 'success', 'result_id': cache_key})
+            except (BrokenPipeError, ConnectionResetError):
+                print("客户端已断开流式连接")
+            except Exception as e:
+                print(f"AI决策错误: {e}")
+                self.send_sse_event('error', {'status': 'ai_error', 'error': f'AI决策生成失败: {str(e)}'})
+        finally:
+            self.decision_slots.release()
+    
+    def _cache_full_decision(self, cache_key: str, process_result: dict):
+        """返回回调：后台拿到完整决策后替换缓存中的提前结果"""
+        def on_done(future):
+            if future.exception() is not None:
+                print(f"AI推理补全失败: {future.exception()}")
+                return
+            result = dict(process_result)
+            result['ai_decision'] = future.result()
+            result.pop('reasoning_pending', None)
+            self.result_cache.put(cache_key, result)
+        return on_done
+    
+    def _decide(self, game_state: dict, deadline_ms: float = None):
+        """
+        已推测过的局面直接返回推测的决策，否则正常决策。
+        指定deadline_ms时等待推测的时间计入截止时间，剩余时间留给正常决策
+        """
+        started = time.monotonic()
+        if self.speculator is not None:
+            timeout = deadline_ms / 1000.0 if deadline_ms is not None else None
+            decision = self.speculator.lookup(game_state, timeout=timeout)
+            if decision is not None:
+                return decision
+        if deadline_ms is not None:
+            deadline_ms = max(0.0, deadline_ms - (time.monotonic() - started) * 1000.0)
+        return self.landlord_agent.decide(game_state, deadline_ms=deadline_ms)
+    
+    def _speculate(self, game_state: dict, decision, round_num: int):
+        """为下一次轮到自己时最可能出现的局面提交推测决策"""
+        if self.speculator is not None and isinstance(decision, dict):
+            self.speculator.speculate(game_state, decision, self._get_current_hand(round_num))
+    
+    def _submit_decision_job(self, cache_key: str, process_result: dict, game_state: dict,
+                             deadline_ms: float = None) -> str:
+        """将AI决策提交到后台线程池，完成后结果写入任务存储和缓存"""
+        def run_decision():
+            result = dict(process_result)
+            result['ai_decision'] = self._decide(game_state, deadline_ms)
+            result['status'] = 'success'
+            self._speculate(game_state, result['ai_decision'], process_result['parsed_data']['round'])
+            if not self._is_fallback(result):
+                self.result_cache.put(cache_key, result)
+            return result
+        
+        return self.job_store.submit(run_decision, context={'voice_text': process_result['voice_text']})
+    
+    def _record_and_snapshot(self, parsed_data: dict, cache_key: str, audio_text: str,
+                             request_key: str = None, record: bool = True) -> dict:
+        """
+        记录出牌并设置当前局面，返回决策所用的局面快照。
+        记录后登记记录后进度对应的命令键，同一命令重试时查到cache_key而不会再次记录
+        """
+        # 共享agent：记录、设置手牌与构建快照需作为一个整体在锁内完成
+        with self.landlord_agent.lock:
+            if record:
+                # 记录到数据库
+                self.landlord_agent.record(
+                    player=parsed_data['player'],
+                    round=parsed_data['round'],
+                    card=parsed_data['card'],
+                    weighting=parsed_data['weighting']
+                )
+                position = self.landlord_agent.position_key()
+                self.recorded_commands.put(
+                    make_cache_key('command', normalize_utterance(audio_text), request_key, position),
+                    cache_key)
+            
+            # 设置当前游戏状态（示例）
+            current_hand = self._get_current_hand(parsed_data['round'])
+            prev_card = parsed_data['card']  # 假设上一手是当前解析的牌
+            role = self.default_role  # 默认角色
+            
+            self.landlord_agent.set_hand(
+                hand=current_hand,
+                round=parsed_data['round'],
+                prev_card=prev_card,
+                role=role,
+                last_player=parsed_data['player']
+            )
+            return self.landlord_agent.build_game_state()
+    
     def _get_current_hand(self, round_num: int) -> list:
         """获取当前手牌（示例实现）"""
         # 实际应用中，应该从数据库或其他来源获取当前手牌
@@ -424,9 +963,42 @@ class VoiceAIHandler(SimpleHTTPRequestHandler):
         return ["3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K", "A", "2"]
 
 
-def run_server(port=3000):
+class ThreadPoolHTTPServer(HTTPServer):
+    """使用固定大小线程池并发处理请求的HTTP服务器"""
+    
+    def __init__(self, server_address, handler_class, workers: int = SERVER_WORKERS):
+        super().__init__(server_address, handler_class)
+        self.workers = max(1, workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='voiceai')
+    
+    def process_request(self, request, client_address):
+        self._executor.submit(self._process_request_worker, request, client_address)
+    
+    def _process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+    
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=False)
+
+
+def run_server(port=3000, workers=SERVER_WORKERS, decision_workers=DECISION_WORKERS):
     """启动服务器"""
-    server = HTTPServer(('0.0.0.0', port), VoiceAIHandler)
+    workers = max(1, workers)
+    # 预留线程给轻量请求，保证AI决策进行中健康检查和解析仍能立即响应
+    VoiceAIHandler.decision_slots = threading.BoundedSemaphore(max(1, workers - RESERVED_WORKERS))
+    if decision_workers != VoiceAIHandler.job_store.workers:
+        VoiceAIHandler.job_store.shutdown()
+        VoiceAIHandler.job_store = DecisionJobStore(workers=decision_workers)
+    server = ThreadPoolHTTPServer(('0.0.0.0', port), VoiceAIHandler, workers=workers)
+    if VoiceAIHandler.landlord_agent:
+        # 后台建立到模型服务的TLS连接，第一次决策不必等待建连
+        client_registry.prewarm_registered()
     
     print(f"""
 ╔══════════════════════════════════════════════════════════╗
@@ -434,12 +1006,14 @@ def run_server(port=3000):
 ║   🎤 VoiceAI 智能扑克牌识别服务                           ║
 ║                                                          ║
 ║   Server running on: http://localhost:{port}               ║
+║   Worker threads: {workers}                                      ║
 ║                                                          ║
 ║   API Endpoints:                                         ║
 ║   • POST /api/recognize            - 扑克牌识别接口       ║
 ║   • POST /api/process_voice_command - 处理语音命令并获取AI决策 ║
+║   • GET  /api/process_voice_command/stream - 流式(SSE)AI决策 ║
 ║   • GET  /api/health               - 健康检查             ║
-║   • GET  /api/result/:id           - 获取特定结果         ║
+║   • GET  /api/result/:id           - 获取特定结果/决策任务状态 ║
 ║   • GET  /api/history              - 获取历史记录         ║
 ║                                                          ║
 ║   支持格式: 玩家A在第一轮出了一张红桃K                    ║
@@ -457,4 +1031,5 @@ def run_server(port=3000):
 if __name__ == '__main__':
     import sys
     port = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
-    run_server(port)
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else SERVER_WORKERS
+    run_server(port, workers)
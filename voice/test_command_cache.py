@@ -0,0 +1,99 @@
+"""
+测试语音命令的结果缓存：重复的命令只记录一次、只调用一次模型，退回本地策略的决策不缓存
+"""
+
+import json
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import pytest
+
+from server import VoiceAIHandler, ThreadPoolHTTPServer
+from ttl_cache import TTLCache
+from landlord_agent import LandlordAgent
+from fakes import FakeClient
+
+COMMAND = "玩家B在第一轮出了一张红桃K"
+
+
+@pytest.fixture
+def voice_server(tmp_path, monkeypatch):
+    """使用临时数据库和模拟模型客户端的语音服务，返回 (地址, agent, 模型客户端)"""
+    monkeypatch.setenv("DECISION_CACHE_BYPASS", "1")
+    agent = LandlordAgent(api_key="test", db_path=str(tmp_path / "cards.db"))
+    client = FakeClient()
+    agent.qwen = client
+    monkeypatch.setattr(VoiceAIHandler, "landlord_agent", agent)
+    monkeypatch.setattr(VoiceAIHandler, "speculator", None)
+    monkeypatch.setattr(VoiceAIHandler, "result_cache", TTLCache())
+    monkeypatch.setattr(VoiceAIHandler, "recorded_commands", TTLCache())
+    monkeypatch.setattr(VoiceAIHandler, "log_message", lambda *args: None)
+    httpd = ThreadPoolHTTPServer(("127.0.0.1", 0), VoiceAIHandler, workers=4)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", agent, client
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def post_command(url: str, **body) -> dict:
+    request = urllib.request.Request(url + "/api/process_voice_command",
+                                     data=json.dumps(body).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+def test_repeated_command(voice_server):
+    """同一命令（相同timestamp的重试，或不带timestamp的重复）只记录一次、只调用一次模型"""
+    url, agent, client = voice_server
+    first = post_command(url, audio_text=COMMAND, timestamp="2025-12-27T17:52:55")
+    retry = post_command(url, audio_text=COMMAND + "。", timestamp="2025-12-27T17:52:55")
+    assert first["status"] == "success" and retry == first
+    assert len(agent.db.get_records()) == 1 and client.calls == 1
+
+    # 不同的timestamp是新的一手牌
+    post_command(url, audio_text="玩家C在第一轮出了一张黑桃K", timestamp="2025-12-27T17:53:01")
+    assert len(agent.db.get_records()) == 2 and client.calls == 2
+
+    post_command(url, audio_text="玩家C在第二轮出了一张黑桃A")
+    post_command(url, audio_text="玩家C在第二轮出了一张黑桃A")
+    assert len(agent.db.get_records()) == 3 and client.calls == 3
+
+
+def test_failed_decision_retry(voice_server):
+    """决策失败的结果不缓存：重试时重新决策，但不再重复记录出牌"""
+    url, agent, client = voice_server
+    client.error = RuntimeError("模型不可用")
+    assert post_command(url, audio_text=COMMAND)["status"] == "ai_error"
+    client.error = None
+    assert post_command(url, audio_text=COMMAND)["status"] == "success"
+    assert len(agent.db.get_records()) == 1 and client.calls == 2
+
+
+def test_stream_record_error(voice_server):
+    """流式接口记录出牌失败时与POST接口一样返回JSON格式的500错误"""
+    url, agent, client = voice_server
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("数据库不可用")
+
+    agent.record = fail
+    query = urllib.parse.urlencode({"audio_text": COMMAND})
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(f"{url}/api/process_voice_command/stream?{query}", timeout=5)
+    assert error.value.code == 500
+    assert json.loads(error.value.read().decode("utf-8")) == {"error": "服务器错误", "message": "数据库不可用"}
+    assert client.calls == 0
+
+
+def test_fallback_not_cached():
+    """模型状态不是ok的决策都视为退回本地策略"""
+    is_fallback = VoiceAIHandler._is_fallback
+    for status in ("timeout", "error", "circuit_open", "illegal"):
+        assert is_fallback({"ai_decision": {"llm_status": status}})
+    assert not is_fallback({"ai_decision": {"llm_status": "ok"}})
+    assert not is_fallback({"ai_decision": {"recommended_move": {"cards": ["2"]}}})
+    assert not is_fallback({"ai_decision": None})
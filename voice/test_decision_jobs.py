@@ -0,0 +1,66 @@
+"""
+测试后台决策任务：提交后处于pending，完成后记录结果或错误，超出容量丢弃最早的任务
+"""
+
+import threading
+import time
+
+import pytest
+
+from decision_jobs import DecisionJobStore, JOB_PENDING, JOB_DONE, JOB_FAILED
+
+
+@pytest.fixture
+def store():
+    store = DecisionJobStore(workers=2, max_jobs=3)
+    yield store
+    store.shutdown()
+
+
+def wait_for(store, job_id, timeout=2.0):
+    """轮询直到任务结束"""
+    deadline = time.monotonic() + timeout
+    while store.get(job_id)["status"] == JOB_PENDING and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return store.get(job_id)
+
+
+def test_job_lifecycle(store):
+    """任务先为pending，完成后带结果和完成时间"""
+    release = threading.Event()
+    job_id = store.submit(lambda: release.wait(2) and {"move": "2"}, context={"voice_text": "x"})
+    job = store.get(job_id)
+    assert job["status"] == JOB_PENDING and job["result"] is None and job["finished_at"] is None
+    assert job["context"] == {"voice_text": "x"}
+    release.set()
+    job = wait_for(store, job_id)
+    assert job["status"] == JOB_DONE and job["result"] == {"move": "2"}
+    assert job["finished_at"] is not None
+    # get返回副本，修改不影响存储的任务
+    job["status"] = JOB_FAILED
+    assert store.get(job_id)["status"] == JOB_DONE
+
+
+def test_job_error(store):
+    """任务抛出异常时状态为failed并记录错误信息"""
+    def fail():
+        raise ValueError("模型超时")
+
+    job = wait_for(store, store.submit(fail))
+    assert job["status"] == JOB_FAILED and job["error"] == "模型超时" and job["result"] is None
+    assert store.get("missing") is None
+
+
+def test_completed_job(store):
+    """直接登记的已完成任务（命中缓存）无需执行即可查询"""
+    job = store.get(store.complete({"move": "K"}, context={"voice_text": "y"}))
+    assert job["status"] == JOB_DONE and job["result"] == {"move": "K"}
+    assert job["finished_at"] == job["created_at"]
+
+
+def test_capacity(store):
+    """超出max_jobs时丢弃最早的任务"""
+    job_ids = [store.complete(n) for n in range(4)]
+    assert store.get(job_ids[0]) is None
+    assert [store.get(job_id)["result"] for job_id in job_ids[1:]] == [1, 2, 3]
+    assert store.stats() == {JOB_PENDING: 0, JOB_DONE: 3, JOB_FAILED: 0, "total": 3}
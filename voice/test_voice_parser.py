@@ -0,0 +1,64 @@
+"""
+测试语音解析：单张出牌与组合牌型
+"""
+
+from server import VoiceCardParser
+# server 已把landlord_agent目录加入Python路径
+from card_table import CARD_NAMES
+
+parser = VoiceCardParser()
+
+
+def test_single_cards():
+    """单张出牌的解析结果"""
+    cases = {
+        "玩家A在第一轮出了一张红桃K": ("A", 1, "heart K"),
+        "玩家B在第二轮出了一张黑桃A": ("B", 2, "spade A"),
+        "玩家C在第三轮出了一张方片2": ("C", 3, "diamond 2"),
+        "玩家A在第二轮出了一张黑桃10": ("A", 2, "spade 10"),
+        "玩家乙在第十轮出了一张红心老K": ("B", 10, "heart K"),
+        "player a 第3轮 红桃7": ("A", 3, "heart 7"),
+        "玩家C在第十二轮出了一张梅花九": ("C", 12, "club 9"),
+        "玩家C在第三轮出了一张小王": ("C", 3, "little_joker"),
+        "玩家C在第五轮出了一张大王": ("C", 5, "big_joker"),
+        # 没有明确轮次时，"一张"中的"一"作为兜底轮次
+        "玩家A出了一张红桃K": ("A", 1, "heart K"),
+    }
+    for text, (player, round_num, card) in cases.items():
+        result = parser.parse(text)
+        print(f"{text} -> {result['player']} / {result['round']} / {result['card']}")
+        assert (result["player"], result["round"], result["card"]) == (player, round_num, card)
+        assert result["type"] == "单张"
+        assert CARD_NAMES[result["card_ids"][0]] == card
+
+
+def test_combinations():
+    """组合牌型的解析结果：牌型 + 点数多重集"""
+    cases = {
+        "玩家A在第一轮出了对K": ("对子", ["K", "K"]),
+        "玩家B在第二轮出了三个8": ("三张", ["8", "8", "8"]),
+        "玩家B在第二轮出了三个8带一个5": ("三带一", ["8", "8", "8", "5"]),
+        "玩家B在第二轮出了三个8带一对5": ("三带二", ["8", "8", "8", "5", "5"]),
+        "玩家C在第三轮出了顺子3到7": ("顺子", ["3", "4", "5", "6", "7"]),
+        "玩家C在第三轮出了10到A的顺子": ("顺子", ["10", "J", "Q", "K", "A"]),
+        "玩家A在第一轮出了连对334455": ("连对", ["3", "3", "4", "4", "5", "5"]),
+        "玩家A在第一轮出了飞机3到4带5和6": ("飞机带翅膀", ["3", "3", "3", "4", "4", "4", "5", "6"]),
+        "玩家A在第一轮出了四个9带3和5": ("四带二", ["9", "9", "9", "9", "3", "5"]),
+        "玩家A在第一轮出了炸弹8": ("炸弹", ["8", "8", "8", "8"]),
+        "玩家A在第一轮出了王炸": ("王炸", ["小王", "大王"]),
+    }
+    for text, (combo_type, cards) in cases.items():
+        result = parser.parse(text)
+        print(f"{text} -> {result['card']}")
+        assert result["type"] == combo_type, result
+        assert result["cards"] == cards, result
+        assert result["card"] == " ".join([combo_type] + cards)
+
+
+def test_invalid_combinations():
+    """不构成合法牌型时返回错误，而不是误判为单张"""
+    for text in ["玩家A在第一轮出了顺子3到6", "玩家A在第一轮出了顺子J到2", "玩家A在第一轮出了炸弹"]:
+        result = parser.parse(text)
+        print(f"{text} -> {result.get('error')}")
+        assert result["card"] is None
+        assert "牌型" in result["error"]